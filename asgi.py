@@ -0,0 +1,5 @@
+"""ASGI entry point, e.g. ``uvicorn asgi:app --workers 4``"""
+from flaskblog import create_app
+from flaskblog.aio import AsgiApp
+
+app = AsgiApp(create_app())
@@ -0,0 +1,150 @@
+"""Show the feeds staying fast while logins and new posts overload the app.
+
+Usage:
+    python benchmarks/admission_benchmark.py --writers 64 --readers 4
+
+A pooled WSGI server with ``--threads`` threads is run twice, with
+admission control off and then on.  ``--writers`` clients log in and
+publish posts as fast as they can; logins hash with bcrypt, so they soon
+fill every thread.  Meanwhile ``--readers`` clients fetch the home feed,
+and their p50/p95/p99 latency is reported next to how many writes went
+through and how many were refused with a 503.
+
+Without admission control the feed waits behind the writes for a thread.
+With it, auth and write requests past their class's limit and queue are
+refused at once, which leaves threads free for reads.  The class limits
+are the configured ones, so keep their total below ``--threads``.
+
+A throwaway SQLite database is created and seeded in a temporary
+directory unless SQLALCHEMY_DATABASE_URI is set.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asgi_benchmark import free_port, start_wsgi  # noqa: E402
+from load_benchmark import Context, HttpConnection  # noqa: E402
+
+
+def writer(port, context, deadline, rng, results):
+    connection = HttpConnection("127.0.0.1", port)
+    logged_in = False
+    while time.monotonic() < deadline:
+        try:
+            if not logged_in or rng.random() < 0.5:
+                # A new visitor each time, or the login would redirect.
+                connection = HttpConnection("127.0.0.1", port)
+                status, _ = connection.request("POST", "/login",
+                                               context.credentials(rng))
+                logged_in = status == 302
+            else:
+                status, _ = connection.request(
+                    "POST", "/post/new", {"title": "Benchmark post",
+                                          "content": "Lorem ipsum " * 50})
+        except OSError:
+            status = None
+        results.append(status)
+
+
+def reader(port, deadline, results):
+    connection = HttpConnection("127.0.0.1", port)
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            status, _ = connection.request("GET", "/")
+        except OSError:
+            connection = HttpConnection("127.0.0.1", port)
+            status = None
+        results.append((time.perf_counter() - start, status))
+
+
+def run(app, context, args) -> dict:
+    port = free_port()
+    stop = start_wsgi(app, port, args.threads)
+    writes, reads = [], []
+    deadline = time.monotonic() + args.duration
+    clients = [threading.Thread(target=writer,
+                                args=(port, context, deadline,
+                                      random.Random(args.seed + i), writes))
+               for i in range(args.writers)]
+    clients += [threading.Thread(target=reader, args=(port, deadline, reads))
+                for _ in range(args.readers)]
+    try:
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+    finally:
+        stop()
+
+    timings = sorted(elapsed * 1000 for elapsed, _ in reads)
+    if len(timings) < 2:
+        timings = (timings or [float("nan")]) * 2
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+    return {
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+        "reads": len(reads) / args.duration,
+        "read_errors": sum(status != 200 for _, status in reads),
+        "writes": sum(status is not None and status < 400
+                      for status in writes) / args.duration,
+        "shed": sum(status == 503 for status in writes),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--writers", type=int, default=64)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URI",
+                          "sqlite:///" + os.path.join(tmp, "bench.db"))
+    os.environ["FLASKBLOG_WTF_CSRF_ENABLED"] = "false"
+    os.environ["FLASKBLOG_MAIL_QUEUE_ASYNC"] = "false"
+    os.environ["FLASKBLOG_CACHE_TYPE"] = '"null"'
+    # Failed and repeated logins would otherwise be throttled.
+    os.environ["FLASKBLOG_LOGIN_LIMIT_PER_IP"] = "[1000000, 1]"
+    os.environ["FLASKBLOG_LOGIN_LIMIT_PER_ACCOUNT"] = "[1000000, 1]"
+    os.environ["FLASKBLOG_LOGIN_LIMIT_PER_ACCOUNT_AND_IP"] = "[1000000, 1]"
+
+    from flaskblog import create_app, db
+    from flaskblog.models import Post
+    from flaskblog.seed import PASSWORD, seed_database
+
+    print(f"{args.writers} writers and {args.readers} readers, "
+          f"{args.threads} threads, {args.duration:.0f}s")
+    print(f"{'admission':<11}{'p50':>10}{'p95':>10}{'p99':>10}{'reads/s':>9}"
+          f"{'errors':>8}{'writes/s':>10}{'shed':>7}")
+    for enabled in (False, True):
+        os.environ["FLASKBLOG_ADMISSION_CONTROL"] = str(enabled).lower()
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            if not db.session.query(Post.id).first():
+                seed_database(args.users, args.posts, seed=args.seed)
+        result = run(app, Context(app, PASSWORD), args)
+        print(f"{'on' if enabled else 'off':<11}{result['p50']:>8.1f}ms"
+              f"{result['p95']:>8.1f}ms{result['p99']:>8.1f}ms"
+              f"{result['reads']:>9.1f}{result['read_errors']:>8}"
+              f"{result['writes']:>10.1f}{result['shed']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Compare the sync WSGI server with the ASGI mode under slow clients.
+
+Usage:
+    python benchmarks/asgi_benchmark.py --slow 200 --fast 20 --threads 16
+
+Both servers get the same number of request threads.  ``--slow`` clients
+trickle their request headers over ``--slow-seconds``, like phones on bad
+networks, while ``--fast`` clients fetch the home page and single posts as
+quickly as they can.  For each server the fast clients' p50/p95/p99
+latency, throughput, timeouts and the peak number of threads are reported.
+
+The "wsgi" server is a thread pool in front of werkzeug, which is how
+threaded WSGI servers such as gunicorn's gthread worker behave: a slow
+client holds a thread until its request has arrived.  The "asgi" server
+is uvicorn running asgi.py's ``AsgiApp``, where the event loop reads the
+request and a thread is only taken once it is complete.
+
+A throwaway SQLite database is created and seeded in a temporary
+directory unless SQLALCHEMY_DATABASE_URI is set.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_wsgi(app, port, threads):
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(ThreadingMixIn, BaseWSGIServer):
+        pool = ThreadPoolExecutor(threads, thread_name_prefix="wsgi")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread, request,
+                             client_address)
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = PooledWSGIServer("127.0.0.1", port, app)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def start_asgi(app, port, threads):
+    import uvicorn
+    from flaskblog.aio import AsgiApp
+
+    app.config["ASGI_THREADS"] = threads
+    server = uvicorn.Server(uvicorn.Config(AsgiApp(app), host="127.0.0.1",
+                                           port=port, log_level="warning",
+                                           backlog=4096))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+    return stop
+
+
+async def fetch(port, path, trickle=0.0) -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = (f"GET {path} HTTP/1.1\r\nHost: localhost\r\n"
+               f"User-Agent: benchmark\r\nConnection: close\r\n\r\n").encode()
+    try:
+        if trickle:
+            for i in range(0, len(request), 8):
+                writer.write(request[i:i + 8])
+                await writer.drain()
+                await asyncio.sleep(trickle * 8 / len(request))
+        else:
+            writer.write(request)
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def slow_client(port, paths, deadline, trickle, rng):
+    while time.monotonic() < deadline:
+        try:
+            await fetch(port, rng.choice(paths), trickle)
+        except (OSError, IndexError, ValueError):
+            await asyncio.sleep(0.1)
+
+
+async def fast_client(port, paths, deadline, timeout, rng, results):
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(fetch(port, rng.choice(paths)),
+                                            timeout)
+        except (asyncio.TimeoutError, OSError, IndexError, ValueError):
+            results.append((None, None))
+            continue
+        results.append((time.perf_counter() - start, status))
+
+
+async def drive(port, paths, args) -> dict:
+    rng = random.Random(args.seed)
+    results = []
+    peak = threading.active_count()
+    deadline = time.monotonic() + args.duration
+    tasks = [asyncio.create_task(slow_client(port, paths, deadline,
+                                             args.slow_seconds,
+                                             random.Random(rng.random())))
+             for _ in range(args.slow)]
+    # Let the slow clients occupy the server before measuring.
+    await asyncio.sleep(min(1.0, args.slow_seconds / 2))
+    tasks += [asyncio.create_task(fast_client(port, paths, deadline,
+                                              args.timeout,
+                                              random.Random(rng.random()),
+                                              results))
+              for _ in range(args.fast)]
+    start = time.perf_counter()
+    while time.monotonic() < deadline:
+        peak = max(peak, threading.active_count())
+        await asyncio.sleep(0.05)
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - start
+
+    timings = sorted(elapsed * 1000 for elapsed, _ in results
+                     if elapsed is not None)
+    if len(timings) < 2:
+        timings = (timings or [float("nan")]) * 2
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+    return {
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+        "throughput": sum(elapsed is not None for elapsed, _ in results)
+        / wall,
+        "timeouts": sum(elapsed is None for elapsed, _ in results),
+        "errors": sum(status is not None and status >= 400
+                      for _, status in results),
+        "threads": peak,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=("wsgi", "asgi"),
+                        default=("wsgi", "asgi"))
+    parser.add_argument("--slow", type=int, default=200)
+    parser.add_argument("--slow-seconds", type=float, default=2.0)
+    parser.add_argument("--fast", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URI",
+                          "sqlite:///" + os.path.join(tmp, "bench.db"))
+    os.environ["FLASKBLOG_CACHE_TYPE"] = '"null"'
+
+    from flaskblog import create_app, db
+    from flaskblog.models import Post
+    from flaskblog.seed import seed_database
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if not db.session.query(Post.id).first():
+            seed_database(args.users, args.posts, seed=args.seed)
+        post_ids = db.session.scalars(db.select(Post.id).limit(1000)).all()
+    paths = ["/"] + [f"/post/{post_id}" for post_id in post_ids]
+
+    print(f"{args.slow} slow and {args.fast} fast clients, "
+          f"{args.threads} threads, {args.duration:.0f}s")
+    print(f"{'server':<8}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>10}"
+          f"{'timeouts':>10}{'threads':>9}")
+    for kind in args.servers:
+        port = free_port()
+        start = start_wsgi if kind == "wsgi" else start_asgi
+        stop = start(app, port, args.threads)
+        try:
+            result = asyncio.run(drive(port, paths, args))
+        finally:
+            stop()
+        print(f"{kind:<8}{result['p50']:>8.1f}ms{result['p95']:>8.1f}ms"
+              f"{result['p99']:>8.1f}ms{result['throughput']:>10.1f}"
+              f"{result['timeouts']:>10}{result['threads']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Load-test the main pages against a synthetic database.
+
+Usage:
+    python benchmarks/load_benchmark.py --users 1000 --posts 100000
+    python benchmarks/load_benchmark.py --driver wsgi --concurrency 8
+    python benchmarks/load_benchmark.py --save benchmarks/baseline.json
+    python benchmarks/load_benchmark.py --compare benchmarks/baseline.json
+
+Each scenario is requested ``--requests`` times and reported with its
+p50/p95/p99 latency, throughput and SQL statements per request (read from
+the Server-Timing header).  The "client" driver calls the app in process
+through Flask's test client; the "wsgi" driver goes over HTTP to a
+threaded WSGI server.
+
+A throwaway SQLite database is created and seeded in a temporary
+directory unless SQLALCHEMY_DATABASE_URI is set, in which case an empty
+database is seeded and a populated one is used as is.  The page cache is
+off unless --cache is given, so the numbers measure the real work.
+
+--save writes the results, with the commit they were measured at, to a
+JSON file.  --compare prints the change against such a file and exits
+with status 1 if any p95 got slower by more than --tolerance.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SQL_COUNT = re.compile(r'desc="(\d+) queries"')
+SCENARIOS = ("home", "deep_page", "post", "user", "login", "new_post")
+
+
+class ClientConnection:
+    """Requests through the test client, which keeps its own cookies."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code, response.headers
+
+
+class HttpConnection:
+    """Requests over a keep-alive HTTP connection with a cookie jar."""
+
+    def __init__(self, host, port):
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+        self.cookies = {}
+
+    def request(self, method, path, data=None):
+        headers = {}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value
+                                          in self.cookies.items())
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        response.read()
+        for cookie in response.headers.get_all("Set-Cookie") or ():
+            name, _, value = cookie.split(";", 1)[0].partition("=")
+            self.cookies[name] = value
+        return response.status, response.headers
+
+
+class Driver:
+    """Opens connections to the app under test."""
+
+    def __init__(self, app, kind):
+        self.app = app
+        self.kind = kind
+        self.server = None
+        if kind == "wsgi":
+            from werkzeug.serving import WSGIRequestHandler, make_server
+            WSGIRequestHandler.protocol_version = "HTTP/1.1"
+            logging.getLogger("werkzeug").setLevel(logging.WARNING)
+            self.server = make_server("127.0.0.1", 0, app, threaded=True)
+            threading.Thread(target=self.server.serve_forever,
+                             daemon=True).start()
+
+    def connect(self):
+        if self.server is None:
+            return ClientConnection(self.app)
+        return HttpConnection("127.0.0.1", self.server.server_port)
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+
+
+class Context:
+    """What the scenarios need to know about the seeded data."""
+
+    def __init__(self, app, password):
+        from flaskblog import db
+        from flaskblog.models import Post, User
+
+        with app.app_context():
+            self.first_post, self.last_post, count = db.session.query(
+                db.func.min(Post.id), db.func.max(Post.id),
+                db.func.count(Post.id)).one()
+            self.usernames = db.session.scalars(
+                db.select(User.username).order_by(User.id).limit(1000)).all()
+        self.deep_page = max(1, int(count / 5 * 0.9))
+        self.password = password
+
+    def credentials(self, rng) -> dict:
+        username = rng.choice(self.usernames)
+        return {"email": f"{username}@example.com",
+                "password": self.password}
+
+
+def build_request(scenario, context, rng):
+    """Return the method, path and form data for one request."""
+
+    if scenario == "home":
+        return "GET", "/", None
+    if scenario == "deep_page":
+        return "GET", f"/?page={context.deep_page}", None
+    if scenario == "post":
+        post_id = rng.randint(context.first_post, context.last_post)
+        return "GET", f"/post/{post_id}", None
+    if scenario == "user":
+        return "GET", f"/user/{rng.choice(context.usernames)}", None
+    if scenario == "login":
+        return "POST", "/login", context.credentials(rng)
+    if scenario == "new_post":
+        return "POST", "/post/new", {"title": "Benchmark post",
+                                     "content": "Lorem ipsum " * 50}
+    raise ValueError(f"Unknown scenario {scenario!r}")
+
+
+def run_worker(driver, scenario, context, seed, count, warmup, results):
+    rng = random.Random(seed)
+    connection = driver.connect()
+    if scenario == "new_post":
+        connection.request("POST", "/login", context.credentials(rng))
+
+    for i in range(warmup + count):
+        method, path, data = build_request(scenario, context, rng)
+        if scenario == "login":
+            # Every login is a new visitor, or it would be redirected.
+            connection = driver.connect()
+        start = time.perf_counter()
+        status, headers = connection.request(method, path, data)
+        elapsed = time.perf_counter() - start
+        if i < warmup:
+            continue
+        match = SQL_COUNT.search(headers.get("Server-Timing", ""))
+        results.append((elapsed, status, int(match.group(1)) if match
+                        else None))
+
+
+def run_scenario(driver, scenario, context, args) -> dict:
+    results = []
+    per_worker = max(1, args.requests // args.concurrency)
+    workers = [threading.Thread(target=run_worker,
+                                args=(driver, scenario, context, args.seed + i,
+                                      per_worker, args.warmup, results))
+               for i in range(args.concurrency)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - start
+
+    timings = sorted(elapsed * 1000 for elapsed, _, _ in results)
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+    queries = [count for _, _, count in results if count is not None]
+    return {
+        "requests": len(results),
+        "errors": sum(status >= 400 for _, status, _ in results),
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+        "mean": statistics.fmean(timings),
+        # Warm-up requests are in the wall time too, so this is a floor.
+        "throughput": len(results) / wall,
+        "sql": statistics.fmean(queries) if queries else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results) -> None:
+    print(f"{'scenario':<12}{'p50':>10}{'p95':>10}{'p99':>10}"
+          f"{'req/s':>10}{'sql':>6}{'errors':>8}")
+    for scenario, result in results.items():
+        sql = f"{result['sql']:.1f}" if result["sql"] is not None else "-"
+        print(f"{scenario:<12}{result['p50']:>8.2f}ms{result['p95']:>8.2f}ms"
+              f"{result['p99']:>8.2f}ms{result['throughput']:>10.1f}"
+              f"{sql:>6}{result['errors']:>8}")
+
+
+def compare(results, baseline, tolerance) -> bool:
+    """Print the change against a baseline; return True on a regression."""
+
+    print(f"\nAgainst {baseline.get('commit') or 'baseline'} "
+          f"({baseline.get('date')}):")
+    print(f"{'scenario':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>10}")
+    regressed = False
+    for scenario, result in results.items():
+        before = baseline["results"].get(scenario)
+        if before is None:
+            continue
+        changes = [(result[key] - before[key]) / before[key] * 100
+                   if before[key] else 0.0
+                   for key in ("p50", "p95", "p99", "throughput")]
+        slower = changes[1] > tolerance * 100
+        regressed |= slower
+        print(f"{scenario:<12}" + "".join(f"{change:>+9.1f}%"
+                                          for change in changes)
+              + ("  REGRESSION" if slower else ""))
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=20_000)
+    parser.add_argument("--driver", choices=("client", "wsgi"),
+                        default="client")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS,
+                        default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=5,
+                        help="untimed requests per worker")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true",
+                        help="leave the page cache on")
+    parser.add_argument("--save", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed p95 slowdown against --compare")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URI",
+                          "sqlite:///" + os.path.join(tmp, "bench.db"))
+    os.environ["FLASKBLOG_WTF_CSRF_ENABLED"] = "false"
+    os.environ["FLASKBLOG_SERVER_TIMING"] = "true"
+    os.environ["FLASKBLOG_MAIL_QUEUE_ASYNC"] = "false"
+    if not args.cache:
+        os.environ["FLASKBLOG_CACHE_TYPE"] = '"null"'
+        os.environ["FLASKBLOG_USER_CACHE_TYPE"] = '"null"'
+
+    from flaskblog import create_app, db
+    from flaskblog.models import Post
+    from flaskblog.seed import PASSWORD, seed_database
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if not db.session.query(Post.id).first():
+            start = time.perf_counter()
+            seed_database(args.users, args.posts, seed=args.seed)
+            print(f"Seeded {args.users} users and {args.posts} posts in "
+                  f"{time.perf_counter() - start:.1f}s")
+
+    context = Context(app, PASSWORD)
+    driver = Driver(app, args.driver)
+    try:
+        results = {scenario: run_scenario(driver, scenario, context, args)
+                   for scenario in args.scenarios}
+    finally:
+        driver.close()
+    print_results(results)
+
+    regressed = False
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.tolerance)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"commit": git_commit(),
+                       "date": datetime.utcnow().isoformat(timespec="seconds"),
+                       "settings": vars(args), "results": results},
+                      f, indent=2)
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark full-text search against a LIKE scan over many posts.
+
+Usage:
+    python benchmarks/search_benchmark.py --posts 100000
+
+A throwaway SQLite database is created in a temporary directory unless
+SQLALCHEMY_DATABASE_URI is set.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A synthetic vocabulary with a Zipf-like word distribution, so common
+# words match most posts and rare words only a few, as in real text.
+VOCABULARY = [f"w{i}" for i in range(20_000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+TERMS = ["w3", "w40", "w400", "w4000", "w40 w400", "w15000"]
+
+
+def populate(db, User, Post, count) -> None:
+    """Bulk insert ``count`` posts spread over a hundred users."""
+
+    db.session.execute(User.__table__.insert(), [
+        {"username": f"user{i}", "email": f"user{i}@test.com",
+         "password": "x", "image_file": "default.jpg"}
+        for i in range(1, 101)])
+    rng = random.Random(0)
+    batch = []
+    for i in range(count):
+        words = rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(30, 300))
+        batch.append({"title": " ".join(words[:4]),
+                      "content": " ".join(words),
+                      "user_id": rng.randint(1, 100)})
+        if len(batch) == 5000:
+            db.session.execute(Post.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Post.__table__.insert(), batch)
+    db.session.commit()
+
+
+def measure(function, repeat) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URI",
+                          "sqlite:///" + os.path.join(tmp, "bench.db"))
+
+    from flaskblog import create_app, db
+    from flaskblog.models import Post, User
+    from flaskblog.search.utils import SearchPage
+
+    app = create_app()
+    with app.app_context(), app.test_request_context():
+        db.create_all()
+        start = time.perf_counter()
+        populate(db, User, Post, args.posts)
+        print(f"Inserted {args.posts} posts in "
+              f"{time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':<16}{'index p50':>12}{'index p95':>12}"
+              f"{'LIKE p50':>12}")
+        for term in TERMS:
+            indexed = measure(lambda: SearchPage(term).results, args.repeat)
+            like = measure(lambda: Post.query.filter(
+                *(Post.content.like(f"% {word} %") for word in term.split()))
+                .order_by(Post.date_posted.desc()).limit(10).all(),
+                max(args.repeat // 4, 1))
+            print(f"{term:<16}{statistics.median(indexed):>10.2f}ms"
+                  f"{statistics.quantiles(indexed, n=20)[-1]:>10.2f}ms"
+                  f"{statistics.median(like):>10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
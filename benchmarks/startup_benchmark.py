@@ -0,0 +1,130 @@
+"""Measure how long a fresh worker takes to serve its first requests.
+
+Usage:
+    python benchmarks/startup_benchmark.py --runs 20
+    python benchmarks/startup_benchmark.py --save /tmp/startup.json
+    python benchmarks/startup_benchmark.py --compare /tmp/startup.json
+
+Every run starts a new Python process, as a restarted or newly scaled
+worker would, and times importing flaskblog, ``create_app`` and the first
+requests for the home page, a post and a user page.  Runs are made with an
+empty template bytecode cache ("cold") and with one filled by
+``flask templates compile`` ("warm").
+
+--save writes the medians, with the commit they were measured at, to a
+JSON file.  --compare prints the change against such a file and exits
+with status 1 if any median got slower by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from flaskblog import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+timings = {"import": imported - start, "create_app": created - imported}
+for name, path in (("home", "/"), ("post", "/post/1"),
+                   ("user", "/user/user1")):
+    before = time.perf_counter()
+    client.get(path).close()
+    timings[name] = time.perf_counter() - before
+timings["total"] = time.perf_counter() - start
+json.dump(timings, sys.stdout)
+"""
+STAGES = ("import", "create_app", "home", "post", "user", "total")
+
+
+def run_once(env) -> dict:
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env, cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return {stage: seconds * 1000
+            for stage, seconds in json.loads(output.stdout).items()}
+
+
+def measure(env, runs, cache_dir, warm) -> dict:
+    samples = []
+    for _ in range(runs):
+        if not warm:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        samples.append(run_once(env))
+    return {stage: statistics.median(sample[stage] for sample in samples)
+            for stage in STAGES}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--save", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    cache_dir = os.path.join(tmp, "jinja")
+    env = dict(os.environ,
+               SECRET_KEY="benchmark",
+               SQLALCHEMY_DATABASE_URI="sqlite:///"
+               + os.path.join(tmp, "bench.db"),
+               FLASK_APP=os.path.join(ROOT, "run.py"),
+               FLASKBLOG_JINJA_BYTECODE_CACHE_DIR=json.dumps(cache_dir),
+               FLASKBLOG_CACHE_TYPE='"null"')
+    subprocess.run([sys.executable, "-m", "flask", "seed", "--users", "10",
+                    "--posts", "100"], env=env, cwd=ROOT, check=True,
+                   capture_output=True)
+
+    results = {"cold": measure(env, args.runs, cache_dir, warm=False)}
+    subprocess.run([sys.executable, "-m", "flask", "templates", "compile"],
+                   env=env, cwd=ROOT, check=True, capture_output=True)
+    results["warm"] = measure(env, args.runs, cache_dir, warm=True)
+
+    print(f"median of {args.runs} runs, ms")
+    print(f"{'cache':<8}" + "".join(f"{stage:>12}" for stage in STAGES))
+    for mode, result in results.items():
+        print(f"{mode:<8}" + "".join(f"{result[stage]:>12.1f}"
+                                     for stage in STAGES))
+
+    regressed = False
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nAgainst {baseline.get('commit') or 'baseline'}:")
+        for mode, result in results.items():
+            before = baseline["results"][mode]
+            changes = {stage: (result[stage] - before[stage])
+                       / before[stage] * 100
+                       for stage in STAGES}
+            slower = [stage for stage, change in changes.items()
+                      if change > args.tolerance * 100]
+            regressed |= bool(slower)
+            print(f"{mode:<8}" + "".join(f"{change:>+11.1f}%"
+                                         for change in changes.values())
+                  + (f"  REGRESSION: {', '.join(slower)}" if slower else ""))
+
+    if args.save:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                cwd=ROOT, capture_output=True, text=True)
+        with open(args.save, "w") as f:
+            json.dump({"commit": commit.stdout.strip() or None,
+                       "date": datetime.utcnow().isoformat(timespec="seconds"),
+                       "runs": args.runs, "results": results}, f, indent=2)
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
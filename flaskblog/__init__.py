@@ -1,35 +1,111 @@
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 from flask_mail import Mail
-from flaskblog.config import Config
+from flaskblog.admission import AdmissionControl
+from flaskblog.assets import Assets
+from flaskblog.availability import AccountNames
+from flaskblog.cache import IdentityCache, MissingCache, PageCache
+from flaskblog.compression import Compression
+from flaskblog.hashing import LoginThrottle, PasswordHasher
+from flaskblog.instrumentation import Instrumentation
+from flaskblog.mail_queue import MailQueue
+from flaskblog.schema import configure_migrations
+from flaskblog.storage import MediaStorage
+from flaskblog.templating import compile_templates, configure_templates
+from flaskblog.config import config_by_name
+from flaskblog.database import (RoutingSession,
+                                configure_engines,
+                                configure_sqlite)
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 bcrypt = Bcrypt()
+hasher = PasswordHasher(bcrypt)
+login_throttle = LoginThrottle()
 login_manager = LoginManager()
 login_manager.login_view = "users.login"
 login_manager.login_message_category = "info"
 
 mail = Mail()
+mail_queue = MailQueue()
+cache = PageCache()
+user_cache = IdentityCache()
+missing_cache = MissingCache()
+account_names = AccountNames()
+assets = Assets()
+media_storage = MediaStorage()
+instrumentation = Instrumentation()
+compression = Compression()
+admission = AdmissionControl()
 
 
-def create_app(config_class=Config):
+def create_app(config_class=None):
+    """
+    Create the application.
+
+    Args:
+        config_class (type | str): a config class, or the name of one in
+            ``config_by_name``.  Defaults to the ``FLASKBLOG_CONFIG``
+            environment variable, then "default".  Any ``FLASKBLOG_<KEY>``
+            environment variable overrides that config key.
+
+    Returns:
+        Flask: the configured application.
+    """
+
+    if config_class is None:
+        config_class = os.environ.get("FLASKBLOG_CONFIG", "default")
+    if isinstance(config_class, str):
+        config_class = config_by_name[config_class]
+
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
+    app.config.from_prefixed_env("FLASKBLOG")
+    configure_templates(app)
+    configure_engines(app)
 
     db.init_app(app)
+    with app.app_context():
+        configure_sqlite(app, db.engines.values())
+    configure_migrations(app, db)
+    # after_request hooks run in reverse, so this one sees final responses.
+    compression.init_app(app)
     bcrypt.init_app(app)
+    hasher.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
+    mail_queue.init_app(app)
+    cache.init_app(app)
+    user_cache.init_app(app)
+    missing_cache.init_app(app)
+    account_names.init_app(app)
+    assets.init_app(app)
+    media_storage.init_app(app)
+    instrumentation.init_app(app)
+    # After instrumentation, so refused requests are still timed.
+    admission.init_app(app)
 
     from flaskblog.main.routes import main
     from flaskblog.posts.routes import posts
     from flaskblog.users.routes import users
+    from flaskblog.search.routes import search
+    from flaskblog.api.routes import api
+    from flaskblog.feeds.routes import feeds
     from flaskblog.errors.handlers import errors
     app.register_blueprint(main)
     app.register_blueprint(posts)
     app.register_blueprint(users)
+    app.register_blueprint(search)
+    app.register_blueprint(api)
+    app.register_blueprint(feeds)
     app.register_blueprint(errors)
 
+    from flaskblog.seed import seed_command
+    app.cli.add_command(seed_command)
+
+    if app.config.get("JINJA_PRELOAD"):
+        compile_templates(app)
+
     return app
@@ -0,0 +1,143 @@
+import threading
+import time
+from flask import g, request
+from werkzeug.exceptions import ServiceUnavailable
+
+CLASSES = {
+    "read": (32, 64),
+    "auth": (4, 8),
+    "write": (4, 8),
+    "bulk": (2, 2),
+}
+ENDPOINTS = {
+    "static": None,
+    "metrics": None,
+    "media": None,
+    "users.login": "auth",
+    "users.register": "auth",
+    "users.reset_request": "auth",
+    "users.reset_token": "auth",
+    "users.account": "write",
+    "posts.new_post": "write",
+    "posts.update_post": "write",
+    "posts.delete_post": "write",
+    "api.export_posts": "bulk",
+    "search": "bulk",
+}
+
+
+class _Gate:
+    # A concurrency limit with a bounded queue in front of it.
+    def __init__(self, limit, queue):
+        self.limit = limit
+        self.queue = queue
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout) -> bool:
+        with self._condition:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.queue:
+                self.shed += 1
+                return False
+
+            self.waiting += 1
+            self.queued += 1
+            deadline = time.monotonic() + timeout
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self) -> None:
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+class AdmissionControl:
+    """
+    Limit how many requests of each class run at once.
+
+    Endpoints are sorted into classes by endpoint name, then by blueprint,
+    through ``ADMISSION_ENDPOINTS``; anything unlisted is "read" and
+    endpoints mapped to None are never limited.  Each class in
+    ``ADMISSION_CLASSES`` has a concurrency limit and a queue.  Requests
+    over the limit wait up to ``ADMISSION_QUEUE_TIMEOUT`` seconds for a
+    slot, and once the queue is full they get a 503 with ``Retry-After``
+    straight away.  A flood of logins or uploads then fills its own queue
+    instead of every worker thread, and the feeds keep being served.
+
+    Limits are per worker process; size them below the worker's threads.
+    """
+
+    def __init__(self, app=None):
+        self.gates = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        if not app.config.get("ADMISSION_CONTROL", True):
+            return
+
+        self.endpoints = app.config.get("ADMISSION_ENDPOINTS", ENDPOINTS)
+        self.timeout = app.config.get("ADMISSION_QUEUE_TIMEOUT", 1.0)
+        self.retry_after = app.config.get("ADMISSION_RETRY_AFTER", 2)
+        self.gates = {name: _Gate(limit, queue) for name, (limit, queue)
+                      in app.config.get("ADMISSION_CLASSES", CLASSES).items()}
+        app.extensions["admission"] = self
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+
+    def classify(self, endpoint, blueprint) -> str:
+        """
+        Find the class of an endpoint.
+
+        Returns:
+            str: the class name, or None if the endpoint is not limited.
+        """
+
+        if endpoint in self.endpoints:
+            return self.endpoints[endpoint]
+        if blueprint in self.endpoints:
+            return self.endpoints[blueprint]
+        return "read"
+
+    def _admit(self) -> None:
+        name = self.classify(request.endpoint, request.blueprint)
+        gate = self.gates.get(name)
+        if gate is None:
+            return
+
+        if not gate.acquire(self.timeout):
+            raise ServiceUnavailable("The server is busy, please try again.",
+                                     retry_after=self.retry_after)
+        g.admission_gate = gate
+
+    def _release(self, exc) -> None:
+        gate = g.pop("admission_gate", None)
+        if gate is not None:
+            gate.release()
+
+    def metrics(self) -> dict:
+        return {name: {"admitted_total": gate.admitted,
+                       "queued_total": gate.queued,
+                       "shed_total": gate.shed,
+                       "active": gate.active,
+                       "waiting": gate.waiting}
+                for name, gate in self.gates.items()}
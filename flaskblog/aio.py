@@ -0,0 +1,129 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+# Request bodies up to this size stay in memory.
+BODY_IN_MEMORY = 64 * 1024
+
+
+class AsgiApp:
+    """
+    Serve the Flask app to an ASGI server.
+
+    The event loop owns every socket, so slow clients and idle keep-alive
+    connections cost a coroutine instead of a thread.  Flask still runs
+    synchronously, on a pool of ``ASGI_THREADS`` threads, and only holds a
+    thread while it is working on a request.  asgiref's ``WsgiToAsgi``
+    would run every request on one shared thread.
+
+    Only the request and response I/O is asynchronous.  A view holds its
+    thread until it returns, while it waits on the database too; Flask's
+    ``async def`` views would as well, since Flask runs each one to
+    completion on the calling thread.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.executor = ThreadPoolExecutor(app.config.get("ASGI_THREADS", 32),
+                                           thread_name_prefix="asgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+
+        with SpooledTemporaryFile(max_size=BODY_IN_MEMORY) as body:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                body.write(message.get("body", b""))
+                if not message.get("more_body"):
+                    break
+            body.seek(0)
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._run_wsgi_app,
+                                       scope, body, send, loop)
+
+    def _run_wsgi_app(self, scope, body, send, loop) -> None:
+        # Runs on the pool.  Each message is handed to the event loop and
+        # waited for, so a slow client holds the response back rather than
+        # having it pile up in memory.
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and start.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            start["message"] = {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(name.lower().encode("latin1"),
+                             value.encode("latin1"))
+                            for name, value in headers]}
+
+        def send_start():
+            if not start.get("sent"):
+                start["sent"] = True
+                send_sync(start["message"])
+
+        result = self.app(_environ(scope, body), start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    send_start()
+                    send_sync({"type": "http.response.body", "body": chunk,
+                               "more_body": True})
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        send_start()
+        send_sync({"type": "http.response.body"})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def _environ(scope, body) -> dict:
+    """Build the WSGI environ of an ASGI HTTP request (PEP 3333)."""
+
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "")
+        .encode("utf-8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": BytesIO(),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+
+    for name, value in scope.get("headers", ()):
+        name = name.decode("latin1").upper().replace("-", "_")
+        if name not in ("CONTENT_LENGTH", "CONTENT_TYPE"):
+            name = "HTTP_" + name
+        value = value.decode("latin1")
+        if name in environ:
+            value = environ[name] + "," + value
+        environ[name] = value
+    return environ
@@ -0,0 +1,171 @@
+import json
+from flask import (Blueprint,
+                   Response,
+                   abort,
+                   jsonify,
+                   request,
+                   stream_with_context)
+from sqlalchemy import select
+from sqlalchemy.orm import defer, joinedload
+from flaskblog import db, missing_cache
+from flaskblog.database import read_replica
+from flaskblog.models import Post, User
+from flaskblog.pagination import KeysetPage, feed_page
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+MAX_LIMIT = 100
+EXPORT_BATCH = 1000
+
+
+def _fields(kind) -> set:
+    """
+    Read a sparse fieldset from the request.
+
+    ``?fields[posts]=id,title`` limits the keys of every post, and plain
+    ``?fields=id,title`` applies to the main resource.
+
+    Returns:
+        set: the requested keys, or None for all keys.
+    """
+
+    value = request.args.get(f"fields[{kind}]") or request.args.get("fields")
+    return set(value.split(",")) if value else None
+
+
+def _post_options(fields) -> list:
+    """
+    Loader options for posts serialized with ``fields``.
+
+    The rendered HTML is never sent, and the content is only loaded when
+    it was asked for.
+    """
+
+    options = [joinedload(Post.author), defer(Post.content_html)]
+    if fields is not None and "content" not in fields:
+        options.append(defer(Post.content))
+    return options
+
+
+def _page(query, endpoint, **values) -> dict:
+    limit = min(max(request.args.get("limit", 20, type=int), 1), MAX_LIMIT)
+    fields = _fields("posts")
+    try:
+        posts = KeysetPage(query.options(*_post_options(fields)), limit,
+                           request.args.get("cursor"))
+    except ValueError:
+        abort(400)
+
+    for key in ("limit", "fields", "fields[posts]"):
+        if key in request.args:
+            values[key] = request.args[key]
+    return feed_page(posts, endpoint, fields, **values)
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def error(error) -> tuple:
+    return jsonify({"error": error.name}), error.code
+
+
+@api.route("/posts")
+@read_replica
+def posts() -> str:
+    """
+    List posts, newest first.
+
+    Returns:
+        str: A JSON page of posts with ``next``/``prev`` cursor links.
+    """
+
+    return jsonify(_page(Post.query, "api.posts"))
+
+
+@api.route("/posts/<int:post_id>")
+@missing_cache.guard("post", "post_id")
+@read_replica
+def post(post_id) -> str:
+    """
+    A single post.
+
+    Returns:
+        str: The post as JSON.
+    """
+
+    fields = _fields("posts")
+    post = missing_cache.or_404(
+        "post", post_id,
+        db.session.get(Post, post_id, options=_post_options(fields)))
+    return jsonify(post.to_dict(fields))
+
+
+@api.route("/users/<string:username>")
+@missing_cache.guard("user", "username")
+@read_replica
+def user(username) -> str:
+    """
+    A single user.
+
+    Returns:
+        str: The user as JSON.
+    """
+
+    user = missing_cache.or_404(
+        "user", username, User.query.filter_by(username=username).first())
+    return jsonify(user.to_dict(_fields("users")))
+
+
+@api.route("/users/<string:username>/posts")
+@missing_cache.guard("user", "username")
+@read_replica
+def user_posts(username) -> str:
+    """
+    List a user's posts, newest first.
+
+    Returns:
+        str: A JSON page of posts with ``next``/``prev`` cursor links.
+    """
+
+    user = missing_cache.or_404(
+        "user", username, User.query.filter_by(username=username).first())
+    return jsonify(_page(Post.query.filter_by(user_id=user.id),
+                         "api.user_posts", username=user.username))
+
+
+@api.route("/export/posts.ndjson")
+@read_replica
+def export_posts() -> Response:
+    """
+    Export every post as newline delimited JSON.
+
+    Rows are read through a server-side cursor in batches and written to
+    the client as they arrive, so memory use does not grow with the
+    table.
+
+    Returns:
+        Response: A streamed NDJSON response, one post per line.
+    """
+
+    fields = _fields("posts")
+    statement = select(Post.id, Post.title, Post.content, Post.date_posted,
+                       Post.last_modified, User.username.label("author"))\
+        .join(User, User.id == Post.user_id)\
+        .order_by(Post.id)\
+        .execution_options(stream_results=True, yield_per=EXPORT_BATCH)
+
+    def generate():
+        # One chunk per batch, so each write (and compressor flush) carries
+        # many lines.
+        for rows in db.session.execute(statement).partitions():
+            lines = []
+            for row in rows:
+                data = dict(row._mapping,
+                            date_posted=row.date_posted.isoformat(),
+                            last_modified=row.last_modified.isoformat())
+                if fields:
+                    data = {key: data[key] for key in data if key in fields}
+                lines.append(json.dumps(data) + "\n")
+            yield "".join(lines)
+
+    return Response(stream_with_context(generate()),
+                    mimetype="application/x-ndjson")
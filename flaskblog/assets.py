@@ -0,0 +1,209 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import click
+from flask import abort, current_app, request, send_from_directory
+from flask.cli import with_appcontext
+from werkzeug.utils import safe_join
+
+MANIFEST = "manifest.json"
+COMPRESSIBLE = (".css", ".js", ".svg", ".txt", ".html", ".json", ".xml")
+
+
+class Assets:
+    """
+    Serve static files under content-hashed names.
+
+    ``url_for("static", filename="main.css")`` emits ``main.<hash>.css``.
+    Hashed urls change whenever the file does, so they are served with a
+    far-future ``immutable`` Cache-Control.  Precompressed ``.br``/``.gz``
+    siblings written by ``flask assets build`` are preferred when the
+    client accepts them.
+
+    ``flask assets build`` also writes the manifest of hashed names to
+    ``static/manifest.json``, which is loaded at startup.  Without one the
+    static folder is hashed at startup instead.  Request paths are only
+    ever looked up in the manifest, so they never reach the filesystem
+    outside the static folder or grow the manifest.  Directories in
+    ``ASSETS_EXCLUDE`` are left out.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.reverse = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.static_folder = app.static_folder
+        self.max_age = app.config.get("ASSETS_MAX_AGE", 31536000)
+        self.exclude = tuple(directory.strip("/") + "/" for directory
+                             in app.config.get("ASSETS_EXCLUDE", ()))
+        app.extensions["assets"] = self
+
+        if not app.config.get("ASSETS_FINGERPRINT", True):
+            return
+
+        try:
+            with open(os.path.join(self.static_folder, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = self.build_manifest()
+        self.reverse = {hashed: filename
+                        for filename, hashed in self.manifest.items()}
+
+        app.url_defaults(self._url_defaults)
+        app.view_functions["static"] = self.send_static
+        app.cli.add_command(assets_cli)
+
+    def fingerprint(self, filename) -> str:
+        """
+        Find the hashed name of a static file.
+
+        Args:
+            filename (str): the path below the static folder.
+
+        Returns:
+            str: the hashed path, or ``filename`` if it is not in the
+            manifest.
+        """
+
+        return self.manifest.get(filename, filename)
+
+    def build_manifest(self) -> dict:
+        """
+        Hash every file in the static folder.
+
+        Returns:
+            dict: each path mapped to its hashed path.
+        """
+
+        manifest = {}
+        for filename in self._walk():
+            digest = hashlib.sha256()
+            with open(os.path.join(self.static_folder, filename), "rb") as f:
+                for chunk in iter(lambda: f.read(65536), b""):
+                    digest.update(chunk)
+            root, extension = os.path.splitext(filename)
+            manifest[filename] = \
+                f"{root}.{digest.hexdigest()[:12]}{extension}"
+        return manifest
+
+    def send_static(self, filename):
+        """Serve a static file, honouring hashed names and precompression."""
+
+        original = self.original(filename)
+        path = original or filename
+        full = safe_join(self.static_folder, path)
+        if full is None:
+            abort(404)
+        mimetype = mimetypes.guess_type(path)[0]
+        encoding = self._encoding(full)
+
+        response = send_from_directory(
+            self.static_folder,
+            path + {"br": ".br", "gzip": ".gz"}.get(encoding, ""),
+            mimetype=mimetype)
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add("Accept-Encoding")
+
+        if original is not None:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = self.max_age
+            response.cache_control.immutable = True
+        return response
+
+    def original(self, hashed) -> str:
+        """
+        Find the file behind a hashed name.
+
+        Returns:
+            str: the original path, or None if ``hashed`` is not current.
+        """
+
+        return self.reverse.get(hashed)
+
+    def _encoding(self, full) -> str:
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding in request.accept_encodings \
+                    and _is_fresh(full + suffix, full):
+                return encoding
+        return None
+
+    def _url_defaults(self, endpoint, values) -> None:
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = self.fingerprint(values["filename"])
+
+    def _walk(self):
+        for root, _, files in os.walk(self.static_folder):
+            for name in files:
+                if name.endswith((".gz", ".br")) or name == MANIFEST:
+                    continue
+                path = os.path.relpath(os.path.join(root, name),
+                                       self.static_folder)\
+                    .replace(os.sep, "/")
+                if not path.startswith(self.exclude):
+                    yield path
+
+    def precompress(self) -> int:
+        """
+        Write ``.gz`` and, if brotli is installed, ``.br`` files.
+
+        Only text assets are compressed; pictures are already compressed.
+
+        Returns:
+            int: the number of files compressed.
+        """
+
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+
+        count = 0
+        for filename in self._walk():
+            if not filename.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(self.static_folder, filename)
+            with open(path, "rb") as f:
+                data = f.read()
+            _write(path + ".gz", gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                _write(path + ".br", brotli.compress(data))
+            count += 1
+        return count
+
+
+def _is_fresh(compressed, source) -> bool:
+    try:
+        return os.path.getmtime(compressed) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def _write(path, data) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@click.group("assets")
+def assets_cli():
+    """Manage static assets."""
+
+
+@assets_cli.command("build")
+@with_appcontext
+def build() -> None:
+    """Fingerprint and precompress the static folder."""
+
+    assets = current_app.extensions["assets"]
+    count = assets.precompress()
+    assets.manifest = assets.build_manifest()
+    _write(os.path.join(assets.static_folder, MANIFEST),
+           json.dumps(assets.manifest, indent=2, sort_keys=True).encode())
+    click.echo(f"Fingerprinted {len(assets.manifest)} files, "
+               f"compressed {count}.")
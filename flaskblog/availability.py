@@ -0,0 +1,149 @@
+import hashlib
+import math
+import threading
+import time
+from sqlalchemy import select
+
+
+class BloomFilter:
+    """
+    A set that can answer "definitely not in it" without storing the keys.
+
+    Membership tests are wrong at most ``error_rate`` of the time, and only
+    by claiming a key is present.  Keys cannot be removed.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate)
+                            / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, key) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+
+class AccountNames:
+    """
+    Tell whether a username or email is free, mostly without the database.
+
+    Every taken username and email is kept, lowercased, in a Bloom filter
+    per worker.  A name missing from the filter is free; a name found in it
+    is confirmed with an indexed query, since the filter has false
+    positives and keeps names their owners have since changed.
+
+    Names registered or changed in this worker are added at once.  Users
+    who signed up through other workers are picked up every
+    ``AVAILABILITY_REFRESH`` seconds, and the filter is rebuilt every
+    ``AVAILABILITY_REBUILD`` seconds to catch renames.  The final say is
+    always the registration form's own validation.
+    """
+
+    def __init__(self, app=None):
+        self._filter = None
+        self._last_id = 0
+        self._refresh_at = self._rebuild_at = 0.0
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.queries = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.error_rate = app.config.get("AVAILABILITY_ERROR_RATE", 0.01)
+        self.refresh = app.config.get("AVAILABILITY_REFRESH", 5)
+        self.rebuild = app.config.get("AVAILABILITY_REBUILD", 600)
+        app.extensions["account_names"] = self
+
+    @staticmethod
+    def _key(kind, value) -> str:
+        return f"{kind}:{value.lower()}"
+
+    def _load(self, bloom, after) -> int:
+        from flaskblog import db
+        from flaskblog.models import User
+
+        last = after
+        rows = db.session.execute(
+            select(User.id, User.username, User.email)
+            .where(User.id > after).order_by(User.id)
+            .execution_options(yield_per=10_000))
+        for user_id, username, email in rows:
+            bloom.add(self._key("username", username))
+            bloom.add(self._key("email", email))
+            last = user_id
+        return last
+
+    def _current(self) -> BloomFilter:
+        from flaskblog import db
+        from flaskblog.models import User
+
+        now = time.monotonic()
+        if self._filter is not None and now < self._refresh_at:
+            return self._filter
+
+        with self._lock:
+            bloom = self._filter
+            if bloom is None or now >= self._rebuild_at \
+                    or bloom.count >= bloom.capacity:
+                # Sized from the highest id, which unlike a count needs
+                # no scan: two keys per user, with room to grow.
+                users = db.session.query(db.func.max(User.id)).scalar() or 0
+                bloom = BloomFilter(max(users * 4, 1024), self.error_rate)
+                self._last_id = self._load(bloom, 0)
+                self._rebuild_at = now + self.rebuild
+                self._filter = bloom
+            elif now >= self._refresh_at:
+                self._last_id = self._load(bloom, self._last_id)
+            self._refresh_at = now + self.refresh
+            return bloom
+
+    def add(self, username, email) -> None:
+        """Record a username and email as taken."""
+
+        bloom = self._filter
+        if bloom is not None:
+            with self._lock:
+                bloom.add(self._key("username", username))
+                bloom.add(self._key("email", email))
+
+    def is_available(self, kind, value) -> bool:
+        """
+        Check whether a username or email is free.
+
+        Args:
+            kind (str): "username" or "email".
+            value (str): the name to check.
+
+        Returns:
+            bool: True if no account has ``value``, ignoring case.
+        """
+
+        from flaskblog.models import User
+
+        self.checks += 1
+        if self._key(kind, value) not in self._current():
+            return True
+
+        self.queries += 1
+        find = User.find_by_username if kind == "username" \
+            else User.find_by_email
+        return find(value) is None
+
+    def metrics(self) -> dict:
+        return {"checks_total": self.checks, "queries_total": self.queries}
@@ -0,0 +1,456 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import abort, current_app, g, make_response, request, session
+from flask_login import current_user
+
+
+class LRUBackend:
+    """
+    An in-process cache with size and TTL eviction.
+
+    Entries live in an ordered dict; reads move an entry to the end and
+    inserts beyond ``max_entries`` evict from the front.  Each worker
+    process keeps its own copy.
+    """
+
+    def __init__(self, max_entries=1024, default_timeout=300):
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._key_tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None, tags=()) -> None:
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._key_tags[key] = set(tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, *keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def invalidate(self, *tags) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def _remove(self, key) -> None:
+        self._entries.pop(key, None)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisBackend:
+    """
+    A cache shared between workers through Redis.
+
+    Any client with the redis-py interface works, so tests can pass a
+    ``fakeredis.FakeRedis`` instead of a real server.  Tags are kept as
+    Redis sets of keys.
+    """
+
+    def __init__(self, client=None, url=None, default_timeout=300,
+                 prefix="flaskblog:"):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.default_timeout = default_timeout
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, timeout=None, tags=()) -> None:
+        timeout = self.default_timeout if timeout is None else timeout
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, pickle.dumps(value), ex=timeout)
+        for tag in tags:
+            pipe.sadd(self.prefix + "tag:" + tag, key)
+            pipe.expire(self.prefix + "tag:" + tag, timeout)
+        pipe.execute()
+
+    def delete(self, *keys) -> None:
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def invalidate(self, *tags) -> None:
+        for tag in tags:
+            tag_key = self.prefix + "tag:" + tag
+            keys = self.client.smembers(tag_key)
+            self.delete(*(key.decode("utf-8") if isinstance(key, bytes)
+                          else key for key in keys))
+            self.client.delete(tag_key)
+
+
+class NullBackend:
+    """A cache that stores nothing."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None, tags=()) -> None:
+        pass
+
+    def delete(self, *keys) -> None:
+        pass
+
+    def invalidate(self, *tags) -> None:
+        pass
+
+
+def make_backend(config, cache_type, max_entries, timeout, prefix):
+    """
+    Create a cache backend.
+
+    Args:
+        config (Config): the app config, for the Redis settings.
+        cache_type (str): "lru", "redis" or "null".
+        max_entries (int): the LRU backend's size.
+        timeout (int): the default TTL in seconds.
+        prefix (str): the Redis key prefix.
+
+    Returns:
+        LRUBackend | RedisBackend | NullBackend: the backend.
+    """
+
+    if cache_type == "lru":
+        return LRUBackend(max_entries, timeout)
+    if cache_type == "redis":
+        return RedisBackend(config.get("CACHE_REDIS_CLIENT"),
+                            config.get("CACHE_REDIS_URL"), timeout, prefix)
+    return NullBackend()
+
+
+class PageCache:
+    """
+    Cache rendered pages for anonymous readers.
+
+    Pages are keyed by endpoint, url arguments and auth state.  Views tag
+    what they render (``post:<id>``, ``author:<id>``, ``feed:home`` ...) with
+    ``tag`` and writes drop exactly the pages carrying a tag with
+    ``invalidate``.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.backend = make_backend(
+            app.config,
+            app.config.get("CACHE_TYPE", "lru"),
+            app.config.get("CACHE_MAX_ENTRIES", 1024),
+            app.config.get("CACHE_DEFAULT_TIMEOUT", 300),
+            "flaskblog:page:")
+        app.extensions["page_cache"] = self
+
+    def cached(self, view):
+        """
+        Serve a view from the cache for anonymous GET requests.
+
+        Only successful responses without cookies are stored, and requests
+        with pending flash messages always render fresh.  Streamed responses
+        are stored once their last chunk has been sent.
+        """
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if isinstance(self.backend, NullBackend) \
+                    or request.method != "GET" \
+                    or current_user.is_authenticated or "_flashes" in session:
+                return view(*args, **kwargs)
+
+            key = self.make_key()
+            hit = self.backend.get(key)
+            if hit is not None:
+                body, status, headers = hit
+                response = current_app.response_class(body, status, headers)
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            g.cache_tags = set()
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 \
+                    and "Set-Cookie" not in response.headers:
+                headers = [("Content-Type", response.content_type)]
+                if response.is_streamed:
+                    response.response = self._store_streamed(
+                        key, response.response, headers, g.cache_tags)
+                else:
+                    self.backend.set(key,
+                                     (response.get_data(), 200, headers),
+                                     tags=g.cache_tags)
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    def _store_streamed(self, key, chunks, headers, tags):
+        # Pass the chunks through and store the body if all of it was sent.
+        # ``tags`` is the request's own set, so tags added while the body is
+        # generated count too.
+        body = []
+        try:
+            for chunk in chunks:
+                body.append(chunk.encode("utf-8") if isinstance(chunk, str)
+                            else chunk)
+                yield chunk
+            self.backend.set(key, (b"".join(body), 200, headers), tags=tags)
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+
+    @staticmethod
+    def make_key() -> str:
+        """
+        Build the cache key for the current request.
+
+        Returns:
+            str: the endpoint, sorted url arguments and auth state.
+        """
+
+        auth = "user" if current_user.is_authenticated else "anon"
+        args = sorted((request.view_args or {}).items())
+        args += sorted(request.args.items(multi=True))
+        return f"page:{request.endpoint}:{auth}:{urlencode(args)}"
+
+    @staticmethod
+    def tag(*tags) -> None:
+        """Tag the page being rendered."""
+
+        if "cache_tags" in g:
+            g.cache_tags.update(tags)
+
+    def invalidate(self, *tags) -> None:
+        """Drop every cached page carrying one of ``tags``."""
+
+        self.backend.invalidate(*tags)
+
+
+class IdentityCache:
+    """
+    Cache the logged-in user's row between requests.
+
+    Entries are keyed by user id and a per-user version.  ``invalidate``
+    moves the version on, so a snapshot stored by a request that read the
+    row before the change is never served afterwards.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.timeout = app.config.get("USER_CACHE_TIMEOUT", 60)
+        self.backend = make_backend(
+            app.config,
+            app.config.get("USER_CACHE_TYPE", app.config.get("CACHE_TYPE")),
+            app.config.get("USER_CACHE_MAX_ENTRIES", 4096),
+            self.timeout,
+            "flaskblog:user:")
+        app.extensions["identity_cache"] = self
+
+    def _key(self, user_id) -> str:
+        version = self.backend.get(f"version:{user_id}") or 0
+        return f"{user_id}:{version}"
+
+    def get(self, user_id) -> dict:
+        """Return the cached columns of a user, or None."""
+
+        return self.backend.get(self._key(user_id))
+
+    def set(self, user_id, data) -> None:
+        """Cache the columns of a user."""
+
+        self.backend.set(self._key(user_id), data, self.timeout)
+
+    def invalidate(self, user_id) -> None:
+        """Forget the cached columns of a user."""
+
+        # The version outlives the entries it guards.
+        self.backend.set(f"version:{user_id}", time.time_ns(),
+                         self.timeout * 10)
+
+
+class MissingCache:
+    """
+    Remember lookups that found nothing.
+
+    Scrapers request post ids and usernames that do not exist, over and
+    over.  Views record each miss with ``or_404`` and are wrapped in
+    ``guard``, which answers a known miss with a 404 before anything
+    touches the database.  Creating a post or an account must ``discard``
+    its key, and misses expire after ``MISSING_CACHE_TIMEOUT`` seconds.
+    Each kind of key is described once with ``register``.
+
+    ``discard`` only reaches other workers through Redis, which is the
+    default when the page cache uses it.  A miss stored there is checked
+    against the primary afterwards, so a key created meanwhile, or not yet
+    on a lagging replica, is not left as a 404.  With a per-worker LRU
+    only keys below the highest one are kept, such as deleted post ids,
+    since a new post or account is never a 404 elsewhere.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.shared = False
+        self.kinds = {}
+        self.hits = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.backend = make_backend(
+            app.config,
+            app.config.get("MISSING_CACHE_TYPE", app.config.get("CACHE_TYPE")),
+            app.config.get("MISSING_CACHE_MAX_ENTRIES", 10_000),
+            app.config.get("MISSING_CACHE_TIMEOUT", 60),
+            "flaskblog:missing:")
+        self.shared = isinstance(self.backend, RedisBackend)
+        self.highest_timeout = app.config.get("MISSING_CACHE_HIGHEST_TIMEOUT",
+                                              5)
+        app.extensions["missing_cache"] = self
+
+    def register(self, kind, exists, highest=None) -> None:
+        """
+        Describe a kind of key.
+
+        Args:
+            kind (str): what the keys name, e.g. "post" or "user".
+            exists (function): tells whether a key exists.  It is called
+                on the primary database.
+            highest (function): returns the highest key, for kinds whose
+                new keys are always higher, like autoincrement ids.
+        """
+
+        self.kinds[kind] = (exists, highest)
+
+    def guard(self, kind, arg):
+        """
+        Answer requests for a known-missing key with a 404.
+
+        Args:
+            kind (str): what the key names, e.g. "post" or "user".
+            arg (str): the view argument holding the key.
+        """
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend.get(f"{kind}:{kwargs[arg]}") is not None:
+                    with self._lock:
+                        self.hits += 1
+                    abort(404)
+                return view(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def or_404(self, kind, key, value):
+        """
+        Return ``value``, or ``remember`` the miss and abort if it is None.
+
+        Raises:
+            NotFound: if ``value`` is None.
+        """
+
+        if value is None:
+            self.remember(kind, key)
+            abort(404)
+        return value
+
+    def remember(self, kind, key) -> None:
+        """Remember that nothing has ``key``, if no worker can miss it."""
+
+        from flaskblog.database import primary
+
+        exists, highest = self.kinds[kind]
+        if self.shared:
+            # Stored first and checked after: a key created before the
+            # check is found by it, one created later is discarded by its
+            # creator.
+            self.add(kind, key)
+            with primary():
+                if exists(key):
+                    self.discard(kind, key)
+        elif isinstance(self.backend, LRUBackend) and highest is not None \
+                and key < self._highest(kind, highest):
+            self.add(kind, key)
+
+    def _highest(self, kind, highest):
+        # Remembered briefly.  A stale value is usually lower than the real
+        # one, which only means fewer misses are kept.
+        value = self.backend.get(f"highest:{kind}")
+        if value is None:
+            value = highest() or 0
+            self.backend.set(f"highest:{kind}", value, self.highest_timeout)
+        return value
+
+    def add(self, kind, key) -> None:
+        """Remember that nothing has ``key``."""
+
+        with self._lock:
+            self.stored += 1
+        self.backend.set(f"{kind}:{key}", True)
+
+    def discard(self, kind, key) -> None:
+        """Forget a miss, because ``key`` now exists."""
+
+        self.backend.delete(f"{kind}:{key}")
+
+    def metrics(self) -> dict:
+        return {"hits_total": self.hits, "stored_total": self.stored}
+
+
+def post_tags(posts) -> list:
+    """
+    Build the cache tags for a list of rendered posts.
+
+    Args:
+        posts (list): the posts on the page.
+
+    Returns:
+        list: a ``post:<id>`` and ``author:<id>`` tag per post.
+    """
+
+    tags = []
+    for post in posts:
+        tags += [f"post:{post.id}", f"author:{post.user_id}"]
+    return tags
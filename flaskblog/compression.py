@@ -0,0 +1,126 @@
+import zlib
+from flask import request
+
+MIMETYPES = ("text/html", "text/css", "text/plain", "text/xml",
+             "text/javascript", "application/javascript", "application/json",
+             "application/xml", "application/atom+xml", "application/rss+xml",
+             "application/x-ndjson", "image/svg+xml")
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, brotli, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class Compression:
+    """
+    Compress responses for clients that accept it.
+
+    Responses of ``COMPRESS_MIMETYPES`` of at least ``COMPRESS_MIN_SIZE``
+    bytes are sent gzip encoded, or br encoded when the ``brotli`` package
+    is installed and the client prefers it.  Static files are left alone,
+    since ``Assets`` serves their precompressed variants.
+
+    Streamed responses are compressed chunk by chunk, and every chunk is
+    flushed, so a streamed page still reaches the client as it renders.
+    Strong ETags are made weak, which keeps conditional GETs answering 304
+    for both encodings.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        config = app.config
+        self.enabled = config.get("COMPRESS_ENABLED", True)
+        self.min_size = config.get("COMPRESS_MIN_SIZE", 500)
+        self.level = config.get("COMPRESS_LEVEL", 6)
+        self.brotli_quality = config.get("COMPRESS_BROTLI_QUALITY", 4)
+        self.mimetypes = frozenset(config.get("COMPRESS_MIMETYPES",
+                                              MIMETYPES))
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        self._brotli = brotli
+        self.encodings = ["gzip"] if brotli is None else ["br", "gzip"]
+        app.extensions["compression"] = self
+        if self.enabled:
+            app.after_request(self.compress)
+
+    def _compressor(self, encoding):
+        if encoding == "br":
+            return _Brotli(self._brotli, self.brotli_quality)
+        return _Gzip(self.level)
+
+    def compress(self, response):
+        """Encode ``response`` if it and the request allow it."""
+
+        if response.direct_passthrough or response.status_code < 200 \
+                or response.status_code in (204, 206, 304) \
+                or "Content-Encoding" in response.headers \
+                or response.mimetype not in self.mimetypes \
+                or response.cache_control.no_transform:
+            return response
+
+        if not response.is_streamed:
+            length = response.calculate_content_length()
+            if length is None or length < self.min_size:
+                return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        compressor = self._compressor(encoding)
+        if response.is_streamed:
+            response.response = self._stream(response.iter_encoded(),
+                                             response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            response.set_data(compressor.compress(response.get_data())
+                              + compressor.finish())
+        response.content_encoding = encoding
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    @staticmethod
+    def _stream(chunks, original, compressor):
+        try:
+            for chunk in chunks:
+                data = compressor.compress(chunk) + compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            if hasattr(original, "close"):
+                original.close()
@@ -0,0 +1,153 @@
+import hashlib
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import func
+from werkzeug.http import is_resource_modified
+from flaskblog import db, missing_cache
+from flaskblog.models import Post, User
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong ETag.
+
+    The parts are combined with the url arguments and auth state, since the
+    same version renders differently per page and per viewer.
+
+    Returns:
+        str: a hex digest of the parts.
+    """
+
+    viewer = current_user.get_id() if current_user.is_authenticated else ""
+    args = sorted(request.args.items(multi=True))
+    raw = repr((request.endpoint, parts, args, viewer))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def conditional(validators):
+    """
+    Answer conditional GETs for a view.
+
+    ``validators`` receives the view arguments and returns an
+    ``(etag, last_modified)`` pair, or None to leave the request to the
+    view.  Validators that look up a single resource answer a missing one
+    with ``missing_cache.or_404``, so a miss costs one query.  When the
+    request's ``If-None-Match``/``If-Modified-Since`` match, a 304 is
+    returned without calling the view at all.
+
+    Args:
+        validators (function): computes the validators for a request.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD") or "_flashes" in session:
+                return view(*args, **kwargs)
+
+            found = validators(*args, **kwargs)
+            if found is None:
+                return view(*args, **kwargs)
+
+            etag, last_modified = found
+            if not is_resource_modified(request.environ, etag,
+                                        last_modified=last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            response.vary.add("Cookie")
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def feed_version(query) -> tuple:
+    """
+    Compute the version of a bounded set of posts.
+
+    A single aggregate: the latest modification and the number of posts.
+    Creating or editing a post moves the first, deleting one changes the
+    second.  Only use it on queries an index bounds, such as a range of
+    ids; whole feeds follow their authors' ``last_modified``.
+
+    Args:
+        query (Query): the posts' query.
+
+    Returns:
+        tuple: the latest ``last_modified`` and the post count.
+    """
+
+    return query.order_by(None)\
+        .with_entities(func.max(Post.last_modified), func.count(Post.id))\
+        .one()
+
+
+def feed_validators(query) -> tuple:
+    """
+    Validators for a bounded set of posts, or None if there are none.
+
+    Deleting a post only changes the count, so clients that send just
+    ``If-Modified-Since`` may keep the page until the next modification;
+    ``If-None-Match`` takes precedence and always sees the change.
+    """
+
+    last_modified, count = feed_version(query)
+    if not count:
+        return None
+    return make_etag(last_modified, count), last_modified
+
+
+def home_validators() -> tuple:
+    """
+    Validators for the home feed.
+
+    Writing, editing or deleting a post and changing an account all move
+    the author's ``last_modified``, so the latest of them, read from its
+    index, versions every page that lists posts.
+    """
+
+    last_modified = db.session.query(func.max(User.last_modified)).scalar()
+    if last_modified is None:
+        return None
+    return make_etag(last_modified), last_modified
+
+
+def user_feed_validators(username) -> tuple:
+    """Validators for a user's feed."""
+
+    last_modified = missing_cache.or_404(
+        "user", username, db.session.query(User.last_modified)
+        .filter_by(username=username).scalar())
+    return make_etag(last_modified), last_modified
+
+
+def post_validators(post_id) -> tuple:
+    """
+    Validators for a single post.
+
+    The post's own modification time plus its author's, since the page
+    shows the author's name and picture.
+
+    Args:
+        post_id (int): the post's id.
+
+    Returns:
+        tuple: the ETag and Last-Modified.
+    """
+
+    row = missing_cache.or_404(
+        "post", post_id,
+        db.session.query(Post.last_modified,
+                         User.last_modified.label("author_modified"))
+        .join(Post.author).filter(Post.id == post_id).first())
+    return make_etag(post_id, row.last_modified, row.author_modified), \
+        max(row.last_modified, row.author_modified)
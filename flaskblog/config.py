@@ -4,8 +4,180 @@ import os
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.environ.get("SQLALCHEMY_DATABASE_URI")
-    MAIL_SERVER = "smtp.googlemail.com"
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    # GET views marked read_replica read from this database when it is set.
+    SQLALCHEMY_REPLICA_URI = os.environ.get("SQLALCHEMY_REPLICA_URI")
+    # Engine settings, turned into SQLALCHEMY_ENGINE_OPTIONS by create_app
+    # unless that is set directly.  DB_STATEMENT_TIMEOUT is in milliseconds
+    # and applies to Postgres; 0 disables it.
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 10
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
+    DB_STATEMENT_TIMEOUT = 0
+    SQLITE_WAL = True
+    SQLITE_BUSY_TIMEOUT = 5000
+    # Under asgi.py Flask runs on ASGI_THREADS threads while the event loop
+    # handles the sockets.  Views, and their queries, still hold a thread.
+    ASGI_THREADS = 32
+    MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.googlemail.com")
+    MAIL_PORT = int(os.environ.get("MAIL_PORT", 587))
+    MAIL_USE_TLS = os.environ.get("MAIL_USE_TLS", "1") == "1"
     MAIL_USERNAME = os.environ.get("EMAIL_USER")
-    MAIL_PASSWORD = os.environ.get("EMAIL_PASS")
\ No newline at end of file
+    MAIL_PASSWORD = os.environ.get("EMAIL_PASS")
+    # "offset" keeps numbered pages, "cursor" switches the feeds to keyset
+    # pagination.  Feed totals are kept in the page cache for FEED_COUNT_TTL
+    # seconds.
+    FEED_PAGINATION = os.environ.get("FEED_PAGINATION", "offset")
+    FEED_COUNT_TTL = int(os.environ.get("FEED_COUNT_TTL", 30))
+    # Posts in the Atom and RSS feeds.
+    FEED_ENTRIES = 50
+    # bcrypt cost, and how many hashes may run at once.  Requests that wait
+    # longer than BCRYPT_QUEUE_TIMEOUT seconds for a slot get a 503.
+    BCRYPT_LOG_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
+    BCRYPT_WORKERS = 2
+    BCRYPT_QUEUE_TIMEOUT = 2.0
+    # Requests are sorted into classes by endpoint or blueprint name (see
+    # flaskblog.admission.ENDPOINTS); anything unlisted is "read".  Each
+    # class runs at most "limit" requests at once and queues up to "queue"
+    # more for ADMISSION_QUEUE_TIMEOUT seconds.  The rest get a 503.
+    ADMISSION_CONTROL = True
+    ADMISSION_CLASSES = {"read": (32, 64), "auth": (4, 8), "write": (4, 8),
+                         "bulk": (2, 2)}
+    ADMISSION_QUEUE_TIMEOUT = 1.0
+    ADMISSION_RETRY_AFTER = 2
+    # Failed logins allowed per (attempts, seconds) before refusing more.
+    # An account is locked for one address well before it is locked for
+    # everyone, so a stranger's failures rarely shut its owner out.
+    LOGIN_LIMIT_PER_IP = (20, 300)
+    LOGIN_LIMIT_PER_ACCOUNT_AND_IP = (5, 300)
+    LOGIN_LIMIT_PER_ACCOUNT = (50, 900)
+    # Outgoing mail is delivered by a background worker in batches.
+    MAIL_QUEUE_ASYNC = True
+    MAIL_QUEUE_SIZE = 100
+    MAIL_QUEUE_BATCH = 20
+    MAIL_QUEUE_RETRIES = 3
+    MAIL_QUEUE_BACKOFF = 1.0
+    # Profile pictures are stored once per size in PICTURE_FORMAT.  Decoding
+    # runs in a pool of PICTURE_WORKERS processes (0 decodes inline), which
+    # import the main module again, so scripts that save pictures need an
+    # ``if __name__ == "__main__"`` guard.
+    PICTURE_SIZES = (65, 125)
+    PICTURE_FORMAT = "WEBP"
+    PICTURE_QUALITY = 80
+    PICTURE_MAX_BYTES = 5 * 1024 * 1024
+    PICTURE_MAX_PIXELS = 25_000_000
+    PICTURE_WORKERS = 2
+    # Uploaded pictures are kept by MEDIA_STORAGE: "local" files in
+    # MEDIA_ROOT (static/profile_pics by default) or an "s3" bucket, which
+    # may be MinIO at MEDIA_S3_ENDPOINT_URL.  Local files can be handed to
+    # nginx through an internal location at MEDIA_ACCEL_REDIRECT, or to
+    # Apache with USE_X_SENDFILE.  "flask media gc" deletes pictures older
+    # than MEDIA_GC_GRACE seconds that no user has.
+    MEDIA_STORAGE = os.environ.get("MEDIA_STORAGE", "local")
+    MEDIA_ROOT = os.environ.get("MEDIA_ROOT")
+    MEDIA_MAX_AGE = 365 * 24 * 60 * 60
+    MEDIA_ACCEL_REDIRECT = os.environ.get("MEDIA_ACCEL_REDIRECT")
+    MEDIA_S3_BUCKET = os.environ.get("MEDIA_S3_BUCKET")
+    MEDIA_S3_PREFIX = os.environ.get("MEDIA_S3_PREFIX", "profile_pics/")
+    MEDIA_S3_ENDPOINT_URL = os.environ.get("MEDIA_S3_ENDPOINT_URL")
+    MEDIA_S3_PUBLIC_URL = os.environ.get("MEDIA_S3_PUBLIC_URL")
+    MEDIA_GC_GRACE = 3600
+    # The logged-in user's row is cached per worker, or in Redis when
+    # USER_CACHE_TYPE is "redis".
+    USER_CACHE_TYPE = os.environ.get("USER_CACHE_TYPE", "lru")
+    USER_CACHE_TIMEOUT = 60
+    USER_CACHE_MAX_ENTRIES = 4096
+    # Post ids and usernames that were not found, answered with a 404
+    # without a query for MISSING_CACHE_TIMEOUT seconds.  Shared when
+    # MISSING_CACHE_TYPE (by default CACHE_TYPE) is "redis"; a per-worker
+    # cache only keeps post ids below the highest one, which it reads every
+    # MISSING_CACHE_HIGHEST_TIMEOUT seconds.
+    MISSING_CACHE_TIMEOUT = 60
+    MISSING_CACHE_HIGHEST_TIMEOUT = 5
+    MISSING_CACHE_MAX_ENTRIES = 10_000
+    # The sign-up form's live availability check keeps taken usernames and
+    # emails in a Bloom filter per worker.  It picks up new users every
+    # AVAILABILITY_REFRESH seconds and is rebuilt every AVAILABILITY_REBUILD.
+    AVAILABILITY_ERROR_RATE = 0.01
+    AVAILABILITY_REFRESH = 5
+    AVAILABILITY_REBUILD = 600
+    # Compiled templates are cached on disk, in the instance folder unless
+    # JINJA_BYTECODE_CACHE_DIR is set, so new workers skip compiling them.
+    # JINJA_PRELOAD compiles them all at startup instead of on first use.
+    JINJA_BYTECODE_CACHE = True
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get("JINJA_BYTECODE_CACHE_DIR")
+    JINJA_PRELOAD = False
+    # Static files are served under content-hashed names for ASSETS_MAX_AGE.
+    # ASSETS_EXCLUDE leaves out directories of uploads, which /media serves.
+    ASSETS_FINGERPRINT = True
+    ASSETS_MAX_AGE = 365 * 24 * 60 * 60
+    ASSETS_EXCLUDE = ("profile_pics",)
+    # Responses of COMPRESS_MIMETYPES of at least COMPRESS_MIN_SIZE bytes
+    # are gzip encoded, or br encoded with the brotli package installed.
+    # Turn it off when a proxy in front of the app already compresses.
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+    # STREAM_TEMPLATES sends the feed pages' head and navbar before their
+    # posts are loaded, in writes of about STREAM_BUFFER_SIZE characters.
+    # Pages the page cache stores are always rendered whole.
+    STREAM_TEMPLATES = False
+    STREAM_BUFFER_SIZE = 8192
+    # Page cache for anonymous readers: "lru", "redis" or "null".
+    CACHE_TYPE = os.environ.get("CACHE_TYPE", "lru")
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_DEFAULT_TIMEOUT = 300
+    # Request, SQL and template timings are served on METRICS_PATH for
+    # Prometheus and sent to the browser in a Server-Timing header.
+    # Statements slower than SLOW_QUERY_SECONDS are logged with their plan.
+    # The metrics page is off unless METRICS_PATH is set, and with
+    # METRICS_TOKEN set it needs "Authorization: Bearer <token>".
+    METRICS_ENABLED = True
+    METRICS_PATH = os.environ.get("METRICS_PATH")
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    SERVER_TIMING = True
+    SLOW_QUERY_SECONDS = 0.2
+    SLOW_QUERY_EXPLAIN = True
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    SECRET_KEY = os.environ.get("SECRET_KEY", "development")
+    SQLALCHEMY_DATABASE_URI = os.environ.get("SQLALCHEMY_DATABASE_URI",
+                                             "sqlite:///site.db")
+    # Edits to templates and CSS should show up on the next reload.
+    CACHE_TYPE = "null"
+    ASSETS_FINGERPRINT = False
+    METRICS_PATH = os.environ.get("METRICS_PATH", "/metrics")
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SECRET_KEY = "testing"
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    MAIL_QUEUE_ASYNC = False
+    PICTURE_WORKERS = 0
+    CACHE_TYPE = "null"
+    USER_CACHE_TYPE = "null"
+    JINJA_BYTECODE_CACHE = False
+
+
+class ProductionConfig(Config):
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_STATEMENT_TIMEOUT = 5000
+    FEED_PAGINATION = os.environ.get("FEED_PAGINATION", "cursor")
+    JINJA_PRELOAD = True
+
+
+config_by_name = {
+    "development": DevelopmentConfig,
+    "testing": TestingConfig,
+    "production": ProductionConfig,
+    "default": Config,
+}
@@ -0,0 +1,129 @@
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_app_context
+from flask_login import current_user
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA = "replica"
+
+
+class RoutingSession(Session):
+    """
+    A session that sends reads to a replica when asked to.
+
+    Views wrapped in ``read_replica`` run their queries on the ``replica``
+    bind.  Everything else, and any flush, uses the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() \
+                and g.get("use_replica") and REPLICA in self._db.engines:
+            return self._db.engines[REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind,
+                                **kwargs)
+
+
+def read_replica(view):
+    """
+    Run a read-only view against the replica.
+
+    Logged-in users stay on the primary so they always see their own
+    writes, however far the replica lags.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = not current_user.is_authenticated
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def primary():
+    """Send the queries inside to the primary, even under ``read_replica``."""
+
+    previous = g.get("use_replica")
+    g.use_replica = False
+    try:
+        yield
+    finally:
+        g.use_replica = previous
+
+
+def engine_options(config, uri) -> dict:
+    """
+    Build the engine options for a database url.
+
+    Pool settings only apply to pooled databases, so in-memory SQLite gets
+    none.  Postgres gets a server-side statement timeout.
+
+    Args:
+        config (Config): the app config.
+        uri (str): the database url.
+
+    Returns:
+        dict: arguments for ``create_engine``.
+    """
+
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return {}
+        timeout = config["SQLITE_BUSY_TIMEOUT"] / 1000
+        return {"pool_pre_ping": config["DB_POOL_PRE_PING"],
+                "connect_args": {"timeout": timeout}}
+
+    options = {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+    statement_timeout = config["DB_STATEMENT_TIMEOUT"]
+    if url.get_backend_name() == "postgresql" and statement_timeout:
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+def configure_engines(app) -> None:
+    """
+    Fill in the engine settings before the database extension starts.
+
+    ``SQLALCHEMY_ENGINE_OPTIONS`` and ``SQLALCHEMY_BINDS`` set explicitly in
+    the config are left alone.
+    """
+
+    config = app.config
+    uri = config.get("SQLALCHEMY_DATABASE_URI")
+    if uri and not config.get("SQLALCHEMY_ENGINE_OPTIONS"):
+        config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(config, uri)
+
+    replica = config.get("SQLALCHEMY_REPLICA_URI")
+    binds = config.setdefault("SQLALCHEMY_BINDS", {})
+    if replica and REPLICA not in binds:
+        binds[REPLICA] = dict(engine_options(config, replica), url=replica)
+
+
+def configure_sqlite(app, engines) -> None:
+    """Turn on WAL and the busy timeout for every SQLite connection."""
+
+    wal = app.config["SQLITE_WAL"]
+    busy_timeout = int(app.config["SQLITE_BUSY_TIMEOUT"])
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+        if wal:
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
+    for engine in engines:
+        if engine.dialect.name == "sqlite" \
+                and engine.url.database not in (None, "", ":memory:"):
+            event.listen(engine, "connect", on_connect)
@@ -1,15 +1,48 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, current_app, render_template
+from flask_login import current_user
 
 errors = Blueprint("errors", __name__)
 
+
+def render_error(code) -> str:
+    """
+    Render an error page, once per worker.
+
+    Error pages only differ by whether the visitor is logged in, so each is
+    rendered the first time and reused, and floods of 404s cost no template
+    rendering.  Flashed messages are left for the next real page.  With
+    template auto-reload on, as in development, pages render every time.
+    """
+
+    key = (code, current_user.is_authenticated)
+    pages = current_app.extensions.setdefault("error_pages", {})
+    page = pages.get(key)
+    if page is None:
+        page = render_template(f"errors/{code}.html",
+                               get_flashed_messages=lambda **kwargs: [])
+        if not current_app.jinja_env.auto_reload:
+            pages[key] = page
+    return page
+
+
 @errors.app_errorhandler(403)
 def error_403(error):
-    return render_template("errors/403.html"), 403
+    return render_error(403), 403
+
 
 @errors.app_errorhandler(404)
 def error_404(error):
-    return render_template("errors/404.html"), 404
+    return render_error(404), 404
+
 
 @errors.app_errorhandler(500)
-def error_404(error):
-    return render_template("errors/500.html"), 500
+def error_500(error):
+    return render_error(500), 500
+
+
+@errors.app_errorhandler(503)
+def error_503(error):
+    headers = {}
+    if getattr(error, "retry_after", None) is not None:
+        headers["Retry-After"] = str(error.retry_after)
+    return render_error(503), 503, headers
@@ -0,0 +1,228 @@
+from datetime import datetime
+from xml.sax.saxutils import escape
+from flask import (Blueprint,
+                   Response,
+                   abort,
+                   current_app,
+                   request,
+                   stream_with_context,
+                   url_for)
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from flaskblog import cache, db, missing_cache
+from flaskblog.cache import post_tags
+from flaskblog.conditional import (conditional,
+                                   feed_validators,
+                                   home_validators,
+                                   make_etag,
+                                   user_feed_validators)
+from flaskblog.database import read_replica
+from flaskblog.feeds.utils import (FORMATS,
+                                   SITEMAP_SIZE,
+                                   atom_date,
+                                   sitemap_chunk)
+from flaskblog.models import Post, User
+
+feeds = Blueprint("feeds", __name__)
+
+FEED_BATCH = 100
+SITEMAP_BATCH = 5000
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def _post_url():
+    # url_for costs more than the rest of a sitemap line, so build the
+    # post URL once and fill in the id.
+    head, _, tail = url_for("posts.post", post_id=0,
+                            _external=True).rpartition("0")
+    return lambda post_id: f"{head}{post_id}{tail}"
+
+
+def _with_kind(found, kind):
+    # Atom and RSS share their validators but not their bodies.
+    if found is None:
+        return None
+    etag, last_modified = found
+    return make_etag(etag, kind), last_modified
+
+
+def _stream_feed(writer, title, where, alternate, tags):
+    """
+    Stream a feed of the newest ``FEED_ENTRIES`` posts matching ``where``.
+
+    Entries are cached on their own, keyed by post and modification time,
+    so after a new post only that post's entry is rendered and the others'
+    content is not even loaded.
+    """
+
+    stamps = db.session.execute(
+        select(Post.id, Post.last_modified, Post.user_id).where(*where)
+        .order_by(Post.date_posted.desc(), Post.id.desc())
+        .limit(current_app.config.get("FEED_ENTRIES", 50))).all()
+    updated = max((stamp.last_modified for stamp in stamps),
+                  default=datetime.utcnow())
+    cache.tag(*tags)
+    post_url = _post_url()
+    self_url = url_for(request.endpoint, **request.view_args, _external=True)
+
+    def generate():
+        yield writer.head(title, self_url, alternate, updated)
+        for start in range(0, len(stamps), FEED_BATCH):
+            batch = stamps[start:start + FEED_BATCH]
+            keys = {stamp.id: f"feed-entry:{writer.name}:{stamp.id}:"
+                              f"{stamp.last_modified.isoformat()}"
+                    for stamp in batch}
+            entries = {post_id: cache.backend.get(key)
+                       for post_id, key in keys.items()}
+            missing = [post_id for post_id, entry in entries.items()
+                       if entry is None]
+            if missing:
+                posts = db.session.scalars(
+                    select(Post).options(joinedload(Post.author))
+                    .where(Post.id.in_(missing)))
+                for post in posts:
+                    entry = writer.entry(post, post_url(post.id))
+                    cache.backend.set(keys[post.id], entry,
+                                      tags=post_tags([post]))
+                    entries[post.id] = entry
+            cache.tag(*(f"post:{stamp.id}" for stamp in batch),
+                      *(f"author:{stamp.user_id}" for stamp in batch))
+            # A post deleted since the ids were read has no entry.
+            yield "".join(entries[stamp.id] for stamp in batch
+                          if entries[stamp.id] is not None)
+        yield writer.tail()
+
+    return Response(stream_with_context(generate()), mimetype=writer.mimetype)
+
+
+def _site_feed_validators(kind) -> tuple:
+    return _with_kind(home_validators(), kind)
+
+
+@feeds.route("/feed.<any(atom, rss):kind>")
+@read_replica
+@conditional(_site_feed_validators)
+@cache.cached
+def site_feed(kind) -> Response:
+    """
+    The newest posts as an Atom or RSS feed.
+
+    Returns:
+        Response: A streamed feed document.
+    """
+
+    return _stream_feed(FORMATS[kind], "Flask Blog", (),
+                        url_for("main.home", _external=True),
+                        ("feed:home",))
+
+
+def _user_feed_validators(username, kind) -> tuple:
+    return _with_kind(user_feed_validators(username), kind)
+
+
+@feeds.route("/user/<string:username>/feed.<any(atom, rss):kind>")
+@missing_cache.guard("user", "username")
+@read_replica
+@conditional(_user_feed_validators)
+@cache.cached
+def user_feed(username, kind) -> Response:
+    """
+    A user's newest posts as an Atom or RSS feed.
+
+    Returns:
+        Response: A streamed feed document.
+    """
+
+    user = missing_cache.or_404(
+        "user", username, User.query.filter_by(username=username).first())
+    return _stream_feed(FORMATS[kind], f"Flask Blog - {user.username}",
+                        (Post.user_id == user.id,),
+                        url_for("users.user_posts", username=user.username,
+                                _external=True),
+                        (f"feed:user:{user.id}", f"author:{user.id}"))
+
+
+def _chunk_range(number):
+    return Post.id >= number * SITEMAP_SIZE, \
+        Post.id < (number + 1) * SITEMAP_SIZE
+
+
+def _urlset(number) -> Response:
+    cache.tag(f"sitemap:{number}")
+    statement = select(Post.id, Post.last_modified)\
+        .where(*_chunk_range(number))\
+        .order_by(Post.id)\
+        .execution_options(stream_results=True, yield_per=SITEMAP_BATCH)
+    post_url = _post_url()
+    home_url = url_for("main.home", _external=True)
+
+    def generate():
+        yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+               f'<urlset xmlns="{SITEMAP_NS}">')
+        if number == 0:
+            # Post ids start at 1, so the first sitemap has room for this.
+            yield f"<url><loc>{escape(home_url)}</loc></url>"
+        for rows in db.session.execute(statement).partitions():
+            yield "".join(f"<url><loc>{escape(post_url(post_id))}</loc>"
+                          f"<lastmod>{atom_date(last_modified)}</lastmod>"
+                          "</url>"
+                          for post_id, last_modified in rows)
+        yield "</urlset>\n"
+
+    return Response(stream_with_context(generate()),
+                    mimetype="application/xml")
+
+
+@feeds.route("/sitemap.xml")
+@read_replica
+@conditional(home_validators)
+@cache.cached
+def sitemap() -> Response:
+    """
+    The sitemap.
+
+    Blogs with more posts than fit one sitemap get a sitemap index
+    instead, pointing at a sitemap per range of post ids.
+
+    Returns:
+        Response: A sitemap or sitemap index.
+    """
+
+    cache.tag("sitemap")
+    last = sitemap_chunk(db.session.query(func.max(Post.id)).scalar() or 0)
+    if last == 0:
+        return _urlset(0)
+
+    lines = ['<?xml version="1.0" encoding="utf-8"?>\n'
+             f'<sitemapindex xmlns="{SITEMAP_NS}">']
+    for number in range(last + 1):
+        last_modified = db.session.query(func.max(Post.last_modified))\
+            .filter(*_chunk_range(number)).scalar()
+        if last_modified is not None:
+            url = url_for("feeds.sitemap_part", number=number, _external=True)
+            lines.append(f"<sitemap><loc>{escape(url)}</loc>"
+                         f"<lastmod>{atom_date(last_modified)}</lastmod>"
+                         "</sitemap>")
+    lines.append("</sitemapindex>\n")
+    return Response("".join(lines), mimetype="application/xml")
+
+
+def _sitemap_part_validators(number) -> tuple:
+    return feed_validators(Post.query.filter(*_chunk_range(number)))
+
+
+@feeds.route("/sitemap-<int:number>.xml")
+@read_replica
+@conditional(_sitemap_part_validators)
+@cache.cached
+def sitemap_part(number) -> Response:
+    """
+    The sitemap of one range of post ids.
+
+    Returns:
+        Response: A streamed sitemap.
+    """
+
+    if not db.session.query(Post.id).filter(*_chunk_range(number)).first():
+        abort(404)
+    return _urlset(number)
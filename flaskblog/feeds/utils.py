@@ -0,0 +1,105 @@
+from xml.sax.saxutils import escape, quoteattr
+from werkzeug.http import http_date
+from flaskblog.posts.utils import render_content
+
+# URLs per sitemap file, the most the protocol allows.  Sitemaps cover
+# fixed ranges of post ids, so a new or changed post only touches one.
+SITEMAP_SIZE = 50_000
+
+
+def sitemap_chunk(post_id) -> int:
+    """Return the number of the sitemap listing a post."""
+
+    return post_id // SITEMAP_SIZE
+
+
+def sitemap_tags(*post_ids) -> list:
+    """
+    Build the cache tags of the sitemaps listing some posts.
+
+    Returns:
+        list: the index's tag and a ``sitemap:<n>`` tag per sitemap.
+    """
+
+    return ["sitemap", *{f"sitemap:{sitemap_chunk(post_id)}"
+                         for post_id in post_ids}]
+
+
+def atom_date(value) -> str:
+    return value.isoformat(timespec="seconds") + "Z"
+
+
+class Atom:
+    """Writes an Atom 1.0 feed."""
+
+    name = "atom"
+    mimetype = "application/atom+xml"
+
+    @staticmethod
+    def head(title, url, alternate, updated) -> str:
+        return ('<?xml version="1.0" encoding="utf-8"?>\n'
+                '<feed xmlns="http://www.w3.org/2005/Atom">'
+                f"<title>{escape(title)}</title>"
+                f"<id>{escape(url)}</id>"
+                f"<link rel=\"self\" href={quoteattr(url)}/>"
+                f"<link rel=\"alternate\" href={quoteattr(alternate)}/>"
+                f"<updated>{atom_date(updated)}</updated>")
+
+    @staticmethod
+    def entry(post, url) -> str:
+        html = post.content_html or render_content(post.content)
+        return ("<entry>"
+                f"<title>{escape(post.title)}</title>"
+                f"<id>{escape(url)}</id>"
+                f"<link rel=\"alternate\" href={quoteattr(url)}/>"
+                f"<published>{atom_date(post.date_posted)}</published>"
+                f"<updated>{atom_date(post.last_modified)}</updated>"
+                f"<author><name>{escape(post.author.username)}</name></author>"
+                f"<summary>{escape(post.excerpt or '')}</summary>"
+                f"<content type=\"html\">{escape(html)}</content>"
+                "</entry>")
+
+    @staticmethod
+    def tail() -> str:
+        return "</feed>\n"
+
+
+class RSS:
+    """Writes an RSS 2.0 feed."""
+
+    name = "rss"
+    mimetype = "application/rss+xml"
+
+    @staticmethod
+    def head(title, url, alternate, updated) -> str:
+        return ('<?xml version="1.0" encoding="utf-8"?>\n'
+                '<rss version="2.0" '
+                'xmlns:atom="http://www.w3.org/2005/Atom" '
+                'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+                f"<title>{escape(title)}</title>"
+                f"<link>{escape(alternate)}</link>"
+                f"<description>{escape(title)}</description>"
+                f"<atom:link rel=\"self\" href={quoteattr(url)} "
+                f"type=\"application/rss+xml\"/>"
+                f"<lastBuildDate>{http_date(updated)}</lastBuildDate>")
+
+    @staticmethod
+    def entry(post, url) -> str:
+        html = post.content_html or render_content(post.content)
+        return ("<item>"
+                f"<title>{escape(post.title)}</title>"
+                f"<link>{escape(url)}</link>"
+                f"<guid isPermaLink=\"true\">{escape(url)}</guid>"
+                f"<pubDate>{http_date(post.date_posted)}</pubDate>"
+                # <author> must be an email address, so name the author
+                # the way most readers understand.
+                f"<dc:creator>{escape(post.author.username)}</dc:creator>"
+                f"<description>{escape(html)}</description>"
+                "</item>")
+
+    @staticmethod
+    def tail() -> str:
+        return "</channel></rss>\n"
+
+
+FORMATS = {"atom": Atom, "rss": RSS}
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import ServiceUnavailable
+
+
+class PasswordHasher:
+    """
+    Run bcrypt on a small dedicated thread pool.
+
+    At most ``BCRYPT_WORKERS`` hashes run at once.  A request that cannot
+    get a slot within ``BCRYPT_QUEUE_TIMEOUT`` seconds fails with a 503
+    instead of piling up behind a login storm and starving other pages.
+    bcrypt releases the GIL, so the pool uses real cores.
+    """
+
+    def __init__(self, bcrypt, app=None):
+        self._bcrypt = bcrypt
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        workers = app.config.get("BCRYPT_WORKERS", 2)
+        self.rounds = app.config.get("BCRYPT_LOG_ROUNDS", 12)
+        self.queue_timeout = app.config.get("BCRYPT_QUEUE_TIMEOUT", 2.0)
+        self._slots = threading.BoundedSemaphore(workers)
+        self._executor = ThreadPoolExecutor(workers,
+                                            thread_name_prefix="bcrypt")
+        app.extensions["password_hasher"] = self
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ServiceUnavailable("The server is busy, please try again.",
+                                     retry_after=5)
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def generate_password_hash(self, password) -> str:
+        """Hash a password at the configured cost."""
+
+        return self._run(self._bcrypt.generate_password_hash, password,
+                         self.rounds).decode("utf-8")
+
+    def check_password_hash(self, pw_hash, password) -> bool:
+        """Check a password against a hash."""
+
+        return self._run(self._bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash) -> bool:
+        """
+        Tell whether a hash was made with a different cost.
+
+        bcrypt hashes look like ``$2b$12$...`` where 12 is the cost.
+        """
+
+        try:
+            return int(pw_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+class LoginThrottle:
+    """
+    Count failed logins per key in a sliding window.
+
+    Keys are client addresses, account emails, and the two paired.
+    Once a key reaches its limit, attempts are refused before any password
+    is hashed.  Counts are kept per worker process.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_blocked(self, key, limit, window) -> bool:
+        """Tell whether ``key`` has failed ``limit`` times in ``window``s."""
+
+        with self._lock:
+            failures = self._prune(key, window)
+            return failures is not None and len(failures) >= limit
+
+    def fail(self, key, window) -> None:
+        """Record a failed attempt for ``key``."""
+
+        with self._lock:
+            failures = self._prune(key, window)
+            if failures is None:
+                failures = self._failures[key] = deque()
+            failures.append(time.monotonic())
+            self._failures.move_to_end(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    def reset(self, key) -> None:
+        """Forget the failures of ``key``."""
+
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def clear(self) -> None:
+        """Forget every failure."""
+
+        with self._lock:
+            self._failures.clear()
+
+    def _prune(self, key, window):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        cutoff = time.monotonic() - window
+        while failures and failures[0] < cutoff:
+            failures.popleft()
+        return failures
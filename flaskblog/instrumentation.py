@@ -0,0 +1,278 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, abort, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+EXPLAINABLE = ("SELECT", "WITH")
+
+
+class Histogram:
+    """
+    A Prometheus histogram with labels.
+
+    Only the per-bucket counts are kept; they are summed into cumulative
+    ``le`` buckets when rendered.
+    """
+
+    def __init__(self, name, description, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels) -> None:
+        """Record ``value`` for the series named by ``labels``."""
+
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets),
+                                                 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        """Return the histogram in the Prometheus text format."""
+
+        lines = [f"# HELP {self.name} {self.description}",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count))
+                            for labels, (counts, total, count)
+                            in self._series.items())
+
+        for labels, (counts, total, count) in series:
+            names = _labels(zip(self.labels, labels))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(f"{self.name}_bucket{{{names},le=\"{bound}\"}} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_bucket{{{names},le=\"+Inf\"}} {count}")
+            lines.append(f"{self.name}_sum{{{names}}} {total}")
+            lines.append(f"{self.name}_count{{{names}}} {count}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    return ",".join(f"{name}=\"{_escape(value)}\"" for name, value in pairs)
+
+
+class Instrumentation:
+    """
+    Time requests, SQL statements and template rendering.
+
+    Each request is measured end to end and broken down into time spent in
+    the database and in templates.  The numbers are published as
+    histograms in the Prometheus text format on ``METRICS_PATH``, if it is
+    set, and, when ``SERVER_TIMING`` is on, in a ``Server-Timing`` header
+    for the browser's network panel.  ``METRICS_TOKEN`` puts the metrics
+    behind a bearer token.  Statements slower than ``SLOW_QUERY_SECONDS``
+    are logged with their query plan.
+
+    Metrics are kept per worker process, so scrape every worker.  Streamed
+    responses are timed up to their first byte.
+    """
+
+    def __init__(self, app=None):
+        self.requests = Histogram(
+            "flaskblog_request_duration_seconds",
+            "Time to handle a request.",
+            ("endpoint", "method", "status"))
+        self.queries = Histogram(
+            "flaskblog_request_sql_queries",
+            "SQL statements run per request.",
+            ("endpoint",), QUERY_BUCKETS)
+        self.query_time = Histogram(
+            "flaskblog_request_sql_seconds",
+            "Time spent in SQL per request.",
+            ("endpoint",))
+        self.render_time = Histogram(
+            "flaskblog_template_render_seconds",
+            "Time to render a template.",
+            ("template",))
+        self.slow_queries = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        if not app.config.get("METRICS_ENABLED", True):
+            return
+
+        self.app = app
+        self.slow_query_seconds = app.config.get("SLOW_QUERY_SECONDS", 0.2)
+        self.explain = app.config.get("SLOW_QUERY_EXPLAIN", True)
+        self.server_timing = app.config.get("SERVER_TIMING", True)
+        app.extensions["instrumentation"] = self
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+
+        with app.app_context():
+            for engine in app.extensions["sqlalchemy"].engines.values():
+                self.watch(engine)
+
+        self.token = app.config.get("METRICS_TOKEN")
+        path = app.config.get("METRICS_PATH")
+        if path:
+            app.add_url_rule(path, "metrics", self.metrics_view)
+
+    def watch(self, engine) -> None:
+        """Time the statements run on ``engine``."""
+
+        event.listen(engine, "before_cursor_execute", self._start_query)
+        event.listen(engine, "after_cursor_execute", self._finish_query)
+
+    def _start_request(self) -> None:
+        g.timing = {"start": time.perf_counter(), "queries": 0, "sql": 0.0,
+                    "render": 0.0, "renders": []}
+
+    def _finish_request(self, response):
+        timing = g.pop("timing", None)
+        if timing is None:
+            return response
+
+        total = time.perf_counter() - timing["start"]
+        endpoint = request.endpoint or "<unmatched>"
+        self.requests.observe(total, endpoint, request.method,
+                              str(response.status_code))
+        self.queries.observe(timing["queries"], endpoint)
+        self.query_time.observe(timing["sql"], endpoint)
+
+        if self.server_timing:
+            response.headers["Server-Timing"] = ", ".join((
+                f"db;dur={timing['sql'] * 1000:.1f};"
+                f"desc=\"{timing['queries']} queries\"",
+                f"render;dur={timing['render'] * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ))
+        return response
+
+    def _start_render(self, app, template, context) -> None:
+        timing = g.get("timing")
+        if timing is not None:
+            timing["renders"].append(time.perf_counter())
+
+    def _finish_render(self, app, template, context) -> None:
+        timing = g.get("timing")
+        if timing is None or not timing["renders"]:
+            return
+
+        elapsed = time.perf_counter() - timing["renders"].pop()
+        # Only the outermost render counts towards the request's total.
+        if not timing["renders"]:
+            timing["render"] += elapsed
+        self.render_time.observe(elapsed, template.name or "<string>")
+
+    def _start_query(self, conn, cursor, statement, parameters, context,
+                     executemany) -> None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _finish_query(self, conn, cursor, statement, parameters, context,
+                      executemany) -> None:
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+
+        elapsed = time.perf_counter() - starts.pop()
+        if has_request_context():
+            timing = g.get("timing")
+            if timing is not None:
+                timing["queries"] += 1
+                timing["sql"] += elapsed
+
+        if elapsed >= self.slow_query_seconds:
+            self.slow_queries += 1
+            plan = ""
+            if self.explain and not executemany \
+                    and statement.lstrip().upper().startswith(EXPLAINABLE):
+                plan = "\n" + self._plan(conn, statement, parameters)
+            self.app.logger.warning("Slow query (%.1f ms): %s%s",
+                                    elapsed * 1000, statement, plan)
+
+    @staticmethod
+    def _plan(conn, statement, parameters) -> str:
+        # Runs on the raw DBAPI connection so the EXPLAIN itself is neither
+        # timed nor explained.
+        prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" \
+            else "EXPLAIN "
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception as error:
+            return f"(no plan: {error})"
+        finally:
+            cursor.close()
+        return "\n".join(" ".join(str(column) for column in row)
+                         for row in rows)
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text format."""
+
+        lines = []
+        for histogram in (self.requests, self.queries, self.query_time,
+                          self.render_time):
+            lines.extend(histogram.render())
+        lines += ["# HELP flaskblog_slow_queries_total "
+                  "SQL statements slower than SLOW_QUERY_SECONDS.",
+                  "# TYPE flaskblog_slow_queries_total counter",
+                  f"flaskblog_slow_queries_total {self.slow_queries}"]
+
+        mail_queue = self.app.extensions.get("mail_queue")
+        if mail_queue is not None:
+            for name, value in mail_queue.metrics().items():
+                lines += [f"# TYPE flaskblog_mail_queue_{name} gauge",
+                          f"flaskblog_mail_queue_{name} {value}"]
+
+        account_names = self.app.extensions.get("account_names")
+        if account_names is not None:
+            for name, value in account_names.metrics().items():
+                lines += [f"# TYPE flaskblog_availability_{name} counter",
+                          f"flaskblog_availability_{name} {value}"]
+
+        missing_cache = self.app.extensions.get("missing_cache")
+        if missing_cache is not None:
+            for name, value in missing_cache.metrics().items():
+                lines += [f"# TYPE flaskblog_missing_cache_{name} counter",
+                          f"flaskblog_missing_cache_{name} {value}"]
+
+        admission = self.app.extensions.get("admission")
+        if admission is not None:
+            classes = admission.metrics()
+            for name in ("admitted_total", "queued_total", "shed_total",
+                         "active", "waiting"):
+                kind = "counter" if name.endswith("_total") else "gauge"
+                lines.append(f"# TYPE flaskblog_admission_{name} {kind}")
+                lines += [f'flaskblog_admission_{name}{{class="{cls}"}} '
+                          f"{values[name]}"
+                          for cls, values in sorted(classes.items())]
+        return "\n".join(lines) + "\n"
+
+    def metrics_view(self) -> Response:
+        """Serve the metrics to a Prometheus scraper."""
+
+        if self.token and not hmac.compare_digest(
+                request.headers.get("Authorization", "").encode("utf-8"),
+                f"Bearer {self.token}".encode("utf-8")):
+            abort(403)
+        return Response(self.render(),
+                        content_type="text/plain; version=0.0.4; "
+                                     "charset=utf-8")
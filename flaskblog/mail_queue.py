@@ -0,0 +1,165 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MailQueueFull(Exception):
+    """Raised when a message cannot be queued because the queue is full."""
+
+
+class MailQueue:
+    """
+    Deliver mail from a background worker.
+
+    Requests only enqueue a message.  A worker thread drains the queue in
+    batches over one SMTP connection and retries failed messages with
+    exponential backoff.  The queue is bounded so a dead mail server cannot
+    grow it without limit.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._worker = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.stats = {"sent": 0, "failed": 0, "retried": 0, "rejected": 0,
+                      "send_seconds": 0.0, "send_seconds_max": 0.0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.asynchronous = app.config.get("MAIL_QUEUE_ASYNC", True)
+        self.batch_size = app.config.get("MAIL_QUEUE_BATCH", 20)
+        self.retries = app.config.get("MAIL_QUEUE_RETRIES", 3)
+        self.backoff = app.config.get("MAIL_QUEUE_BACKOFF", 1.0)
+        self._queue = queue.Queue(app.config.get("MAIL_QUEUE_SIZE", 100))
+        app.extensions["mail_queue"] = self
+        atexit.register(self.stop)
+
+    def enqueue(self, message) -> None:
+        """
+        Queue a message for delivery.
+
+        When ``MAIL_QUEUE_ASYNC`` is off the message is sent immediately.
+
+        Args:
+            message (Message): the message to send.
+
+        Raises:
+            MailQueueFull: if the queue is at capacity.
+        """
+
+        if not self.asynchronous:
+            self._send_batch([(message, 0)])
+            return
+
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((message, 0))
+        except queue.Full:
+            self.stats["rejected"] += 1
+            raise MailQueueFull("The mail queue is full.") from None
+
+    def metrics(self) -> dict:
+        """
+        Report the queue's state.
+
+        Returns:
+            dict: queue depth, delivery counters and send latency.
+        """
+
+        sent = self.stats["sent"]
+        return dict(self.stats,
+                    depth=self._queue.qsize() if self._queue else 0,
+                    send_seconds_avg=self.stats["send_seconds"] / sent
+                    if sent else 0.0)
+
+    def stop(self, timeout=5.0) -> None:
+        """Flush the queue and stop the worker."""
+
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join(timeout)
+        self._worker = None
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive a fork, so each worker process starts its
+        # own on first use.
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() \
+                    and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run,
+                                            name="mail-queue", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._send_batch(batch)
+                    return
+                batch.append(item)
+
+            self._send_batch(batch)
+
+    def _send_batch(self, batch) -> None:
+        with self.app.app_context():
+            while batch:
+                failed = self._send_over_connection(batch)
+                if not failed:
+                    return
+
+                message, attempts = failed[0]
+                if attempts >= self.retries:
+                    self.stats["failed"] += 1
+                    logger.error("Giving up on mail to %s",
+                                 message.recipients)
+                    failed = failed[1:]
+                else:
+                    self.stats["retried"] += 1
+                    failed[0] = (message, attempts + 1)
+                    time.sleep(self.backoff * 2 ** attempts)
+                batch = failed
+
+    def _send_over_connection(self, batch) -> list:
+        """
+        Send a batch over one connection.
+
+        Returns:
+            list: the unsent messages, starting with the one that failed.
+        """
+
+        sent = 0
+        try:
+            with self.app.extensions["mail"].connect() as connection:
+                for message, _ in batch:
+                    start = time.perf_counter()
+                    connection.send(message)
+                    elapsed = time.perf_counter() - start
+                    sent += 1
+                    self.stats["sent"] += 1
+                    self.stats["send_seconds"] += elapsed
+                    self.stats["send_seconds_max"] = max(
+                        self.stats["send_seconds_max"], elapsed)
+        except Exception:
+            logger.warning("Mail delivery failed, will retry", exc_info=True)
+            return batch[sent:]
+        return []
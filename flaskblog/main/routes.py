@@ -1,11 +1,29 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, jsonify, render_template
+from sqlalchemy.orm import joinedload
 
+from flaskblog import cache
+from flaskblog.cache import post_tags
+from flaskblog.conditional import conditional, home_validators
+from flaskblog.database import read_replica
 from flaskblog.models import Post
+from flaskblog.pagination import check_page, feed_page, paginate_posts
+from flaskblog.posts.utils import WITHOUT_CONTENT, WITHOUT_HTML
+from flaskblog.streaming import render_page
 
 main = Blueprint("main", __name__)
 
+
+def _home_page(cursor_only, options=(), total=None, checked=False):
+    query = Post.query.options(joinedload(Post.author), *options)
+    return paginate_posts(query, "home", cursor_only=cursor_only,
+                          total=total, checked=checked)
+
+
 @main.route("/")
 @main.route("/home")  # both paths take you to the same place
+@read_replica
+@conditional(home_validators)
+@cache.cached
 def home() -> render_template:
     """
     Handle the home page.
@@ -17,11 +35,37 @@ def home() -> render_template:
         function: A rendered template for the home page.
     """
 
-    page = request.args.get("page", 1, type=int)
-    posts = Post.query.order_by(Post.date_posted.desc()).paginate(page=page,
-                                                                  per_page=5)
+    # A streamed page is sent as a 200 before its posts load, so a bad
+    # cursor or page number has to be refused first.
+    total = check_page(Post.query, "home")
+
+    def load_posts():
+        posts = _home_page(False, WITHOUT_CONTENT, total, True)
+        cache.tag("feed:home", *post_tags(posts.items))
+        return posts
+
+    return render_page("home.html", deferred={"posts": load_posts})
+
+
+@main.route("/home.json")
+@read_replica
+@conditional(home_validators)
+@cache.cached
+def home_json() -> str:
+    """
+    Handle the JSON home feed.
+
+    Returns the home feed as JSON using keyset pagination.  Follow the
+    ``next`` and ``prev`` links to move through the feed.
+
+    Returns:
+        str: A JSON page of posts.
+    """
+
+    posts = _home_page(True, WITHOUT_HTML)
+    cache.tag("feed:home", *post_tags(posts.items))
 
-    return render_template("home.html", posts=posts)
+    return jsonify(feed_page(posts, "main.home_json"))
 
 
 @main.route("/about")
@@ -1,15 +1,43 @@
 import time
 from datetime import datetime
 from flask import current_app
-from authlib.jose import jwt
-from authlib.jose.errors import JoseError
 from flask_login import UserMixin
-from flaskblog import db, login_manager
+from sqlalchemy.orm import make_transient_to_detached
+from flaskblog import db, login_manager, missing_cache, user_cache
+
+
+def _to_dict(obj, getters, fields) -> dict:
+    # Only the requested attributes are read, so a deferred column that was
+    # not asked for is never loaded.
+    return {key: get(obj) for key, get in getters.items()
+            if not fields or key in fields}
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """
+    Load the logged-in user.
+
+    The user's columns are cached for ``USER_CACHE_TIMEOUT`` seconds and
+    attached to the session without a SELECT.  The password hash is left
+    out of the cache and loaded only when something reads it.
+    """
+
+    user_id = int(user_id)
+    data = user_cache.get(user_id)
+    if data is not None:
+        user = User(**data)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.set(user_id, user.snapshot())
+    return user
 
 
 class User(db.Model, UserMixin):
@@ -17,10 +45,58 @@ class User(db.Model, UserMixin):
 
     username = db.Column(db.String(20), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    image_file = db.Column(db.String(20), nullable=False, default="default.jpg")
+    image_file = db.Column(db.String(40), nullable=False,
+                           default="default.jpg")
     password = db.Column(db.String(60), nullable=False)
+    post_count = db.Column(db.Integer, nullable=False, default=0,
+                           server_default="0")
+    last_posted_at = db.Column(db.DateTime)
+    # Moved on whenever the account or one of its posts changes.  The
+    # conditional GET validators of the feeds and post pages read it.
+    last_modified = db.Column(db.DateTime, nullable=False,
+                              default=datetime.utcnow, index=True)
+
+    # Write-only: a prolific author's history is never loaded by accident.
+    # Query it with ``user.posts.select()`` or through ``Post.query``.
+    posts = db.relationship("Post", backref="author", lazy="write_only")
 
-    posts = db.relationship("Post", backref="author", lazy=True)
+    @staticmethod
+    def find_taken(username=None, email=None) -> list:
+        """
+        Find the accounts using a username or an email, in one query.
+
+        Args:
+            username (str): a username to look for, ignoring case.
+            email (str): an email to look for, ignoring case.
+
+        Returns:
+            list: the users with either, at most one for each.
+        """
+
+        conditions = []
+        if username:
+            conditions.append(db.func.lower(User.username)
+                              == db.func.lower(username))
+        if email:
+            conditions.append(db.func.lower(User.email)
+                              == db.func.lower(email))
+        if not conditions:
+            return []
+        return User.query.filter(db.or_(*conditions)).limit(2).all()
+
+    @staticmethod
+    def find_by_username(username):
+        """Find the user with ``username``, ignoring case."""
+
+        return User.query.filter(db.func.lower(User.username)
+                                 == db.func.lower(username)).first()
+
+    @staticmethod
+    def find_by_email(email):
+        """Find the user with ``email``, ignoring case."""
+
+        return User.query.filter(db.func.lower(User.email)
+                                 == db.func.lower(email)).first()
 
     def get_reset_token(self, expires=120):
         """
@@ -29,6 +105,9 @@ class User(db.Model, UserMixin):
         Creates a password reset token.
         """
 
+        # authlib pulls in cryptography; load it only for password resets.
+        from authlib.jose import jwt
+
         header = {"alg": "HS256"}
         payload = {
             "user_id": self.id,
@@ -39,6 +118,9 @@ class User(db.Model, UserMixin):
 
     @staticmethod
     def verify_reset_token(token):
+        from authlib.jose import jwt
+        from authlib.jose.errors import JoseError
+
         try:
             deserialized = jwt.decode(token, current_app.config["SECRET_KEY"])
         except JoseError:
@@ -60,13 +142,67 @@ class User(db.Model, UserMixin):
 
         return f"User({self.username!r}, {self.email!r}, {self.image_file!r})"
 
+    def snapshot(self) -> dict:
+        """
+        The user's columns for the identity cache.
+
+        Returns:
+            dict: every column except the password hash.
+        """
+
+        return {column.key: getattr(self, column.key)
+                for column in self.__table__.columns
+                if column.key != "password"}
+
+    _dict_fields = {
+        "id": lambda user: user.id,
+        "username": lambda user: user.username,
+        "image_file": lambda user: user.image_file,
+        "post_count": lambda user: user.post_count,
+        "last_posted_at": lambda user: _isoformat(user.last_posted_at),
+    }
+
+    def to_dict(self, fields=None) -> dict:
+        """
+        Represents the User as a dictionary.
+
+        The email and password are private and never included.
+
+        Args:
+            fields (set): only include these keys, if given.
+
+        Returns:
+            dict: The user's id, username and image file.
+        """
+
+        return _to_dict(self, self._dict_fields, fields)
+
+
+# Sign-up and login match usernames and emails case-insensitively.
+db.Index("ix_user_username_lower", db.func.lower(User.username), unique=True)
+db.Index("ix_user_email_lower", db.func.lower(User.email), unique=True)
+
 
 class Post(db.Model):
+    __table_args__ = (
+        db.Index("ix_post_date_posted_id", "date_posted", "id"),
+        db.Index("ix_post_user_id_date_posted", "user_id", "date_posted"),
+        db.Index("ix_post_last_modified", "last_modified"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Derived from content by posts.utils.set_content, so the feeds never
+    # load or escape whole posts.  "flask posts backfill-excerpts" fills
+    # them in for older rows.
+    excerpt = db.Column(db.String(300))
+    content_html = db.Column(db.Text)
+    date_posted = db.Column(db.DateTime, nullable=False,
+                            default=datetime.utcnow)
+    last_modified = db.Column(db.DateTime, nullable=False,
+                              default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
 
     def __repr__(self):
@@ -80,3 +216,39 @@ class Post(db.Model):
         """
 
         return f"Post({self.title!r}, {self.date_posted})"
+
+    _dict_fields = {
+        "id": lambda post: post.id,
+        "title": lambda post: post.title,
+        "excerpt": lambda post: post.excerpt,
+        "content": lambda post: post.content,
+        "date_posted": lambda post: _isoformat(post.date_posted),
+        "last_modified": lambda post: _isoformat(post.last_modified),
+        "author": lambda post: post.author.username,
+    }
+
+    def to_dict(self, fields=None) -> dict:
+        """
+        Represents the Post as a dictionary.
+
+        Used by the JSON variants of the feeds and the API.
+
+        Args:
+            fields (set): only include these keys, if given.
+
+        Returns:
+            dict: The post's id, title, excerpt, content, date posted and
+            author.
+        """
+
+        return _to_dict(self, self._dict_fields, fields)
+
+
+missing_cache.register(
+    "post",
+    exists=lambda post_id: db.session.get(Post, post_id) is not None,
+    highest=lambda: db.session.query(db.func.max(Post.id)).scalar())
+missing_cache.register(
+    "user",
+    exists=lambda username: db.session.query(User.id)
+    .filter_by(username=username).first() is not None)
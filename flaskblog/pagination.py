@@ -0,0 +1,258 @@
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+from flask import abort, current_app, request, url_for
+from sqlalchemy import func, tuple_
+from flaskblog import cache
+from flaskblog.models import Post
+from flaskblog.schema import CACHED_SCAN
+
+
+def encode_cursor(post, direction) -> str:
+    """
+    Encode a feed cursor.
+
+    Builds an opaque token from the post's ``(date_posted, id)`` key and
+    the direction the next page should be read in.
+
+    Args:
+        post (Post): the post at the edge of the current page.
+        direction (str): "next" for older posts, "prev" for newer posts.
+
+    Returns:
+        str: a url safe cursor token.
+    """
+
+    raw = json.dumps([direction, post.date_posted.isoformat(), post.id])
+    token = base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+    return token.rstrip("=")
+
+
+def decode_cursor(token) -> tuple:
+    """
+    Decode a feed cursor.
+
+    Reverses ``encode_cursor``.
+
+    Args:
+        token (str): a cursor token from a previous page.
+
+    Returns:
+        tuple: the direction, date posted and id stored in the token.
+
+    Raises:
+        ValueError: if the token is malformed.
+    """
+
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii"))
+        direction, date_posted, post_id = json.loads(raw)
+        date_posted = datetime.fromisoformat(date_posted)
+    except (binascii.Error, UnicodeError, TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+    if direction not in ("next", "prev") or not isinstance(post_id, int):
+        raise ValueError("Invalid cursor.")
+
+    return direction, date_posted, post_id
+
+
+class KeysetPage:
+    """
+    A page of posts fetched with keyset pagination.
+
+    Posts are ordered newest first on ``(date_posted, id)``.  Instead of an
+    OFFSET the page seeks past the key in the cursor, so every page costs
+    the same index range scan and no COUNT query is issued.
+
+    A "prev" cursor comes from the first post of a page, so older posts
+    follow whatever the page holds.  When fewer than ``per_page`` newer
+    posts are left, the first page is read instead.
+    """
+
+    def __init__(self, query, per_page, cursor=None):
+        self.per_page = per_page
+        self.cursor = cursor
+
+        key = tuple_(Post.date_posted, Post.id)
+        newest_first = (Post.date_posted.desc(), Post.id.desc())
+        direction = None
+        if cursor:
+            direction, date_posted, post_id = decode_cursor(cursor)
+
+        if direction == "prev":
+            items = query.filter(key > tuple_(date_posted, post_id))\
+                .order_by(Post.date_posted.asc(), Post.id.asc())\
+                .limit(per_page + 1).all()
+            if len(items) > per_page:
+                items = items[:per_page]
+                items.reverse()
+                self.has_prev, self.has_next = True, True
+                self.items = items
+                return
+            direction = None
+
+        if direction == "next":
+            query = query.filter(key < tuple_(date_posted, post_id))
+        items = query.order_by(*newest_first).limit(per_page + 1).all()
+        self.has_prev = direction == "next" and bool(items)
+        self.has_next = len(items) > per_page
+        self.items = items[:per_page]
+
+    @property
+    def next_cursor(self) -> str:
+        """The cursor for the next (older) page, or None."""
+
+        return encode_cursor(self.items[-1], "next") if self.has_next else None
+
+    @property
+    def prev_cursor(self) -> str:
+        """The cursor for the previous (newer) page, or None."""
+
+        return encode_cursor(self.items[0], "prev") if self.has_prev else None
+
+
+def cached_count(key, query, refresh=False) -> int:
+    """
+    Count the rows of a query, reusing a recent result.
+
+    The total only drives the page links, so an approximate value is fine.
+    Results are kept in the page cache's backend for ``FEED_COUNT_TTL``
+    seconds, tagged ``feed:<key>`` so writes to the feed drop them; a TTL
+    of 0 always counts.
+
+    Args:
+        key (str): the feed's name, e.g. "home".
+        query (Query): the query to count.
+        refresh (bool): count again even if a result is cached.
+
+    Returns:
+        int: the number of rows.
+    """
+
+    ttl = current_app.config.get("FEED_COUNT_TTL", 0)
+    if ttl and not refresh:
+        total = cache.backend.get(f"count:{key}")
+        if total is not None:
+            return total
+
+    # Query.count() would wrap a SELECT of every column in a subquery.
+    total = query.order_by(None).with_entities(func.count(Post.id))\
+        .prefix_with(CACHED_SCAN).scalar()
+    if ttl:
+        cache.backend.set(f"count:{key}", total, ttl, tags=(f"feed:{key}",))
+    return total
+
+
+def _page_count(total, per_page) -> int:
+    return max(math.ceil(total / per_page), 1)
+
+
+def _uses_cursor(cursor_only) -> bool:
+    return bool(request.args.get("cursor")) or cursor_only \
+        or current_app.config.get("FEED_PAGINATION") == "cursor"
+
+
+def check_page(query, count_key, per_page=5, cursor_only=False, total=None):
+    """
+    Check the requested feed page before loading it.
+
+    Streamed pages send their status before the posts are loaded, so a bad
+    cursor or a page past the end has to be caught first.  Pages past the
+    end are found from the total; a cached total is recounted before a
+    page is refused, since it may predate new posts.
+
+    Args:
+        query (Query): the unordered feed query.
+        count_key (str): the cache key for the feed's total.
+        per_page (int): the number of posts per page.
+        cursor_only (bool): always use keyset pagination.
+        total (int): the feed's known size, which skips counting.
+
+    Returns:
+        int: the feed's total for a numbered page, otherwise None.
+
+    Raises:
+        BadRequest: if the cursor is malformed.
+        NotFound: if the page number is out of range.
+    """
+
+    if _uses_cursor(cursor_only):
+        cursor = request.args.get("cursor")
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except ValueError:
+                abort(400)
+        return None
+
+    page = request.args.get("page", 1, type=int)
+    if page < 1:
+        abort(404)
+    if total is None:
+        total = cached_count(count_key, query)
+        if page > _page_count(total, per_page):
+            total = cached_count(count_key, query, refresh=True)
+    if page > _page_count(total, per_page):
+        abort(404)
+    return total
+
+
+def paginate_posts(query, count_key, per_page=5, cursor_only=False,
+                   total=None, checked=False):
+    """
+    Paginate a feed query.
+
+    Uses keyset pagination when a ``cursor`` argument is given or the
+    ``FEED_PAGINATION`` setting is "cursor", otherwise a numbered page whose
+    total comes from ``cached_count``.
+
+    Args:
+        query (Query): the unordered feed query.
+        count_key (str): the cache key for the feed's total.
+        per_page (int): the number of posts per page.
+        cursor_only (bool): always use keyset pagination.
+        total (int): the feed's known size, which skips counting.
+        checked (bool): ``check_page`` already ran and returned ``total``.
+
+    Returns:
+        KeysetPage | Pagination: the requested page of posts.
+    """
+
+    if not checked:
+        total = check_page(query, count_key, per_page, cursor_only, total)
+    if _uses_cursor(cursor_only):
+        return KeysetPage(query, per_page, request.args.get("cursor"))
+
+    page = request.args.get("page", 1, type=int)
+    posts = query.order_by(Post.date_posted.desc(), Post.id.desc())\
+        .paginate(page=page, per_page=per_page, count=False, error_out=False)
+    posts.total = total
+    return posts
+
+
+def feed_page(posts, endpoint, only=None, **values) -> dict:
+    """
+    Serialize a page of posts.
+
+    Args:
+        posts (KeysetPage): the page to serialize.
+        endpoint (str): the endpoint that serves the feed.
+        only (set): only include these post keys, if given.
+        **values: extra url values for the endpoint.
+
+    Returns:
+        dict: the posts plus links to the neighbouring pages.
+    """
+
+    def link(cursor):
+        return url_for(endpoint, cursor=cursor, **values) if cursor else None
+
+    return {
+        "posts": [post.to_dict(only) for post in posts.items],
+        "next": link(posts.next_cursor),
+        "prev": link(posts.prev_cursor),
+    }
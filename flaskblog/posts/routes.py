@@ -1,3 +1,5 @@
+from datetime import datetime
+import click
 from flask import (Blueprint,
                    abort,
                    flash,
@@ -5,10 +7,19 @@ from flask import (Blueprint,
                    render_template,
                    request,
                    url_for)
-from flaskblog import db
+from flaskblog import db, cache, missing_cache, user_cache
+from flaskblog.cache import post_tags
+from flaskblog.conditional import conditional, post_validators
+from flaskblog.database import read_replica
+from flaskblog.feeds.utils import sitemap_tags
 from flask_login import current_user, login_required
-from flaskblog.models import Post
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import joinedload
+from flaskblog.models import Post, User
 from flaskblog.posts.forms import PostForm
+from flaskblog.posts.utils import (make_excerpt,
+                                   render_content,
+                                   set_content)
 
 posts = Blueprint("posts", __name__)
 
@@ -24,11 +35,21 @@ def new_post() -> str:
 
     form = PostForm()
     if form.validate_on_submit():
+        now = datetime.utcnow()
         post = Post(title=form.title.data,
-                    content=form.content.data,
+                    date_posted=now,
+                    last_modified=now,
                     author=current_user)
+        set_content(post, form.content.data)
         db.session.add(post)
+        current_user.post_count = User.post_count + 1
+        current_user.last_posted_at = now
+        current_user.last_modified = now
         db.session.commit()
+        user_cache.invalidate(current_user.id)
+        missing_cache.discard("post", post.id)
+        cache.invalidate("feed:home", f"feed:user:{current_user.id}",
+                         *sitemap_tags(post.id))
         flash("Your post has been created!", "success")
         return redirect(url_for("main.home"))
 
@@ -37,6 +58,10 @@ def new_post() -> str:
 
 
 @posts.route("/post/<int:post_id>")
+@missing_cache.guard("post", "post_id")
+@read_replica
+@conditional(post_validators)
+@cache.cached
 def post(post_id) -> str:
     """
     A single post.
@@ -44,7 +69,10 @@ def post(post_id) -> str:
     Process for viewing a single post.
     """
 
-    post = Post.query.get_or_404(post_id)
+    post = missing_cache.or_404(
+        "post", post_id,
+        db.session.get(Post, post_id, options=[joinedload(Post.author)]))
+    cache.tag(*post_tags([post]))
 
     return render_template("post.html", title=post.title, post=post)
 
@@ -64,8 +92,13 @@ def update_post(post_id) -> str:
     form = PostForm()
     if form.validate_on_submit():
         post.title = form.title.data
-        post.content = form.content.data
+        set_content(post, form.content.data)
+        post.last_modified = current_user.last_modified = datetime.utcnow()
         db.session.commit()
+        user_cache.invalidate(current_user.id)
+        # The feeds show the title and excerpt.
+        cache.invalidate(f"post:{post.id}", "feed:home",
+                         f"feed:user:{post.user_id}", *sitemap_tags(post.id))
         flash("Your post has been updated!", "success")
         return redirect(url_for("posts.post", post_id=post.id))
     elif request.method == "GET":
@@ -89,6 +122,47 @@ def delete_post(post_id) -> str:
     if post.author != current_user:
         abort(403)
     db.session.delete(post)
+    db.session.flush()
+    current_user.post_count = User.post_count - 1
+    current_user.last_posted_at = select(func.max(Post.date_posted))\
+        .where(Post.user_id == current_user.id).scalar_subquery()
+    current_user.last_modified = datetime.utcnow()
     db.session.commit()
+    user_cache.invalidate(current_user.id)
+    missing_cache.remember("post", post.id)
+    cache.invalidate("feed:home", f"feed:user:{post.user_id}",
+                     f"post:{post.id}", *sitemap_tags(post.id))
     flash("Your post has been deleted!", "success")
     return redirect(url_for("main.home"))
+
+
+@posts.cli.command("backfill-excerpts")
+@click.option("--all", "everything", is_flag=True,
+              help="Also recompute posts that already have an excerpt.")
+@click.option("--batch-size", default=1000, show_default=True)
+def backfill_excerpts(everything, batch_size) -> None:
+    """
+    Fill in the excerpt and rendered HTML of existing posts.
+
+    Posts are read in batches of ascending id and each batch is committed
+    on its own, so the command can be stopped and run again.
+    """
+
+    last = updated = 0
+    while True:
+        query = select(Post.id, Post.content).where(Post.id > last)\
+            .order_by(Post.id).limit(batch_size)
+        if not everything:
+            query = query.where(Post.excerpt.is_(None))
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+
+        db.session.execute(update(Post), [
+            {"id": post_id, "excerpt": make_excerpt(content),
+             "content_html": render_content(content)}
+            for post_id, content in rows])
+        db.session.commit()
+        last = rows[-1].id
+        updated += len(rows)
+    click.echo(f"Backfilled {updated} posts.")
@@ -0,0 +1,59 @@
+from markupsafe import escape
+from sqlalchemy.orm import defer
+from flaskblog.models import Post
+
+# Fits Post.excerpt with room for the ellipsis.
+EXCERPT_LENGTH = 280
+
+# Loader options for lists of posts: the HTML feeds only show the excerpt,
+# and the JSON ones send the plain content.
+WITHOUT_CONTENT = (defer(Post.content), defer(Post.content_html))
+WITHOUT_HTML = (defer(Post.content_html),)
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH) -> str:
+    """
+    Shorten a post's content for the feeds.
+
+    Whitespace is collapsed, as the browser would, and long content is cut
+    at the last word boundary before ``length``.
+
+    Args:
+        content (str): the post's content.
+        length (int): the longest excerpt, ellipsis excluded.
+
+    Returns:
+        str: the excerpt.
+    """
+
+    text = " ".join(content.split())
+    if len(text) <= length:
+        return text
+
+    cut = text.rfind(" ", 0, length + 1)
+    return text[:cut if cut > 0 else length].rstrip(" ,.;:") + "…"
+
+
+def render_content(content) -> str:
+    """
+    Render a post's content to HTML.
+
+    Posts are plain text, so this only escapes it; the result is stored
+    so pages do not escape the whole post again on every render.
+
+    Args:
+        content (str): the post's content.
+
+    Returns:
+        str: HTML that is safe to output unescaped.
+    """
+
+    return str(escape(content))
+
+
+def set_content(post, content) -> None:
+    """Set a post's content along with its excerpt and rendered HTML."""
+
+    post.content = content
+    post.excerpt = make_excerpt(content)
+    post.content_html = render_content(content)
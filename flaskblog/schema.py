@@ -0,0 +1,209 @@
+import os
+import re
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+EXPLAINABLE = ("SELECT", "WITH")
+# SQLite plan steps that read a whole table or the whole of an index.  A
+# plain "USING INDEX" scan walks an index in order and is stopped early by
+# the LIMIT of a feed page; a covering index scan reads all of it.
+SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?! USING INDEX)"
+                         r"(?! USING INTEGER PRIMARY KEY)(?! VIRTUAL TABLE)")
+POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+# Marks the few queries that read a whole table on purpose and cache the
+# result, such as a feed's total; check-indexes lets them through.
+CACHED_SCAN = "/* cached full scan */"
+
+
+def configure_migrations(app, db) -> None:
+    """
+    Add the ``flask db`` commands.
+
+    They are Flask-Migrate's, plus ``check-indexes``.  Alembic takes longer
+    to import than the rest of the app, so Flask-Migrate is only loaded
+    when one of the commands runs.
+    """
+
+    app.cli.add_command(_MigrationsGroup(app, db))
+
+
+class _MigrationsGroup(click.Group):
+    def __init__(self, app, db):
+        super().__init__("db", help="Perform database migrations.")
+        self._app = app
+        self._db = db
+        self.add_command(check_indexes_command)
+
+    def _migrate(self) -> click.Group:
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as group
+
+        if "migrate" not in self._app.extensions:
+            Migrate(self._app, self._db, directory=MIGRATIONS_DIR,
+                    render_as_batch=True)
+            # Migrate registers its own ``db`` group, which would hide
+            # check-indexes from later invocations in this process.
+            self._app.cli.add_command(self)
+        return group
+
+    def list_commands(self, ctx) -> list:
+        return sorted(set(super().list_commands(ctx))
+                      | set(self._migrate().list_commands(ctx)))
+
+    def get_command(self, ctx, name):
+        return super().get_command(ctx, name) \
+            or self._migrate().get_command(ctx, name)
+
+
+def _scenarios(user, post_id) -> list:
+    # (method, path, form data, logged in) for every page that reads the
+    # database.  The POSTs are refused by validation, so nothing is written.
+    missing = {"email": "nobody@example.invalid", "password": "x"}
+    return [
+        ("GET", "/", None, False),
+        ("GET", "/?page=2", None, False),
+        ("GET", "/home.json", None, False),
+        ("GET", f"/post/{post_id}", None, False),
+        ("GET", f"/user/{user.username}", None, False),
+        ("GET", f"/user/{user.username}/posts.json", None, False),
+        ("GET", "/search?q=post", None, False),
+        ("GET", "/api/v1/posts", None, False),
+        ("GET", f"/api/v1/posts/{post_id}", None, False),
+        ("GET", f"/api/v1/users/{user.username}", None, False),
+        ("GET", f"/api/v1/users/{user.username}/posts", None, False),
+        ("POST", "/login", missing, False),
+        ("POST", "/register", {"username": user.username.upper(),
+                               "email": user.email.upper(),
+                               "password": "x",
+                               "confirm_password": "y"}, False),
+        ("POST", "/reset_password", missing, False),
+        ("GET", "/feed.atom", None, False),
+        ("GET", f"/user/{user.username}/feed.rss", None, False),
+        ("GET", "/sitemap.xml", None, False),
+        ("GET", f"/sitemap-{post_id // 50_000}.xml", None, False),
+        ("GET", f"/register/check?username={user.username}"
+                f"&email={user.email}", None, False),
+        ("GET", "/", None, True),
+        ("GET", "/account", None, True),
+        ("GET", f"/post/{post_id}", None, True),
+        ("GET", f"/post/{post_id}/update", None, True),
+    ]
+
+
+def collect_queries(app, user, post_id) -> dict:
+    """
+    Request every page that reads the database and record its queries.
+
+    Returns:
+        dict: each distinct SELECT mapped to its parameters and the first
+        path that ran it.
+    """
+
+    from flaskblog.cache import NullBackend
+
+    queries = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(
+                EXPLAINABLE):
+            queries.setdefault(statement, (parameters, current_path[0]))
+
+    engines = list(app.extensions["sqlalchemy"].engines.values())
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+
+    page_cache = app.extensions["page_cache"]
+    backend, page_cache.backend = page_cache.backend, NullBackend()
+    csrf = app.config.get("WTF_CSRF_ENABLED", True)
+    app.config["WTF_CSRF_ENABLED"] = False
+    current_path = [None]
+    try:
+        for method, path, data, logged_in in _scenarios(user, post_id):
+            current_path[0] = path
+            client = app.test_client()
+            if logged_in:
+                with client.session_transaction() as session:
+                    session["_user_id"] = str(user.id)
+                    session["_fresh"] = True
+            client.open(path, method=method, data=data).close()
+    finally:
+        app.config["WTF_CSRF_ENABLED"] = csrf
+        page_cache.backend = backend
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+    return queries
+
+
+def full_scans(engine, statement, parameters) -> list:
+    """
+    Explain a query and find the tables it reads in full.
+
+    Returns:
+        list: the plan lines that scan a table without an index.
+    """
+
+    with engine.connect() as conn:
+        cursor = conn.connection.cursor()
+        try:
+            if engine.dialect.name == "sqlite":
+                cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+                lines = [row[-1] for row in cursor.fetchall()]
+                pattern = SQLITE_SCAN
+            else:
+                cursor.execute("EXPLAIN " + statement, parameters)
+                lines = [row[0] for row in cursor.fetchall()]
+                pattern = POSTGRES_SCAN
+        finally:
+            cursor.close()
+
+    tables = set(current_app.extensions["sqlalchemy"].metadatas[None].tables)
+    return [line.strip() for line in lines
+            if (match := pattern.search(line.strip())) is not None
+            and match.group(1) in tables]
+
+
+@click.command("check-indexes")
+@with_appcontext
+def check_indexes_command() -> None:
+    """
+    Fail if a page's query reads a whole table.
+
+    Every page that reads the database is requested once with the test
+    client, and each distinct query is run through EXPLAIN.  Planners only
+    pick indexes over tables big enough to need them, so run it against a
+    seeded database, e.g. after "flask seed".
+    """
+
+    from flaskblog import db
+    from flaskblog.models import Post, User
+
+    app = current_app._get_current_object()
+    user = User.query.filter(User.post_count > 0)\
+        .order_by(User.post_count.desc()).first()
+    post_id = user and db.session.query(db.func.max(Post.id))\
+        .filter(Post.user_id == user.id).scalar()
+    db.session.remove()
+    if post_id is None:
+        raise click.ClickException("The database has no posts; "
+                                   "run \"flask seed\" first.")
+
+    queries = collect_queries(app, user, post_id)
+    failures = 0
+    for statement, (parameters, path) in queries.items():
+        if CACHED_SCAN in statement:
+            continue
+        scans = full_scans(db.engine, statement, parameters)
+        if scans:
+            failures += 1
+            click.echo(f"{path}: {' '.join(statement.split())}")
+            for line in scans:
+                click.echo(f"    {line}")
+
+    click.echo(f"Checked {len(queries)} queries, "
+               f"{failures} read a whole table.")
+    if failures:
+        raise SystemExit(1)
@@ -0,0 +1,55 @@
+import click
+from flask import Blueprint, jsonify, render_template, request
+from flaskblog.database import read_replica
+from flaskblog.search.utils import SearchPage, reindex
+
+search = Blueprint("search", __name__)
+
+
+@search.route("/search")
+@read_replica
+def results() -> str:
+    """
+    Search posts.
+
+    Shows the posts matching the ``q`` argument, best match first.
+
+    Returns:
+        str: A rendered template for the search results.
+    """
+
+    query = request.args.get("q", "")
+    page = request.args.get("page", 1, type=int)
+    results = SearchPage(query, max(page, 1))
+
+    return render_template("search.html", title="Search", results=results)
+
+
+@search.route("/search.json")
+@read_replica
+def results_json() -> str:
+    """
+    Search posts as JSON.
+
+    Returns:
+        str: A JSON page of matching posts with highlighted snippets.
+    """
+
+    query = request.args.get("q", "")
+    page = request.args.get("page", 1, type=int)
+    results = SearchPage(query, max(page, 1))
+
+    return jsonify({
+        "results": [dict(post.to_dict(), snippet=str(snippet))
+                    for post, snippet in results.results],
+        "page": results.page,
+        "has_next": results.has_next,
+    })
+
+
+@search.cli.command("reindex")
+def reindex_command() -> None:
+    """Rebuild the full-text index of every post."""
+
+    reindex()
+    click.echo("Search index rebuilt.")
@@ -0,0 +1,152 @@
+from markupsafe import Markup, escape
+from sqlalchemy import DDL, event, text
+from sqlalchemy.orm import joinedload
+from flaskblog import db
+from flaskblog.models import Post
+
+# Snippets are highlighted with control characters first so the post text
+# can be escaped before the <mark> tags are added.
+START, STOP = "\x02", "\x03"
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS post_fts
+       USING fts5(title, content, content='post', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_insert AFTER INSERT ON post
+       BEGIN
+           INSERT INTO post_fts(rowid, title, content)
+           VALUES (new.id, new.title, new.content);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_delete AFTER DELETE ON post
+       BEGIN
+           INSERT INTO post_fts(post_fts, rowid, title, content)
+           VALUES ('delete', old.id, old.title, old.content);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_update
+       AFTER UPDATE OF title, content ON post
+       BEGIN
+           INSERT INTO post_fts(post_fts, rowid, title, content)
+           VALUES ('delete', old.id, old.title, old.content);
+           INSERT INTO post_fts(rowid, title, content)
+           VALUES (new.id, new.title, new.content);
+       END""",
+]
+
+POSTGRES_DOCUMENT = "to_tsvector('english', post.title || ' ' || post.content)"
+
+POSTGRES_DDL = [
+    f"""CREATE INDEX IF NOT EXISTS ix_post_search
+        ON post USING GIN ({POSTGRES_DOCUMENT})""",
+]
+
+for statement in SQLITE_DDL:
+    event.listen(Post.__table__, "after_create",
+                 DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRES_DDL:
+    event.listen(Post.__table__, "after_create",
+                 DDL(statement).execute_if(dialect="postgresql"))
+
+
+def _is_sqlite() -> bool:
+    return db.engine.dialect.name == "sqlite"
+
+
+def create_index() -> None:
+    """
+    Create the search index if it does not exist yet.
+
+    ``db.create_all()`` does this for new databases.
+    """
+
+    for statement in SQLITE_DDL if _is_sqlite() else POSTGRES_DDL:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+def reindex() -> None:
+    """Rebuild the search index from the post table."""
+
+    create_index()
+    if _is_sqlite():
+        db.session.execute(text("INSERT INTO post_fts(post_fts) "
+                                "VALUES ('rebuild')"))
+    else:
+        db.session.execute(text("REINDEX INDEX ix_post_search"))
+    db.session.commit()
+
+
+def _fts_query(query) -> str:
+    # Quote every term so user input cannot use FTS5 query syntax.
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    return " ".join(terms)
+
+
+def _ranked_ids(query, limit, offset) -> list:
+    if _is_sqlite():
+        statement = text(f"""
+            SELECT rowid, snippet(post_fts, 1, '{START}', '{STOP}', '...', 24)
+            FROM post_fts
+            WHERE post_fts MATCH :query
+            ORDER BY bm25(post_fts, 10.0, 1.0)
+            LIMIT :limit OFFSET :offset""")
+        query = _fts_query(query)
+    else:
+        statement = text(f"""
+            SELECT post.id, ts_headline('english', post.content, q,
+                       'StartSel={START}, StopSel={STOP}, MaxFragments=1')
+            FROM post, websearch_to_tsquery('english', :query) AS q
+            WHERE {POSTGRES_DOCUMENT} @@ q
+            ORDER BY ts_rank({POSTGRES_DOCUMENT}, q) DESC, post.id DESC
+            LIMIT :limit OFFSET :offset""")
+
+    rows = db.session.execute(statement, {"query": query, "limit": limit,
+                                          "offset": offset})
+    return rows.all()
+
+
+def highlight(snippet) -> Markup:
+    """
+    Turn a raw snippet into safe HTML.
+
+    Args:
+        snippet (str): text with matches between ``START`` and ``STOP``.
+
+    Returns:
+        Markup: the escaped snippet with matches wrapped in ``<mark>``.
+    """
+
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(START, "<mark>").replace(STOP, "</mark>"))
+
+
+class SearchPage:
+    """
+    A page of ranked search results.
+
+    ``results`` holds ``(post, snippet)`` pairs, best match first.  One extra
+    row is fetched to tell whether there is a next page, so no COUNT query
+    is needed.
+    """
+
+    def __init__(self, query, page=1, per_page=10):
+        self.query = query
+        self.page = page
+        self.per_page = per_page
+        self.results = []
+        self.has_next = False
+
+        if not query.strip():
+            return
+
+        rows = _ranked_ids(query, per_page + 1, (page - 1) * per_page)
+        self.has_next = len(rows) > per_page
+        rows = rows[:per_page]
+
+        posts = Post.query.options(joinedload(Post.author))\
+            .filter(Post.id.in_([row[0] for row in rows])).all()
+        by_id = {post.id: post for post in posts}
+        self.results = [(by_id[post_id], highlight(snippet))
+                        for post_id, snippet in rows if post_id in by_id]
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 1
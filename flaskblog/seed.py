@@ -0,0 +1,118 @@
+import random
+from functools import lru_cache
+from itertools import accumulate
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from flaskblog import db, hasher
+from flaskblog.models import Post, User
+from flaskblog.posts.utils import make_excerpt, render_content
+
+PASSWORD = "password"
+
+
+@lru_cache(maxsize=None)
+def _vocabulary() -> tuple:
+    # A synthetic vocabulary with a Zipf-like word distribution, as in real
+    # text.  The weights are cumulative so ``choices`` does not re-sum them.
+    # Built on first use; this module is imported by every app.
+    words = [f"w{i}" for i in range(20_000)]
+    return words, list(accumulate(1 / (rank + 1)
+                                  for rank in range(len(words))))
+
+
+def _words(rng, count) -> str:
+    words, weights = _vocabulary()
+    return " ".join(rng.choices(words, cum_weights=weights, k=count))
+
+
+def _content(rng) -> str:
+    # Post lengths are roughly log-normal: mostly a few short paragraphs,
+    # with a long tail of essays (median ~120 words, p99 ~1500).
+    words = min(int(rng.lognormvariate(4.8, 0.9)) + 5, 5000)
+    paragraphs = []
+    while words > 0:
+        size = min(words, rng.randint(30, 120))
+        text = _words(rng, size)
+        paragraphs.append(text.capitalize() + ".")
+        words -= size
+    return "\n\n".join(paragraphs)
+
+
+def _content_columns(content) -> dict:
+    # Bulk inserts skip the post routes, so derive the columns here.
+    return {"content": content, "excerpt": make_excerpt(content),
+            "content_html": render_content(content)}
+
+
+def seed_database(users, posts, days=365, seed=0, batch_size=5000) -> None:
+    """
+    Bulk insert synthetic users and posts.
+
+    A few prolific authors write most of the posts, and posting dates
+    spread over the last ``days`` days with ids increasing with time, as
+    on a real blog.  Every user's password is ``PASSWORD`` and the post
+    counters are filled in.  Users are numbered after the existing ones,
+    so the command can be run again to grow a database.
+
+    Args:
+        users (int): the number of users to add.
+        posts (int): the number of posts to add.
+        days (int): how far back the posts go.
+        seed (int): seed for the random generator, for reproducible data.
+        batch_size (int): rows per INSERT.
+    """
+
+    rng = random.Random(seed)
+    last = db.session.query(func.max(User.id)).scalar() or 0
+    password = hasher.generate_password_hash(PASSWORD)
+
+    now = datetime.utcnow()
+    dates = sorted(now - timedelta(seconds=rng.uniform(0, days * 86400))
+                   for _ in range(posts))
+    author_weights = list(accumulate(1 / (rank + 1) ** 0.8
+                                     for rank in range(users)))
+    authors = rng.choices(range(users), cum_weights=author_weights,
+                          k=posts) if users else []
+
+    counts, latest = [0] * users, [None] * users
+    for author, date in zip(authors, dates):
+        counts[author] += 1
+        latest[author] = date
+
+    db.session.execute(User.__table__.insert(), [
+        {"username": f"user{last + 1 + i}",
+         "email": f"user{last + 1 + i}@example.com", "password": password,
+         "image_file": "default.jpg", "post_count": counts[i],
+         "last_posted_at": latest[i]}
+        for i in range(users)])
+    # Rows inserted in one statement get increasing ids, in order.
+    ids = db.session.scalars(db.select(User.id).where(User.id > last)
+                             .order_by(User.id)).all()
+    authors = [ids[author] for author in authors]
+
+    for start in range(0, posts, batch_size):
+        db.session.execute(Post.__table__.insert(), [
+            {"title": _words(rng, rng.randint(3, 10)).title(),
+             "date_posted": date, "last_modified": date, "user_id": author,
+             **_content_columns(_content(rng))}
+            for author, date in zip(authors[start:start + batch_size],
+                                    dates[start:start + batch_size])])
+    db.session.commit()
+
+
+@click.command("seed")
+@click.option("--users", default=100, show_default=True)
+@click.option("--posts", default=10_000, show_default=True)
+@click.option("--days", default=365, show_default=True)
+@click.option("--seed", default=0, show_default=True,
+              help="Random seed; the same seed gives the same data.")
+@with_appcontext
+def seed_command(users, posts, days, seed) -> None:
+    """Fill the database with synthetic users and posts."""
+
+    db.create_all()
+    seed_database(users, posts, days, seed)
+    click.echo(f"Added {users} users and {posts} posts "
+               f"(password {PASSWORD!r}).")
@@ -0,0 +1,324 @@
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
+from datetime import timezone
+import click
+from flask import current_app, redirect, send_from_directory, url_for
+from flask.cli import with_appcontext
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import safe_join
+
+PRESIGNED_SECONDS = 3600
+
+
+class LocalStorage:
+    """
+    Files in a directory on the app server's disk.
+
+    Every app instance has to see the same directory, so several servers
+    need a shared volume.  ``send`` can hand the transfer to the web server
+    in front of the app: with ``accel_redirect`` set to the prefix of an
+    nginx ``internal`` location the response only carries an
+    ``X-Accel-Redirect`` header, and with Flask's ``USE_X_SENDFILE`` it
+    carries ``X-Sendfile`` for Apache or lighttpd.
+    """
+
+    def __init__(self, root, accel_redirect=None):
+        self.root = root
+        self.accel_redirect = accel_redirect
+
+    def _path(self, name) -> str:
+        path = safe_join(self.root, name)
+        if path is None:
+            raise NotFound()
+        return path
+
+    def save(self, name, fileobj) -> None:
+        # Written to a temporary file first, so readers never see half of
+        # one.
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(fileobj, f)
+            # mkstemp makes the file private; the web server has to read it.
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self._path(name))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def exists(self, name) -> bool:
+        return os.path.isfile(self._path(name))
+
+    def touch(self, name) -> bool:
+        try:
+            os.utime(self._path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete(self, *names) -> None:
+        for name in names:
+            try:
+                os.unlink(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    def list(self):
+        """Yield the name and modification time of every file."""
+
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.is_file() and not entry.name.startswith("."):
+                yield entry.name, entry.stat().st_mtime
+
+    def url(self, name) -> str:
+        return url_for("media", name=name)
+
+    def send(self, name, max_age):
+        if self.accel_redirect is None:
+            return send_from_directory(self.root, name, max_age=max_age)
+
+        if not self.exists(name):
+            raise NotFound()
+        response = current_app.response_class(
+            mimetype=_mimetype(name))
+        response.headers["X-Accel-Redirect"] = self.accel_redirect + name
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response
+
+
+class S3Storage:
+    """
+    Objects in an S3-compatible bucket, such as AWS S3 or MinIO.
+
+    boto3 is only imported when this backend is configured.  Pictures are
+    linked at ``public_url`` when the bucket (or a CDN in front of it) is
+    public; otherwise the app redirects each request to a presigned URL.
+    """
+
+    def __init__(self, bucket, prefix="", client=None, endpoint_url=None,
+                 public_url=None):
+        if client is None:
+            import boto3
+
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url
+
+    def save(self, name, fileobj) -> None:
+        # upload_fileobj reads the file in parts, switching to a multipart
+        # upload for large ones, so it is never held in memory whole.
+        self.client.upload_fileobj(
+            fileobj, self.bucket, self.prefix + name,
+            ExtraArgs={"ContentType": _mimetype(name)})
+
+    def exists(self, name) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + name)
+        except ClientError as exc:
+            if exc.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def touch(self, name) -> bool:
+        from botocore.exceptions import ClientError
+
+        # Objects cannot be modified in place; copying one onto itself is
+        # the only way to give it a new LastModified.
+        key = self.prefix + name
+        try:
+            self.client.copy_object(
+                Bucket=self.bucket, Key=key,
+                CopySource={"Bucket": self.bucket, "Key": key},
+                ContentType=_mimetype(name), MetadataDirective="REPLACE")
+        except ClientError as exc:
+            if exc.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def delete(self, *names) -> None:
+        names = list(names)
+        # DeleteObjects takes at most 1000 keys.
+        for start in range(0, len(names), 1000):
+            self.client.delete_objects(Bucket=self.bucket, Delete={
+                "Objects": [{"Key": self.prefix + name}
+                            for name in names[start:start + 1000]],
+                "Quiet": True})
+
+    def list(self):
+        """Yield the name and modification time of every object."""
+
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket,
+                                       Prefix=self.prefix):
+            for item in page.get("Contents", ()):
+                name = item["Key"][len(self.prefix):]
+                if name and "/" not in name:
+                    modified = item["LastModified"]
+                    if modified.tzinfo is None:
+                        modified = modified.replace(tzinfo=timezone.utc)
+                    yield name, modified.timestamp()
+
+    def url(self, name) -> str:
+        if self.public_url:
+            return self.public_url.rstrip("/") + "/" + self.prefix + name
+        return url_for("media", name=name)
+
+    def send(self, name, max_age):
+        url = self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket,
+                                  "Key": self.prefix + name},
+            ExpiresIn=PRESIGNED_SECONDS)
+        response = redirect(url)
+        # Cached for less than the signature lasts, so a cached redirect
+        # never points at an expired URL.
+        response.cache_control.public = True
+        response.cache_control.max_age = min(max_age, PRESIGNED_SECONDS // 2)
+        return response
+
+
+def _mimetype(name) -> str:
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+class MediaStorage:
+    """
+    Where uploaded files, so far profile pictures, are kept.
+
+    ``MEDIA_STORAGE`` picks the backend: "local" keeps them in
+    ``MEDIA_ROOT`` (``static/profile_pics`` by default), "s3" in
+    ``MEDIA_S3_BUCKET``.  They are served on ``/media/<name>``, and
+    ``flask media gc`` deletes the ones no user refers to any more.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        kind = app.config.get("MEDIA_STORAGE", "local")
+        if kind == "s3":
+            self.backend = S3Storage(
+                app.config["MEDIA_S3_BUCKET"],
+                app.config.get("MEDIA_S3_PREFIX", ""),
+                app.config.get("MEDIA_S3_CLIENT"),
+                app.config.get("MEDIA_S3_ENDPOINT_URL"),
+                app.config.get("MEDIA_S3_PUBLIC_URL"))
+        else:
+            root = app.config.get("MEDIA_ROOT") \
+                or os.path.join(app.root_path, "static", "profile_pics")
+            self.backend = LocalStorage(
+                root, app.config.get("MEDIA_ACCEL_REDIRECT"))
+        self.max_age = app.config.get("MEDIA_MAX_AGE", 31536000)
+        self.gc_grace = app.config.get("MEDIA_GC_GRACE", 3600)
+        app.extensions["media_storage"] = self
+        app.add_url_rule("/media/<path:name>", "media", self.send)
+        app.cli.add_command(media_cli)
+
+    def save(self, name, fileobj) -> None:
+        """Store a file under ``name``, replacing any file of that name."""
+
+        self.backend.save(name, fileobj)
+
+    def exists(self, name) -> bool:
+        return self.backend.exists(name)
+
+    def touch(self, name) -> bool:
+        """
+        Mark a file as just saved, so ``collect_garbage`` keeps it for
+        another grace period.
+
+        Returns:
+            bool: whether the file exists.
+        """
+
+        return self.backend.touch(name)
+
+    def url(self, name) -> str:
+        return self.backend.url(name)
+
+    def send(self, name):
+        """Serve a stored file."""
+
+        # Uploads are named by a hash of their content, so they never
+        # change; other files, like the default picture, may.
+        from flaskblog.users.utils import is_hashed_picture
+
+        return self.backend.send(
+            name, self.max_age if is_hashed_picture(name) else 0)
+
+    def collect_garbage(self, referenced, grace=None, dry_run=False) -> list:
+        """
+        Delete the files nobody refers to.
+
+        Files younger than ``grace`` seconds are kept, since an upload is
+        stored before the account pointing at it is saved.
+
+        Args:
+            referenced (set): the names still in use.
+            grace (int): the age in seconds below which files are kept.
+                Defaults to ``MEDIA_GC_GRACE``.
+            dry_run (bool): only list what would be deleted.
+
+        Returns:
+            list: the names of the deleted files.
+        """
+
+        cutoff = time.time() - (self.gc_grace if grace is None else grace)
+        orphans = [name for name, modified in self.backend.list()
+                   if name not in referenced and modified < cutoff]
+        if orphans and not dry_run:
+            self.backend.delete(*orphans)
+        return orphans
+
+
+@click.group("media")
+def media_cli() -> None:
+    """Manage uploaded files."""
+
+
+@media_cli.command("gc")
+@click.option("--grace", type=int, default=None,
+              help="Keep files younger than this many seconds "
+                   "[default: MEDIA_GC_GRACE].")
+@click.option("--dry-run", is_flag=True,
+              help="List the files instead of deleting them.")
+@with_appcontext
+def gc_command(grace, dry_run) -> None:
+    """
+    Delete profile pictures no user has any more.
+
+    Changing a picture leaves the old one behind, since another account
+    may have uploaded the same file.  Run this from cron.
+    """
+
+    from flaskblog import db
+    from flaskblog.models import User
+    from flaskblog.users.utils import DEFAULT_PICTURE, picture_names
+
+    referenced = {DEFAULT_PICTURE}
+    for image_file in db.session.scalars(
+            db.select(User.image_file).distinct()):
+        referenced.update(picture_names(image_file))
+
+    storage = current_app.extensions["media_storage"]
+    orphans = storage.collect_garbage(referenced, grace, dry_run)
+    for name in orphans:
+        click.echo(name)
+    click.echo(f"{'Would delete' if dry_run else 'Deleted'} "
+               f"{len(orphans)} files.")
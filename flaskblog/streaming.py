@@ -0,0 +1,102 @@
+from flask import current_app, g, render_template, session, stream_template
+
+_MISSING = object()
+
+
+class Deferred:
+    """
+    A template value loaded the first time the template uses it.
+
+    Streamed pages pass their queries as ``Deferred`` values, so the query
+    runs when rendering reaches the content block, after the layout's head
+    and navbar have gone out.  By then the status is sent, so a loader must
+    not abort: check the request before calling ``render_page``.
+    """
+
+    def __init__(self, load):
+        self._load = load
+        self._value = _MISSING
+
+    def _get(self):
+        if self._value is _MISSING:
+            self._value = self._load()
+        return self._value
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __iter__(self):
+        return iter(self._get())
+
+    def __bool__(self) -> bool:
+        return bool(self._get())
+
+
+class _Flush:
+    # Called as ``stream_flush()`` by layout.html; marks the end of the part
+    # of the page that should go out before the content is loaded.
+    def __init__(self):
+        self.pending = False
+
+    def __call__(self) -> str:
+        self.pending = True
+        return ""
+
+
+def can_stream() -> bool:
+    """
+    Whether the current page may be streamed.
+
+    Pages the page cache is about to store need their whole body, and
+    anything that writes the session (such as showing flashed messages)
+    has to happen before the headers go out, so both render in full.
+    """
+
+    return bool(current_app.config.get("STREAM_TEMPLATES")) \
+        and "cache_tags" not in g and "_flashes" not in session
+
+
+def render_page(template_name, deferred=None, **context):
+    """
+    Render a page, streaming it when ``STREAM_TEMPLATES`` is on.
+
+    Args:
+        template_name (str): the template to render.
+        deferred (dict): context names mapped to functions loading them.
+            When streaming they are loaded as the template reaches them,
+            otherwise before rendering.
+        **context: the rest of the template context.
+
+    Returns:
+        str | Response: the rendered page, or a streamed response.
+    """
+
+    deferred = deferred or {}
+    if not can_stream():
+        context.update((name, load()) for name, load in deferred.items())
+        return render_template(template_name, **context)
+
+    flush = _Flush()
+    context.update((name, Deferred(load)) for name, load in deferred.items())
+    chunks = stream_template(template_name, stream_flush=flush, **context)
+    return current_app.response_class(
+        _buffered(chunks, flush,
+                  current_app.config.get("STREAM_BUFFER_SIZE", 8192)),
+        mimetype="text/html")
+
+
+def _buffered(chunks, flush, size):
+    # Jinja yields every static run and expression separately; group them
+    # into writes of about ``size`` characters, cut short at stream_flush().
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if flush.pending or buffered >= size:
+            flush.pending = False
+            yield "".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield "".join(buffer)
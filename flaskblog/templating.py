@@ -0,0 +1,53 @@
+import os
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from jinja2 import FileSystemBytecodeCache
+
+
+def configure_templates(app) -> None:
+    """
+    Keep compiled templates on disk between processes.
+
+    Must run before anything touches ``app.jinja_env``.  Jinja checks each
+    cached entry against the template's source, so edited templates are
+    recompiled and stale bytecode is never used.
+    """
+
+    if not app.config.get("JINJA_BYTECODE_CACHE", True):
+        return
+
+    directory = app.config.get("JINJA_BYTECODE_CACHE_DIR") \
+        or os.path.join(app.instance_path, "jinja")
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_options = dict(app.jinja_options,
+                             bytecode_cache=FileSystemBytecodeCache(directory))
+    app.cli.add_command(templates_cli)
+
+
+def compile_templates(app) -> int:
+    """
+    Load every template, filling the bytecode cache.
+
+    Returns:
+        int: the number of templates compiled.
+    """
+
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+@click.group("templates")
+def templates_cli() -> None:
+    """Manage compiled templates."""
+
+
+@templates_cli.command("compile")
+@with_appcontext
+def compile_command() -> None:
+    """Precompile every template into the bytecode cache."""
+
+    count = compile_templates(current_app._get_current_object())
+    click.echo(f"Compiled {count} templates.")
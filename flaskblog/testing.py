@@ -0,0 +1,68 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from flaskblog import db
+
+
+class QueryCounter:
+    """
+    Record the SQL statements run against the database.
+
+    Use through ``count_queries`` or ``assert_max_queries``.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        """The number of statements recorded so far."""
+
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context,
+                executemany) -> None:
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the SQL statements run inside the block.
+
+    Must be used inside an app context.
+
+    Yields:
+        QueryCounter: the counter for the block.
+    """
+
+    counter = QueryCounter()
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._record)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """
+    Fail if the block runs more than ``limit`` SQL statements.
+
+    Wrap a test client request to guard a listing endpoint against N+1
+    queries, e.g. ``with assert_max_queries(3): client.get("/")``.
+
+    Args:
+        limit (int): the maximum number of statements allowed.
+
+    Raises:
+        AssertionError: if the block ran more statements than allowed.
+    """
+
+    with count_queries() as counter:
+        yield counter
+
+    if counter.count > limit:
+        statements = "\n".join(counter.statements)
+        raise AssertionError(f"Expected at most {limit} queries, "
+                             f"ran {counter.count}:\n{statements}")
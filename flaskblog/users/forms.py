@@ -10,6 +10,39 @@ from flask_login import current_user
 from flaskblog.models import User
 
 
+def _check_taken(form, username_message, email_message,
+                 current=None) -> bool:
+    """
+    Flag a form's username and email if another account has them.
+
+    Fields that already failed validation, or that still match
+    ``current``'s, are not checked.  Whatever is left is looked up in one
+    query.
+
+    Returns:
+        bool: False if either is taken.
+    """
+
+    username = form.username.data
+    if form.username.errors or current is not None \
+            and username.lower() == current.username.lower():
+        username = None
+    email = form.email.data
+    if form.email.errors or current is not None \
+            and email.lower() == current.email.lower():
+        email = None
+
+    valid = True
+    for user in User.find_taken(username, email):
+        if username and user.username.lower() == username.lower():
+            form.username.errors.append(username_message)
+            valid = False
+        if email and user.email.lower() == email.lower():
+            form.email.errors.append(email_message)
+            valid = False
+    return valid
+
+
 class RegistrationForm(FlaskForm):
     """
     Create the Registration form.
@@ -28,29 +61,16 @@ class RegistrationForm(FlaskForm):
 
     submit = SubmitField("Sign Up")
 
-    def validate_username(self, username) -> None:
+    def validate(self, extra_validators=None) -> bool:
         """
-        Validate that the username is not taken.
+        Validate the form and check the username and email are not taken.
 
-        Query the database to validate that the input username is unique.
+        Both are looked up in a single query.
         """
 
-        user = User.query.filter_by(username=username.data).first()
-
-        if user:
-            raise ValidationError("Error: Username is already taken.")
-
-    def validate_email(self, email) -> None:
-        """
-        Validate that the username is not taken.
-
-        Query the database to validate that the input email is unique.
-        """
-
-        email = User.query.filter_by(email=email.data).first()
-
-        if email:
-            raise ValidationError("Error: Email is already taken.")
+        valid = super().validate(extra_validators)
+        return _check_taken(self, "Error: Username is already taken.",
+                            "Error: Email is already taken.") and valid
 
 
 class LoginForm(FlaskForm):
@@ -81,38 +101,29 @@ class UpdateAccountForm(FlaskForm):
         "jpg", "png"])])
     submit = SubmitField("Update")
 
-    def validate_username(self, username) -> None:
+    def validate(self, extra_validators=None) -> bool:
         """
-        Validate that the username is not taken.
-
-        Query the database to validate that the input username is unique.
+        Validate the form and check a changed username or email is free.
 
+        Both are looked up in a single query.
         """
 
-        if username.data != current_user.username:
-            user = User.query.filter_by(username=username.data).first()
-            if user:
-                raise ValidationError("That username is taken.  Please choose a different username.")
-
-    def validate_email(self, email) -> None:
-        """
-        Validate that the email is username@domain.com.
-
-        Query the database to validate that the input email is unique.
-        """
-
-        if email.data != current_user.email:
-            user = User.query.filter_by(email=email.data).first()
-            if user:
-                raise ValidationError("That email is taken."
-                                      "Please choose a "
-                                      "different email.")
+        valid = super().validate(extra_validators)
+        return _check_taken(self,
+                            "That username is taken.  Please choose a "
+                            "different username.",
+                            "That email is taken.Please choose a "
+                            "different email.",
+                            current=current_user) and valid
 
 
 class RequestResetForm(FlaskForm):
     email = StringField("Email", validators=[DataRequired(), Email()])
     submit = SubmitField("Request Password Reset")
 
+    # The account found by validate_email, for the view to use.
+    user = None
+
     def validate_email(self, email) -> None:
         """
         Validate that the email is username@domain.com.
@@ -120,10 +131,11 @@ class RequestResetForm(FlaskForm):
         Query the database to validate that the input email is unique.
         """
 
-        user = User.query.filter_by(email=email.data).first()
-        if user is None:
+        self.user = User.find_by_email(email.data)
+        if self.user is None:
             raise ValidationError("There is no account with that email.")
 
+
 class ResetPasswordForm(FlaskForm):
     password = PasswordField("Password", validators=[DataRequired()])
     confirm_password = PasswordField("Confirm Password",
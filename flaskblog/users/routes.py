@@ -1,15 +1,37 @@
-from flask import render_template, url_for, flash, redirect, request, Blueprint
+from datetime import datetime
+import click
+from flask import (render_template, url_for, flash, redirect, request,
+                   Blueprint, current_app, jsonify)
 from flask_login import login_user, current_user, logout_user, login_required
-from flaskblog import db, bcrypt
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from flaskblog import (db,
+                       account_names,
+                       cache,
+                       hasher,
+                       login_throttle,
+                       missing_cache,
+                       user_cache)
+from flaskblog.cache import post_tags
+from flaskblog.conditional import conditional, user_feed_validators
+from flaskblog.database import read_replica
+from flaskblog.mail_queue import MailQueueFull
 from flaskblog.models import User, Post
+from flaskblog.pagination import check_page, feed_page, paginate_posts
+from flaskblog.posts.utils import WITHOUT_CONTENT, WITHOUT_HTML
+from flaskblog.streaming import render_page
 from flaskblog.users.forms import (RegistrationForm,
                                    LoginForm,
                                    UpdateAccountForm,
                                    RequestResetForm,
                                    ResetPasswordForm)
-from flaskblog.users.utils import save_picture, send_reset_email
+from flaskblog.users.utils import (PictureError,
+                                   avatar_url,
+                                   save_picture,
+                                   send_reset_email)
 
 users = Blueprint("users", __name__)
+users.add_app_template_global(avatar_url)
 
 
 @users.route("/register", methods=["GET", "POST"])
@@ -30,13 +52,16 @@ def register() -> str:
     form = RegistrationForm()
 
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode("utf-8")
+        hashed_password = hasher.generate_password_hash(form.password.data)
 
         user = User(username=form.username.data,
                     email=form.email.data,
                     password=hashed_password)
         db.session.add(user)
         db.session.commit()
+        # The commit expired ``user``; reading it back would cost a query.
+        account_names.add(form.username.data, form.email.data)
+        missing_cache.discard("user", form.username.data)
         flash("Your account has been created, you may now log in.", "success")
 
         return redirect(url_for("users.login"))
@@ -44,6 +69,27 @@ def register() -> str:
     return render_template("register.html", title="register", form=form)
 
 
+@users.route("/register/check")
+@read_replica
+def check_availability() -> str:
+    """
+    Check whether a username or email is free.
+
+    Called by the registration page while the user types.  Each of the
+    ``username`` and ``email`` arguments given is answered with true when
+    no account has it.
+
+    Returns:
+        str: JSON such as ``{"username": true, "email": false}``.
+    """
+
+    result = {kind: account_names.is_available(kind, request.args[kind])
+              for kind in ("username", "email") if request.args.get(kind)}
+    response = jsonify(result)
+    response.cache_control.no_store = True
+    return response
+
+
 @users.route("/login", methods=["GET", "POST"])
 def login() -> str:
     """
@@ -63,15 +109,44 @@ def login() -> str:
     form = LoginForm()
 
     if form.validate_on_submit():
-        user = User.query.filter_by(email=form.email.data).first()
-        if user and bcrypt.check_password_hash(user.password, form.password.data):
+        # Throttling happens before any bcrypt work is spent on the attempt.
+        # Each account has a low limit per address and a higher one across
+        # addresses, which caps guessing spread over many clients.
+        address = request.remote_addr
+        email = form.email.data.lower()
+        pair_key = f"account:{email}:{address}"
+        config = current_app.config
+        limits = {f"ip:{address}": config["LOGIN_LIMIT_PER_IP"],
+                  pair_key: config["LOGIN_LIMIT_PER_ACCOUNT_AND_IP"],
+                  f"account:{email}": config["LOGIN_LIMIT_PER_ACCOUNT"]}
+        if any(login_throttle.is_blocked(key, limit, window)
+               for key, (limit, window) in limits.items()):
+            flash("Too many failed logins.  Please try again later.",
+                  "danger")
+            return render_template("login.html", title="login",
+                                   form=form), 429
+
+        user = User.find_by_email(form.email.data)
+        if user and hasher.check_password_hash(user.password,
+                                               form.password.data):
+            # The account-wide count is left alone, or logging in now and
+            # then would let someone else keep guessing.
+            login_throttle.reset(pair_key)
+            if hasher.needs_rehash(user.password):
+                user.password = hasher.generate_password_hash(
+                    form.password.data)
+                db.session.commit()
             login_user(user, remember=form.remember.data)
             next_page = request.args.get("next")
 
-            return redirect(next_page) if next_page else redirect(url_for("main.home"))
+            return redirect(next_page) if next_page \
+                else redirect(url_for("main.home"))
 
         else:
-            flash("login unsuccessful.  please check email and password", "danger")
+            for key, (_, window) in limits.items():
+                login_throttle.fail(key, window)
+            flash("login unsuccessful.  please check email and password",
+                  "danger")
 
     return render_template("login.html", title="login", form=form)
 
@@ -106,24 +181,45 @@ def account() -> str:
     form = UpdateAccountForm()
     if form.validate_on_submit():
         if form.picture.data:
-            picture_file = save_picture(form.picture.data)
+            try:
+                picture_file = save_picture(form.picture.data)
+            except PictureError as error:
+                flash(str(error), "danger")
+                return redirect(url_for("users.account"))
             current_user.image_file = picture_file
         current_user.username = form.username.data
         current_user.email = form.email.data
+        changed = db.session.is_modified(current_user)
+        if changed:
+            current_user.last_modified = datetime.utcnow()
         db.session.commit()
+        # Only after the commit, or a page rendered meanwhile would cache
+        # the old name again.
+        user_cache.invalidate(current_user.id)
+        cache.invalidate(f"author:{current_user.id}")
+        if changed:
+            # The home feed shows authors' names and pictures.
+            cache.invalidate("feed:home")
+        account_names.add(current_user.username, current_user.email)
+        missing_cache.discard("user", current_user.username)
         flash("your account has been updated!", "success")
         return redirect(url_for("users.account"))
     elif request.method == "GET":
         form.username.data = current_user.username
         form.email.data = current_user.email
 
-    image_file = url_for("static", filename="profile_pics/" + current_user.image_file)
+    image_file = avatar_url(current_user.image_file, 125)
 
-    return render_template("account.html", title="Account", image_file=image_file, form=form)
+    return render_template("account.html", title="Account",
+                           image_file=image_file, form=form)
 
 
 @users.route("/user/<string:username>")  # both paths take you to the same
 # place
+@missing_cache.guard("user", "username")
+@read_replica
+@conditional(user_feed_validators)
+@cache.cached
 def user_posts(username) -> render_template:
     """
     Individual user posts.
@@ -134,13 +230,50 @@ def user_posts(username) -> render_template:
         function: A rendered template for a user's page.
     """
 
-    page = request.args.get("page", 1, type=int)
-    user = User.query.filter_by(username=username).first_or_404()
-    posts = Post.query.filter_by(author=user)\
-        .order_by(Post.date_posted.desc())\
-        .paginate(page=page, per_page=5)
+    user = missing_cache.or_404(
+        "user", username, User.query.filter_by(username=username).first())
+
+    query = Post.query.filter_by(author=user)\
+        .options(joinedload(Post.author), *WITHOUT_CONTENT)
+    # Refused before a streamed page sends its 200.
+    total = check_page(query, f"user:{user.id}", total=user.post_count)
+
+    def load_posts():
+        posts = paginate_posts(query, f"user:{user.id}", total=total,
+                               checked=True)
+        cache.tag(f"feed:user:{user.id}", f"author:{user.id}",
+                  *post_tags(posts.items))
+        return posts
+
+    return render_page("user_posts.html", deferred={"posts": load_posts},
+                       user=user)
+
+
+@users.route("/user/<string:username>/posts.json")
+@missing_cache.guard("user", "username")
+@read_replica
+@conditional(user_feed_validators)
+@cache.cached
+def user_posts_json(username) -> str:
+    """
+    Individual user posts as JSON.
+
+    Show all posts from an individual user using keyset pagination.
 
-    return render_template("user_posts.html", posts=posts, user=user)
+    Returns:
+        str: A JSON page of the user's posts.
+    """
+
+    user = missing_cache.or_404(
+        "user", username, User.query.filter_by(username=username).first())
+    query = Post.query.filter_by(author=user)\
+        .options(joinedload(Post.author), *WITHOUT_HTML)
+    posts = paginate_posts(query, f"user:{user.id}", cursor_only=True)
+    cache.tag(f"feed:user:{user.id}", f"author:{user.id}",
+              *post_tags(posts.items))
+
+    return jsonify(feed_page(posts, "users.user_posts_json",
+                             username=user.username))
 
 
 @users.route("/reset_password", methods=["GET", "POST"])
@@ -156,13 +289,18 @@ def reset_request() -> str:
     form = RequestResetForm()
 
     if form.validate_on_submit():
-        user = User.query.filter_by(email=form.email.data).first()
-        send_reset_email(user)
+        try:
+            send_reset_email(form.user)
+        except MailQueueFull:
+            flash("We cannot send email right now.  Please try again in a "
+                  "few minutes.", "warning")
+            return redirect(url_for("users.reset_request"))
         flash("An email has been sent with instructions how to reset your "
               "password.", "info")
         return redirect(url_for("users.login"))
 
-    return render_template("reset_request.html", title="Reset Password", form=form)
+    return render_template("reset_request.html", title="Reset Password",
+                           form=form)
 
 
 @users.route("/reset_password/<token>", methods=["GET", "POST"])
@@ -183,10 +321,11 @@ def reset_token(token) -> str:
     form = ResetPasswordForm()
 
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode("utf-8")
+        hashed_password = hasher.generate_password_hash(form.password.data)
 
         user.password = hashed_password
         db.session.commit()
+        user_cache.invalidate(user.id)
         flash("Your password has been reset successfully.", "success")
 
         return redirect(url_for("users.login"))
@@ -194,3 +333,25 @@ def reset_token(token) -> str:
     return render_template("reset_token.html",
                            title="Reset Password",
                            form=form)
+
+
+@users.cli.command("reconcile-counts")
+def reconcile_counts() -> None:
+    """
+    Recompute every user's post counters.
+
+    ``post_count`` and ``last_posted_at`` are maintained by the post routes;
+    this repairs them after bulk imports or manual edits.
+    """
+
+    count = select(func.count(Post.id))\
+        .where(Post.user_id == User.id).scalar_subquery()
+    latest = select(func.max(Post.date_posted))\
+        .where(Post.user_id == User.id).scalar_subquery()
+    stale = User.query\
+        .filter((User.post_count != count)
+                | (User.last_posted_at.is_distinct_from(latest)))\
+        .update({User.post_count: count, User.last_posted_at: latest},
+                synchronize_session=False)
+    db.session.commit()
+    click.echo(f"Reconciled {stale} users.")
@@ -1,50 +1,229 @@
+import hashlib
+import io
+import multiprocessing
 import os
-import secrets
-from PIL import Image
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from flask import current_app, url_for
 from flask_mail import Message
-from flaskblog import mail
+from flaskblog import mail_queue
+
+DEFAULT_PICTURE = "default.jpg"
+HASHED_PICTURE = re.compile(r"^[0-9a-f]{20}(_\d+)?\.\w+$")
+UPLOAD_CHUNK = 64 * 1024
+# Windows has no forkserver.
+_START_METHOD = "forkserver" \
+    if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_pool = None
+
+
+class PictureError(Exception):
+    """Raised when an uploaded picture cannot be processed."""
+
+
+def _process_picture(path, sizes, image_format, quality,
+                     max_pixels) -> dict:
+    """
+    Decode a picture and encode one square thumbnail per size.
+
+    Runs in the picture process pool, so it reads the upload from ``path``
+    rather than having it pickled across.
+
+    Returns:
+        dict: each size in pixels mapped to the encoded thumbnail.
+
+    Raises:
+        PictureError: if the picture is too large or cannot be decoded.
+    """
+
+    # Pillow is only needed when a picture is uploaded, so it is not loaded
+    # at startup.
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(path)
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise PictureError("That file is not a picture.") from exc
+
+    with image:
+        # The header is parsed lazily, so this check runs before any
+        # decoding.
+        if image.width * image.height > max_pixels:
+            raise PictureError("That picture is too large.")
+
+        largest = max(sizes)
+        image.draft("RGB", (largest, largest))
+        try:
+            image = ImageOps.exif_transpose(image).convert("RGB")
+        except (OSError, Image.DecompressionBombError) as exc:
+            raise PictureError("That picture could not be read.") from exc
+
+    thumbnails = {}
+    for size in sizes:
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, image_format, quality=quality)
+        thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
+
+def _picture_pool():
+    global _pool
+
+    if _pool is None:
+        # Forked children would inherit the app's threads and open
+        # connections, the mail queue's worker and the pool's own included;
+        # forkserver starts them from a clean process instead.
+        _pool = ProcessPoolExecutor(
+            max_workers=current_app.config["PICTURE_WORKERS"],
+            mp_context=multiprocessing.get_context(_START_METHOD))
+    return _pool
+
+
+def _spool_upload(form_picture, limit):
+    # Copy the upload to a named file in chunks, hashing it on the way, so
+    # it is never held in memory whole and the pool can open it by path.
+    digest = hashlib.sha256()
+    size = 0
+    upload = tempfile.NamedTemporaryFile(prefix="flaskblog-picture-",
+                                         delete=False)
+    try:
+        with upload:
+            for chunk in iter(lambda: form_picture.stream.read(UPLOAD_CHUNK),
+                              b""):
+                size += len(chunk)
+                if size > limit:
+                    raise PictureError("That picture is too large.")
+                digest.update(chunk)
+                upload.write(chunk)
+    except BaseException:
+        os.unlink(upload.name)
+        raise
+    return upload.name, digest.hexdigest()
 
 
 def save_picture(form_picture) -> str:
     """
     Save the user's uploaded picture.
 
-    This function will save a picture that a user has uploaded and change
-    the name.
+    Resizes the picture to every size in ``PICTURE_SIZES`` and stores them
+    in ``PICTURE_FORMAT`` in the media storage.  Files are named by a hash
+    of their content, so uploading the same picture twice reuses the
+    existing files.  Decoding runs in a process pool to keep the request
+    thread free.
 
     Args:
-        form_picture (str): the picture uploaded by the user.
+        form_picture (FileStorage): the picture uploaded by the user.
 
     Returns:
         str: the filename of the user's uploaded picture.
+
+    Raises:
+        PictureError: if the picture is too large or cannot be decoded.
     """
 
-    random_hex = secrets.token_hex(8)
-    _, f_ext = os.path.splitext(form_picture.filename)
-    picture_fn = random_hex + f_ext
-    picture_path = os.path.join(current_app.root_path, "static/profile_pics",
-                                picture_fn)
+    config = current_app.config
+    storage = current_app.extensions["media_storage"]
+    path, digest = _spool_upload(form_picture, config["PICTURE_MAX_BYTES"])
+    try:
+        image_format = config["PICTURE_FORMAT"]
+        extension = "jpg" if image_format == "JPEG" \
+            else image_format.lower()
+        picture_fn = f"{digest[:20]}.{extension}"
+        names = {size: picture_name(picture_fn, size)
+                 for size in config["PICTURE_SIZES"]}
+        # Touched rather than checked: the files may belong to an account
+        # that dropped them and be about to be collected as garbage.
+        if all([storage.touch(name) for name in names.values()]):
+            return picture_fn
 
-    output_size = (125, 125)
-    i = Image.open(form_picture)
-    i.thumbnail(output_size)
-    i.save(picture_path)
+        args = (path, tuple(names), image_format,
+                max(1, min(95, config["PICTURE_QUALITY"])),
+                config["PICTURE_MAX_PIXELS"])
+        if config["PICTURE_WORKERS"]:
+            thumbnails = _picture_pool().submit(_process_picture, *args)\
+                .result()
+        else:
+            thumbnails = _process_picture(*args)
+    finally:
+        os.unlink(path)
 
+    for size, data in thumbnails.items():
+        storage.save(names[size], io.BytesIO(data))
     return picture_fn
 
 
+def is_hashed_picture(name) -> bool:
+    """Whether a stored picture is named by its content's hash."""
+
+    return HASHED_PICTURE.match(name) is not None
+
+
+def picture_name(image_file, size) -> str:
+    """
+    Find the stored name of a profile picture at a given size.
+
+    Pictures saved before resizing existed, and the default picture, only
+    come in one size.
+
+    Args:
+        image_file (str): the user's ``image_file``.
+        size (int): the wanted width and height in pixels.
+
+    Returns:
+        str: the name in the media storage.
+    """
+
+    name, extension = os.path.splitext(image_file)
+    if len(name) != 20 or size not in current_app.config["PICTURE_SIZES"]:
+        return image_file
+    return f"{name}_{size}{extension}"
+
+
+def picture_names(image_file) -> set:
+    """Return the stored names of every size of a profile picture."""
+
+    return {picture_name(image_file, size)
+            for size in current_app.config["PICTURE_SIZES"]}
+
+
+def avatar_url(image_file, size) -> str:
+    """
+    Build the url of a profile picture at a given size.
+
+    Available in templates as ``avatar_url``.  The default picture ships
+    with the static files; uploads come from the media storage.
+    """
+
+    if image_file == DEFAULT_PICTURE:
+        return url_for("static", filename="profile_pics/" + DEFAULT_PICTURE)
+    return current_app.extensions["media_storage"].url(
+        picture_name(image_file, size))
+
+
 def send_reset_email(user, base_url="http://localhost:5000"):
+    """
+    Queue the password reset email.
+
+    The message is built here, while the request context is available,
+    and delivered by the mail queue's worker.
+
+    Raises:
+        MailQueueFull: if the mail queue is at capacity.
+    """
+
     token = user.get_reset_token()
     msg = Message("Password Reset Request",
                   sender="noreply@test.com",
                   recipients=[user.email])
     msg.body = f"""
-    To reset your password, please visit the following link: 
+    To reset your password, please visit the following link:
 {base_url}{url_for("users.reset_token", token=token, external=True)}
 
-If you did not make this request then ignore this email and no changes will 
+If you did not make this request then ignore this email and no changes will
 be made.
     """
 
-    mail.send(msg)
+    mail_queue.enqueue(msg)
@@ -0,0 +1,48 @@
+"""index hot lookups
+
+Every feed orders posts by (date_posted, id), and a user's feed filters
+on user_id first.  Sign-up, login and password resets match usernames and
+emails with lower().  Creating the unique lower() indexes fails if two
+accounts differ only in case; merge or rename them first.
+
+Revision ID: 3f4baafe7221
+Revises: b25ee6ac9cf6
+Create Date: 2026-10-18 20:41:07.512003
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f4baafe7221'
+down_revision = 'b25ee6ac9cf6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_email_lower',
+                              [sa.text('lower(email)')], unique=True)
+        batch_op.create_index('ix_user_username_lower',
+                              [sa.text('lower(username)')], unique=True)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_date_posted_id',
+                              ['date_posted', 'id'], unique=False)
+        batch_op.create_index('ix_post_user_id_date_posted',
+                              ['user_id', 'date_posted'], unique=False)
+        batch_op.create_index('ix_post_last_modified',
+                              ['last_modified'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_last_modified')
+        batch_op.drop_index('ix_post_user_id_date_posted')
+        batch_op.drop_index('ix_post_date_posted_id')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_username_lower')
+        batch_op.drop_index('ix_user_email_lower')
@@ -0,0 +1,57 @@
+"""user last modified
+
+Adds the time an account or one of its posts last changed, which the
+conditional GET validators read.  Existing accounts get the latest
+modification of their posts, or the time of the upgrade.
+
+Revision ID: 5d0c8a7e3b19
+Revises: 91542eff5261
+Create Date: 2026-10-19 09:12:44.318270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0c8a7e3b19'
+down_revision = '91542eff5261'
+branch_labels = None
+depends_on = None
+
+
+def _restore_lower_indexes():
+    # SQLite's batch mode copies the table, and the copy loses the
+    # expression indexes, which it cannot reflect.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_email_lower',
+                              [sa.text('lower(email)')], unique=True)
+        batch_op.create_index('ix_user_username_lower',
+                              [sa.text('lower(username)')], unique=True)
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_modified', sa.DateTime(),
+                                      nullable=True))
+
+    op.execute('UPDATE "user" SET last_modified = coalesce('
+               '(SELECT max(post.last_modified) FROM post '
+               'WHERE post.user_id = "user".id), CURRENT_TIMESTAMP)')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('last_modified',
+                              existing_type=sa.DateTime(),
+                              nullable=False)
+        batch_op.create_index('ix_user_last_modified', ['last_modified'],
+                              unique=False)
+    _restore_lower_indexes()
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_last_modified')
+        batch_op.drop_column('last_modified')
+    _restore_lower_indexes()
@@ -0,0 +1,72 @@
+"""search index
+
+The full-text index behind /search: an FTS5 table kept in step by
+triggers on SQLite, a GIN index on PostgreSQL.  Existing posts are
+indexed too.
+
+Revision ID: 91542eff5261
+Revises: 3f4baafe7221
+Create Date: 2026-10-18 20:44:38.730162
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '91542eff5261'
+down_revision = '3f4baafe7221'
+branch_labels = None
+depends_on = None
+
+# Copied from flaskblog.search.utils, so later changes to the app do not
+# change what this revision creates.
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS post_fts
+       USING fts5(title, content, content='post', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_insert AFTER INSERT ON post
+       BEGIN
+           INSERT INTO post_fts(rowid, title, content)
+           VALUES (new.id, new.title, new.content);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_delete AFTER DELETE ON post
+       BEGIN
+           INSERT INTO post_fts(post_fts, rowid, title, content)
+           VALUES ('delete', old.id, old.title, old.content);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_update
+       AFTER UPDATE OF title, content ON post
+       BEGIN
+           INSERT INTO post_fts(post_fts, rowid, title, content)
+           VALUES ('delete', old.id, old.title, old.content);
+           INSERT INTO post_fts(rowid, title, content)
+           VALUES (new.id, new.title, new.content);
+       END""",
+]
+
+POSTGRES_DDL = [
+    """CREATE INDEX IF NOT EXISTS ix_post_search
+       ON post USING GIN (to_tsvector('english',
+                                      post.title || ' ' || post.content))""",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO post_fts(post_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('post_fts_insert', 'post_fts_delete',
+                        'post_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS post_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_post_search')
@@ -0,0 +1,49 @@
+"""initial schema
+
+The tables as db.create_all() made them before migrations were added.
+Databases created that way are brought under migrations with
+"flask db stamp 9a22e43d04b1".
+
+Revision ID: 9a22e43d04b1
+Revises:
+Create Date: 2026-10-18 20:26:52.879290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a22e43d04b1'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=20), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('image_file', sa.String(length=20), nullable=False),
+        sa.Column('password', sa.String(length=60), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username')
+    )
+    op.create_table(
+        'post',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('date_posted', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('post')
+    op.drop_table('user')
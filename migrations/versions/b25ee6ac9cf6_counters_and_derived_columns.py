@@ -0,0 +1,112 @@
+"""counters and derived columns
+
+Adds the per-user post counters, the posts' modification time and the
+excerpt and rendered HTML the feeds show instead of whole posts, and
+fills them in for existing rows.  Profile picture names grow to fit a
+content hash.
+
+Revision ID: b25ee6ac9cf6
+Revises: 9a22e43d04b1
+Create Date: 2026-10-18 20:33:15.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from markupsafe import escape
+
+
+# revision identifiers, used by Alembic.
+revision = 'b25ee6ac9cf6'
+down_revision = '9a22e43d04b1'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+EXCERPT_LENGTH = 280
+
+post = sa.table('post',
+                sa.column('id', sa.Integer),
+                sa.column('content', sa.Text),
+                sa.column('excerpt', sa.String),
+                sa.column('content_html', sa.Text))
+
+
+# Copies of flaskblog.posts.utils as they were when this revision was
+# written, so later changes to the app do not change what it does.
+def _make_excerpt(content, length=EXCERPT_LENGTH):
+    text = ' '.join(content.split())
+    if len(text) <= length:
+        return text
+
+    cut = text.rfind(' ', 0, length + 1)
+    return text[:cut if cut > 0 else length].rstrip(' ,.;:') + '…'
+
+
+def _render_content(content):
+    return str(escape(content))
+
+
+def _backfill_content(bind):
+    # Batches of ascending id, so memory stays flat on big tables.
+    last = 0
+    while True:
+        rows = bind.execute(
+            sa.select(post.c.id, post.c.content)
+            .where(post.c.id > last).order_by(post.c.id)
+            .limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+        bind.execute(
+            post.update().where(post.c.id == sa.bindparam('post_id')),
+            [{'post_id': post_id, 'excerpt': _make_excerpt(content),
+              'content_html': _render_content(content)}
+             for post_id, content in rows])
+        last = rows[-1].id
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('post_count', sa.Integer(),
+                                      server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_posted_at', sa.DateTime(),
+                                      nullable=True))
+        batch_op.alter_column('image_file',
+                              existing_type=sa.String(length=20),
+                              type_=sa.String(length=40),
+                              existing_nullable=False)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('excerpt', sa.String(length=300),
+                                      nullable=True))
+        batch_op.add_column(sa.Column('content_html', sa.Text(),
+                                      nullable=True))
+        batch_op.add_column(sa.Column('last_modified', sa.DateTime(),
+                                      nullable=True))
+
+    op.execute('UPDATE post SET last_modified = date_posted')
+    op.execute('UPDATE "user" SET '
+               'post_count = (SELECT count(post.id) FROM post '
+               'WHERE post.user_id = "user".id), '
+               'last_posted_at = (SELECT max(post.date_posted) FROM post '
+               'WHERE post.user_id = "user".id)')
+    _backfill_content(op.get_bind())
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.alter_column('last_modified',
+                              existing_type=sa.DateTime(),
+                              nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('last_modified')
+        batch_op.drop_column('content_html')
+        batch_op.drop_column('excerpt')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('image_file',
+                              existing_type=sa.String(length=40),
+                              type_=sa.String(length=20),
+                              existing_nullable=False)
+        batch_op.drop_column('last_posted_at')
+        batch_op.drop_column('post_count')
@@ -0,0 +1,67 @@
+import pytest
+from flaskblog import create_app, db, login_throttle
+from flaskblog.config import TestingConfig
+from flaskblog.seed import PASSWORD, seed_database
+
+# Requests reuse an app context that is already pushed, g included, so
+# tests push one only around their own database access.
+
+
+@pytest.fixture
+def make_app():
+    """Build a testing app with some config keys overridden."""
+
+    apps = []
+
+    def make(**overrides):
+        config = type("Config", (TestingConfig,), overrides)
+        app = create_app(config)
+        # Only the primary: once an app has a replica bind, db keeps its
+        # metadata for every later app too.
+        with app.app_context():
+            db.create_all(bind_key=None)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.drop_all(bind_key=None)
+
+
+@pytest.fixture(autouse=True)
+def clear_login_throttle():
+    # The throttle is module-global, so failures would carry across apps.
+    yield
+    login_throttle.clear()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def seed(app, users, posts, **kwargs) -> None:
+    """Seed ``app``'s database; every password is ``PASSWORD``."""
+
+    with app.app_context():
+        seed_database(users, posts, **kwargs)
+
+
+@pytest.fixture
+def seeded(app):
+    """Three authors sharing 20 posts."""
+
+    seed(app, 3, 20, seed=1)
+
+
+def login(client, email, password=PASSWORD):
+    response = client.post("/login", data={"email": email,
+                                           "password": password})
+    assert response.status_code == 302
+    return response
@@ -0,0 +1,57 @@
+import threading
+import pytest
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(ADMISSION_CLASSES={"read": (1, 0), "auth": (1, 1)},
+                    ADMISSION_QUEUE_TIMEOUT=0.05)
+
+
+@pytest.fixture
+def gates(app):
+    return app.extensions["admission"].gates
+
+
+def test_endpoints_are_classified_by_name_then_blueprint(app):
+    admission = app.extensions["admission"]
+
+    assert admission.classify("users.login", "users") == "auth"
+    assert admission.classify("search.results", "search") == "bulk"
+    assert admission.classify("main.home", "main") == "read"
+    assert admission.classify("static", None) is None
+
+
+def test_full_classes_are_shed_with_retry_after(client, gates):
+    gates["read"].acquire(0)
+
+    response = client.get("/about")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert gates["read"].shed == 1
+
+
+def test_other_classes_are_still_served(client, gates):
+    gates["auth"].acquire(0)
+
+    assert client.get("/about").status_code == 200
+    assert client.get("/static/main.css").status_code == 200
+
+
+def test_queued_requests_wait_for_a_slot(app, client, gates):
+    gate = gates["auth"]
+    gate.acquire(0)
+
+    assert client.get("/login").status_code == 503
+    assert gate.queued == 1
+
+    app.extensions["admission"].timeout = 5
+    threading.Timer(0.05, gate.release).start()
+    assert client.get("/login").status_code == 200
+    assert gate.queued == 2 and gate.active == 0
+
+
+def test_slots_are_released_after_errors(client, gates):
+    assert client.get("/post/999").status_code == 404
+    assert client.get("/about").status_code == 200
+    assert gates["read"].active == 0
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from flaskblog.aio import AsgiApp
+from tests.conftest import seed
+
+
+def call(app, method, path, body=b"", headers=()) -> list:
+    """Run one request through ``app`` and return the messages it sent."""
+
+    scope = {"type": "http", "method": method, "path": path,
+             "query_string": b"", "http_version": "1.1",
+             "headers": [(b"host", b"testserver"), *headers],
+             "server": ("testserver", 80), "client": ("10.0.0.1", 5000)}
+    received = [{"type": "http.request", "body": body[:5],
+                 "more_body": True},
+                {"type": "http.request", "body": body[5:]}]
+    sent = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(AsgiApp(app)(scope, receive, send))
+    return sent
+
+
+def test_responses_are_streamed_back(app):
+    seed(app, 1, 3)
+
+    start, *body, end = call(app, "GET", "/home.json")
+
+    assert start["status"] == 200
+    assert (b"content-type", b"application/json") in start["headers"]
+    assert all(message["more_body"] for message in body)
+    assert b"".join(message["body"] for message in body).startswith(b"{")
+    assert end == {"type": "http.response.body"}
+
+
+def test_request_bodies_and_headers_reach_flask(app):
+    seen = {}
+
+    @app.route("/echo", methods=["POST"])
+    def echo():
+        from flask import request
+
+        seen.update(form=request.form.to_dict(), ip=request.remote_addr,
+                    host=request.host, thread=threading.current_thread().name)
+        return "ok"
+
+    body = b"title=Hello&content=World"
+    start, *_ = call(app, "POST", "/echo", body, [
+        (b"content-type", b"application/x-www-form-urlencoded"),
+        (b"content-length", str(len(body)).encode())])
+
+    assert start["status"] == 200
+    assert seen["form"] == {"title": "Hello", "content": "World"}
+    assert seen["ip"] == "10.0.0.1" and seen["host"] == "testserver"
+    assert seen["thread"].startswith("asgi")
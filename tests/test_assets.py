@@ -0,0 +1,30 @@
+import pytest
+from flask import url_for
+
+
+@pytest.fixture
+def assets(app):
+    return app.extensions["assets"]
+
+
+def test_hashed_names_are_immutable(app, client):
+    with app.test_request_context():
+        url = url_for("static", filename="main.css")
+    assert url.startswith("/static/main.") and url != "/static/main.css"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+
+
+@pytest.mark.parametrize("path", [
+    "/static/..%2fconfig.py",
+    "/static/..%2f__init__.cafebabe0123.py",
+    "/static/main.0123456789ab.css",
+    "/static/missing.0123456789ab.css",
+])
+def test_request_paths_never_reach_the_manifest(client, assets, path):
+    size = len(assets.manifest)
+
+    assert client.get(path).status_code == 404
+    assert len(assets.manifest) == size
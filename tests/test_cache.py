@@ -0,0 +1,108 @@
+import fakeredis
+import pytest
+from sqlalchemy import event
+from flaskblog import cache, db
+from flaskblog.cache import RedisBackend
+from flaskblog.models import Post, User
+from tests.conftest import login, seed
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(CACHE_TYPE="lru")
+    seed(app, 2, 10, seed=5)
+    return app
+
+
+@pytest.fixture
+def author(app):
+    with app.app_context():
+        user = User.query.first()
+        post = Post.query.filter_by(user_id=user.id).first()
+        return user.id, user.email, post.id
+
+
+def test_cached_pages_follow_a_rename(app, author):
+    _, email, post_id = author
+    reader = app.test_client()
+    reader.get(f"/post/{post_id}")
+    assert reader.get(f"/post/{post_id}").headers["X-Cache"] == "HIT"
+    writer = app.test_client()
+    login(writer, email)
+
+    writer.post("/account", data={"username": "renamed", "email": email})
+
+    response = reader.get(f"/post/{post_id}")
+    assert response.headers["X-Cache"] == "MISS"
+    assert b"renamed" in response.data
+
+
+def test_author_pages_are_invalidated_after_the_commit(app, author,
+                                                       monkeypatch):
+    user_id, email, _ = author
+    client = app.test_client()
+    login(client, email)
+    events = []
+    invalidate = cache.invalidate
+
+    def record(*tags):
+        events.extend(tags)
+        invalidate(*tags)
+
+    def committed(session):
+        events.append("commit")
+
+    monkeypatch.setattr(cache, "invalidate", record)
+    event.listen(db.session, "after_commit", committed)
+    try:
+        client.post("/account", data={"username": "renamed", "email": email})
+    finally:
+        event.remove(db.session, "after_commit", committed)
+
+    assert events.index("commit") < events.index(f"author:{user_id}")
+
+
+@pytest.fixture
+def redis_backend():
+    return RedisBackend(fakeredis.FakeRedis(), default_timeout=60,
+                        prefix="test:")
+
+
+def test_redis_entries_are_prefixed_and_expire(redis_backend):
+    redis_backend.set("page", {"body": b"<html>"})
+    redis_backend.set("short", 1, timeout=5)
+
+    assert redis_backend.get("page") == {"body": b"<html>"}
+    assert redis_backend.get("missing") is None
+    assert redis_backend.client.ttl("test:page") == 60
+    assert redis_backend.client.ttl("test:short") == 5
+
+    redis_backend.delete("page", "missing")
+    assert redis_backend.get("page") is None
+
+
+def test_redis_tags_invalidate_their_keys(redis_backend):
+    redis_backend.set("home", 1, tags=("feed:home",))
+    redis_backend.set("post", 2, tags=("feed:home", "post:1"))
+    redis_backend.set("other", 3, tags=("post:2",))
+
+    redis_backend.invalidate("feed:home")
+
+    assert redis_backend.get("home") is None
+    assert redis_backend.get("post") is None
+    assert redis_backend.get("other") == 3
+    assert not redis_backend.client.exists("test:tag:feed:home")
+
+
+def test_pages_are_cached_in_redis(make_app):
+    client = fakeredis.FakeRedis()
+    app = make_app(CACHE_TYPE="redis", CACHE_REDIS_CLIENT=client)
+    seed(app, 1, 3, seed=5)
+    reader = app.test_client()
+
+    assert reader.get("/post/1").headers["X-Cache"] == "MISS"
+    assert client.smembers("flaskblog:page:tag:post:1")
+    assert reader.get("/post/1").headers["X-Cache"] == "HIT"
+
+    cache.invalidate("post:1")
+    assert reader.get("/post/1").headers["X-Cache"] == "MISS"
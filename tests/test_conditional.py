@@ -0,0 +1,93 @@
+import pytest
+from flaskblog import cache, db
+from flaskblog.models import Post, User
+from flaskblog.testing import assert_max_queries
+from tests.conftest import login, seed
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(CACHE_TYPE="lru")
+    seed(app, 2, 10, seed=4)
+    return app
+
+
+@pytest.fixture
+def author(app):
+    with app.app_context():
+        user = User.query.first()
+        post = Post.query.filter_by(user_id=user.id).first()
+        return user.id, user.email, user.username, post.id
+
+
+def _etag(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def test_revalidation_reads_one_row(app, client):
+    etag = _etag(client, "/")
+
+    with app.app_context(), assert_max_queries(1):
+        response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_writes_change_the_etags(app, author):
+    _, email, username, post_id = author
+    reader = app.test_client()
+    paths = ["/", f"/post/{post_id}", f"/user/{username}", "/feed.atom"]
+    before = {path: _etag(reader, path) for path in paths}
+    writer = app.test_client()
+    login(writer, email)
+
+    writer.post(f"/post/{post_id}/update",
+                data={"title": "Edited", "content": "Edited."})
+    edited = {path: _etag(reader, path) for path in paths}
+    assert all(edited[path] != before[path] for path in paths)
+
+    writer.post("/account", data={"username": "renamed", "email": email})
+    assert _etag(reader, "/") != edited["/"]
+    assert _etag(reader, f"/post/{post_id}") != edited[f"/post/{post_id}"]
+
+
+def test_writes_on_other_workers_change_the_etags(app, author,
+                                                  monkeypatch):
+    _, email, _, post_id = author
+    reader = app.test_client()
+    home, post = _etag(reader, "/"), _etag(reader, f"/post/{post_id}")
+    # The writes happen on a worker whose page cache this one never sees.
+    monkeypatch.setattr(cache, "invalidate", lambda *tags: None)
+    writer = app.test_client()
+    login(writer, email)
+
+    writer.post("/post/new", data={"title": "New", "content": "Body"})
+    assert reader.get("/", headers={"If-None-Match": home}).status_code == 200
+
+    writer.post("/account", data={"username": "renamed", "email": email})
+    assert reader.get(f"/post/{post_id}", headers={
+        "If-None-Match": post}).status_code == 200
+
+
+def test_renaming_leaves_posts_unmodified(app, author):
+    user_id, email, _, _ = author
+    query = db.select(Post.last_modified).filter_by(user_id=user_id)
+    with app.app_context():
+        stamps = db.session.scalars(query).all()
+    client = app.test_client()
+    login(client, email)
+
+    client.post("/account", data={"username": "renamed", "email": email})
+    with app.app_context():
+        assert db.session.scalars(query).all() == stamps
+
+
+def test_validators_without_a_cache(make_app):
+    app = make_app(CACHE_TYPE="null")
+    seed(app, 1, 3)
+    client = app.test_client()
+    for path in ("/", "/post/1", "/user/user1"):
+        etag = _etag(client, path)
+        assert client.get(path, headers={
+            "If-None-Match": etag}).status_code == 304
@@ -0,0 +1,59 @@
+import shutil
+import pytest
+from flaskblog import db
+from flaskblog.database import engine_options
+from flaskblog.models import Post
+from tests.conftest import login, seed
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    """A primary and a replica that has fallen behind on post 1's title."""
+
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    app = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{primary}",
+                   SQLALCHEMY_REPLICA_URI=f"sqlite:///{replica}",
+                   SQLITE_WAL=False)
+    seed(app, 1, 2)
+    shutil.copy(primary, replica)
+    with app.app_context():
+        db.session.get(Post, 1).title = "On the primary"
+        db.session.commit()
+    return app
+
+
+def title(client) -> str:
+    return client.get("/api/v1/posts/1").get_json()["title"]
+
+
+def test_anonymous_reads_go_to_the_replica(client):
+    assert title(client) != "On the primary"
+
+
+def test_logged_in_users_read_their_own_writes(client):
+    login(client, "user1@example.com")
+    assert title(client) == "On the primary"
+
+
+def test_writes_go_to_the_primary(app, client):
+    login(client, "user1@example.com")
+    client.post("/post/1/update", data={"title": "Edited", "content": "x"})
+
+    with app.app_context():
+        assert db.session.get(Post, 1).title == "Edited"
+        replica = db.engines["replica"]
+        with replica.connect() as connection:
+            assert connection.scalar(
+                db.text("SELECT title FROM post WHERE id = 1")) != "Edited"
+
+
+def test_pools_are_only_configured_for_pooled_databases(app):
+    config = app.config
+    assert engine_options(config, "sqlite://") == {}
+    assert "pool_size" not in engine_options(config, "sqlite:////tmp/x.db")
+
+    options = engine_options(dict(config, DB_STATEMENT_TIMEOUT=5000),
+                             "postgresql://db/flaskblog")
+    assert options["pool_size"] == config["DB_POOL_SIZE"]
+    assert options["connect_args"] == {
+        "options": "-c statement_timeout=5000"}
@@ -0,0 +1,102 @@
+from xml.etree import ElementTree
+import pytest
+from flaskblog import db
+from flaskblog.feeds import routes, utils
+from flaskblog.models import Post, User
+from flaskblog.testing import count_queries
+from tests.conftest import login, seed
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+SITEMAP = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(CACHE_TYPE="lru", FEED_ENTRIES=5)
+    seed(app, 2, 12, seed=4)
+    return app
+
+
+def parse(response):
+    assert response.status_code == 200
+    return ElementTree.fromstring(response.get_data())
+
+
+def newest(app, count, **filters) -> list:
+    with app.app_context():
+        return [post.id for post in Post.query.filter_by(**filters)
+                .order_by(Post.date_posted.desc(), Post.id.desc())
+                .limit(count)]
+
+
+def entry_ids(feed) -> list:
+    links = feed.findall(f"{ATOM}entry/{ATOM}id") \
+        or feed.findall("channel/item/link")
+    return [int(link.text.rpartition("/")[2]) for link in links]
+
+
+@pytest.mark.parametrize("kind", ["atom", "rss"])
+def test_feeds_list_the_newest_posts(app, client, kind):
+    response = client.get(f"/feed.{kind}")
+
+    assert response.mimetype == utils.FORMATS[kind].mimetype
+    assert entry_ids(parse(response)) == newest(app, 5)
+
+
+def test_user_feeds_only_list_their_posts(app, client):
+    with app.app_context():
+        user = User.query.first()
+        user_id, username = user.id, user.username
+
+    feed = parse(client.get(f"/user/{username}/feed.atom"))
+    assert entry_ids(feed) == newest(app, 5, user_id=user_id)
+    assert client.get("/user/nobody/feed.atom").status_code == 404
+
+
+def test_post_content_is_escaped(app, client):
+    with app.app_context():
+        post = Post.query.order_by(Post.date_posted.desc()).first()
+        post.title = "Fish & <chips>"
+        db.session.commit()
+
+    feed = parse(client.get("/feed.atom"))
+    assert feed.find(f"{ATOM}entry/{ATOM}title").text == "Fish & <chips>"
+
+
+def test_only_new_entries_are_rendered(app, client):
+    parse(client.get("/feed.atom"))
+    writer = app.test_client()
+    login(writer, "user1@example.com")
+    writer.post("/post/new", data={"title": "Fresh", "content": "Body"})
+
+    with app.app_context(), count_queries() as counter:
+        feed = parse(client.get("/feed.atom"))
+
+    assert feed.find(f"{ATOM}entry/{ATOM}title").text == "Fresh"
+    loads = [statement for statement in counter.statements
+             if "post.content" in statement]
+    assert len(loads) == 1 and "IN (?)" in loads[0]
+
+
+def test_small_blogs_have_a_single_sitemap(app, client):
+    sitemap = parse(client.get("/sitemap.xml"))
+
+    locations = [loc.text for loc in sitemap.iter(f"{SITEMAP}loc")]
+    assert locations[0] == "http://localhost/home"
+    assert len(locations) == 13
+
+
+def test_large_blogs_have_a_sitemap_index(app, client, monkeypatch):
+    monkeypatch.setattr(routes, "SITEMAP_SIZE", 5)
+    monkeypatch.setattr(utils, "SITEMAP_SIZE", 5)
+
+    index = parse(client.get("/sitemap.xml"))
+    parts = [loc.text for loc in index.iter(f"{SITEMAP}loc")]
+    assert parts == [f"http://localhost/sitemap-{number}.xml"
+                     for number in range(3)]
+
+    listed = 0
+    for part in parts:
+        listed += len(list(parse(client.get(part)).iter(f"{SITEMAP}url")))
+    assert listed == 13
+    assert client.get("/sitemap-3.xml").status_code == 404
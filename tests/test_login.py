@@ -0,0 +1,48 @@
+import pytest
+from flaskblog.models import User
+from tests.conftest import PASSWORD, seed
+
+
+@pytest.fixture
+def email(app, seeded):
+    with app.app_context():
+        return User.query.first().email
+
+
+def attempt(client, email, password, address):
+    return client.post("/login", data={"email": email, "password": password},
+                       environ_base={"REMOTE_ADDR": address})
+
+
+def fail(app, email, times, address):
+    for _ in range(times):
+        assert attempt(app.test_client(), email, "wrong",
+                       address).status_code == 200
+
+
+def test_failed_logins_are_refused_after_the_limit(app, email):
+    limit, _ = app.config["LOGIN_LIMIT_PER_ACCOUNT_AND_IP"]
+    fail(app, email, limit, "10.0.0.1")
+
+    assert attempt(app.test_client(), email, PASSWORD,
+                   "10.0.0.1").status_code == 429
+
+
+def test_failures_elsewhere_do_not_lock_the_owner_out(app, email):
+    limit, _ = app.config["LOGIN_LIMIT_PER_ACCOUNT_AND_IP"]
+    fail(app, email, limit, "10.0.0.1")
+
+    assert attempt(app.test_client(), email, PASSWORD,
+                   "10.0.0.2").status_code == 302
+
+
+def test_guesses_from_many_addresses_are_capped(make_app):
+    app = make_app(LOGIN_LIMIT_PER_ACCOUNT=(6, 900))
+    seed(app, 1, 0)
+    with app.app_context():
+        email = User.query.first().email
+    for address in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+        fail(app, email, 2, address)
+
+    assert attempt(app.test_client(), email, PASSWORD,
+                   "10.0.0.4").status_code == 429
@@ -0,0 +1,70 @@
+import socket
+import pytest
+from aiosmtpd.controller import Controller
+from flaskblog import mail_queue
+from tests.conftest import seed
+
+EMAIL = "user1@example.com"
+
+
+class Sink:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+@pytest.fixture
+def sink():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        port = s.getsockname()[1]
+    handler = Sink()
+    controller = Controller(handler, hostname="localhost", port=port)
+    controller.start()
+    yield handler, port
+    controller.stop()
+
+
+def _mail_app(make_app, port, **overrides):
+    return make_app(MAIL_SERVER="localhost", MAIL_PORT=port,
+                    MAIL_USE_TLS=False, MAIL_USERNAME=None,
+                    MAIL_PASSWORD=None, MAIL_SUPPRESS_SEND=False,
+                    **overrides)
+
+
+def _request_reset(app):
+    client = app.test_client()
+    response = client.post("/reset_password",
+                           data={"email": EMAIL})
+    assert response.status_code == 302
+    return response
+
+
+def test_reset_email_is_delivered(make_app, sink):
+    handler, port = sink
+    app = _mail_app(make_app, port)
+    seed(app, 1, 0)
+
+    _request_reset(app)
+
+    assert len(handler.messages) == 1
+    message = handler.messages[0]
+    assert message.rcpt_tos == [EMAIL]
+    assert b"/reset_password/" in message.content
+
+
+def test_queued_emails_are_delivered(make_app, sink):
+    handler, port = sink
+    app = _mail_app(make_app, port, MAIL_QUEUE_ASYNC=True)
+    seed(app, 1, 0)
+    sent = mail_queue.metrics()["sent"]
+
+    for _ in range(3):
+        _request_reset(app)
+    mail_queue.stop()
+
+    assert len(handler.messages) == 3
+    assert mail_queue.metrics()["sent"] == sent + 3
@@ -0,0 +1,22 @@
+def test_metrics_are_off_by_default(client):
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_are_served_on_the_configured_path(make_app):
+    client = make_app(METRICS_PATH="/metrics").test_client()
+    client.get("/about")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert b"flaskblog_request_duration_seconds_count" in response.data
+
+
+def test_metrics_can_require_a_token(make_app):
+    client = make_app(METRICS_PATH="/metrics",
+                      METRICS_TOKEN="secret").test_client()
+
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={
+        "Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/metrics", headers={
+        "Authorization": "Bearer secret"}).status_code == 200
@@ -0,0 +1,91 @@
+import fakeredis
+import pytest
+from flaskblog import db, missing_cache
+from flaskblog.models import Post, User
+from flaskblog.testing import assert_max_queries
+from tests.conftest import login, seed
+
+
+def known(kind, key) -> bool:
+    return missing_cache.backend.get(f"{kind}:{key}") is not None
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(CACHE_TYPE="lru")
+    seed(app, 2, 10, seed=7)
+    return app
+
+
+@pytest.fixture
+def max_id(app):
+    with app.app_context():
+        return db.session.query(db.func.max(Post.id)).scalar()
+
+
+def test_missing_old_post_ids_are_remembered(app, client):
+    with app.app_context():
+        post = db.session.get(Post, 3)
+        db.session.delete(post)
+        db.session.commit()
+    assert client.get("/post/3").status_code == 404
+
+    with app.app_context(), assert_max_queries(0):
+        assert client.get("/post/3").status_code == 404
+
+
+def test_post_ids_past_the_newest_are_not_remembered(app, client, max_id,
+                                                     monkeypatch):
+    assert client.get(f"/post/{max_id + 1}").status_code == 404
+    assert not known("post", max_id + 1)
+
+    # The post is created on another worker, so nothing is discarded here.
+    monkeypatch.setattr(missing_cache, "discard", lambda kind, key: None)
+    with app.app_context():
+        email = db.session.get(Post, max_id).author.email
+    writer = app.test_client()
+    login(writer, email)
+    writer.post("/post/new", data={"title": "New", "content": "Body"})
+
+    assert client.get(f"/post/{max_id + 1}").status_code == 200
+
+
+@pytest.mark.parametrize("path", ["/post/{unknown}", "/user/nobody",
+                                  "/api/v1/posts/{unknown}",
+                                  "/api/v1/users/nobody"])
+def test_misses_cost_one_query(app, client, max_id, path):
+    path = path.format(unknown=max_id + 1)
+    assert client.get(path).status_code == 404
+
+    with app.app_context(), assert_max_queries(1):
+        assert client.get(path).status_code == 404
+
+
+def test_missing_usernames_stay_per_request_without_redis(app, client):
+    assert client.get("/user/nobody").status_code == 404
+    assert not known("user", "nobody")
+
+
+@pytest.fixture
+def shared_app(make_app):
+    return make_app(CACHE_TYPE="redis",
+                    CACHE_REDIS_CLIENT=fakeredis.FakeRedis())
+
+
+def test_missing_usernames_are_shared_through_redis(shared_app):
+    client = shared_app.test_client()
+    assert client.get("/user/nobody").status_code == 404
+
+    assert known("user", "nobody")
+    with shared_app.app_context(), assert_max_queries(0):
+        assert client.get("/user/nobody").status_code == 404
+
+
+def test_keys_created_meanwhile_are_not_remembered(shared_app):
+    # The lookup missed, say on a lagging replica, but the primary has it.
+    seed(shared_app, 1, 0)
+    with shared_app.test_request_context():
+        username = User.query.first().username
+        missing_cache.remember("user", username)
+
+    assert not known("user", username)
@@ -0,0 +1,69 @@
+import pytest
+from flaskblog import cache, db
+from flaskblog.models import Post
+from flaskblog.pagination import cached_count
+from flaskblog.testing import assert_max_queries
+from tests.conftest import seed
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(CACHE_TYPE="lru", FEED_COUNT_TTL=30)
+    seed(app, 2, 20, seed=9)
+    return app
+
+
+def ids(page):
+    return [post["id"] for post in page["posts"]]
+
+
+def delete_posts(app, post_ids):
+    with app.app_context():
+        for post_id in post_ids:
+            db.session.delete(db.session.get(Post, post_id))
+        db.session.commit()
+    cache.invalidate("feed:home")
+
+
+@pytest.fixture
+def pages(client):
+    first = client.get("/home.json").get_json()
+    second = client.get(first["next"]).get_json()
+    return first, second
+
+
+def test_prev_pages_link_to_older_posts(client, pages):
+    first, second = pages
+    third = client.get(second["next"]).get_json()
+
+    back = client.get(third["prev"]).get_json()
+    assert ids(back) == ids(second)
+    assert back["next"] and back["prev"]
+
+
+def test_short_prev_pages_fall_back_to_the_first_page(app, client, pages):
+    first, second = pages
+    delete_posts(app, ids(first)[:3])
+
+    back = client.get(second["prev"]).get_json()
+    assert ids(back) == ids(first)[3:] + ids(second)[:3]
+    assert back["next"] and not back["prev"]
+
+
+def test_empty_prev_pages_still_link_to_older_posts(app, client, pages):
+    first, second = pages
+    delete_posts(app, ids(first))
+
+    back = client.get(second["prev"]).get_json()
+    assert ids(back) == ids(second)
+    assert back["next"] and not back["prev"]
+
+
+def test_counts_are_cached_until_the_feed_changes(app):
+    with app.test_request_context():
+        assert cached_count("home", Post.query) == 20
+        with assert_max_queries(0):
+            assert cached_count("home", Post.query) == 20
+
+        delete_posts(app, [1])
+        assert cached_count("home", Post.query) == 19
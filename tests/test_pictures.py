@@ -0,0 +1,75 @@
+import io
+import os
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from flaskblog.users import utils
+from flaskblog.users.utils import PictureError, save_picture
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    return make_app(MEDIA_ROOT=str(tmp_path), PICTURE_SIZES=(32, 64),
+                    PICTURE_MAX_BYTES=256 * 1024, PICTURE_MAX_PIXELS=640_000)
+
+
+def upload(width, height, color="red") -> FileStorage:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    buffer.seek(0)
+    return FileStorage(buffer, "picture.png", content_type="image/png")
+
+
+def test_pictures_are_stored_once_per_size(app, tmp_path):
+    with app.app_context():
+        name = save_picture(upload(300, 200))
+
+    stem, extension = os.path.splitext(name)
+    assert extension == ".webp"
+    for size in (32, 64):
+        with Image.open(tmp_path / f"{stem}_{size}{extension}") as image:
+            assert image.size == (size, size)
+
+
+def test_pictures_are_decoded_in_the_pool(make_app, tmp_path):
+    app = make_app(MEDIA_ROOT=str(tmp_path), PICTURE_WORKERS=1)
+    try:
+        with app.app_context():
+            name = save_picture(upload(100, 100))
+    finally:
+        utils._pool.shutdown()
+        utils._pool = None
+
+    assert len(list(tmp_path.glob(os.path.splitext(name)[0] + "_*"))) == 2
+
+
+def test_uploading_a_picture_again_keeps_it_from_gc(app, tmp_path):
+    with app.app_context():
+        name = save_picture(upload(100, 100))
+        files = list(tmp_path.iterdir())
+        for path in files:
+            os.utime(path, (0, 0))
+
+        assert save_picture(upload(100, 100)) == name
+
+    assert sorted(tmp_path.iterdir()) == sorted(files)
+    assert all(path.stat().st_mtime > 0 for path in files)
+
+
+def test_large_files_are_refused(app, tmp_path):
+    big = FileStorage(io.BytesIO(os.urandom(300 * 1024)), "big.png")
+    with app.app_context(), pytest.raises(PictureError):
+        save_picture(big)
+    assert not list(tmp_path.iterdir())
+
+
+def test_large_pictures_are_refused_before_decoding(app, tmp_path):
+    with app.app_context(), pytest.raises(PictureError):
+        save_picture(upload(1000, 1000))
+    assert not list(tmp_path.iterdir())
+
+
+def test_files_that_are_not_pictures_are_refused(app):
+    junk = FileStorage(io.BytesIO(b"not a picture"), "junk.png")
+    with app.app_context(), pytest.raises(PictureError):
+        save_picture(junk)
@@ -0,0 +1,60 @@
+from flaskblog import db
+from flaskblog.models import Post, User
+from tests.conftest import login, seed
+
+
+def counters(app, email) -> tuple:
+    with app.app_context():
+        user = User.query.filter_by(email=email).one()
+        latest = db.session.query(db.func.max(Post.date_posted))\
+            .filter_by(user_id=user.id).scalar()
+        return user.post_count, user.last_posted_at, latest
+
+
+def test_feeds_show_content_of_posts_without_an_excerpt(app, client):
+    seed(app, 1, 3)
+    with app.app_context():
+        post = Post.query.first()
+        content = post.content[:40]
+        post.excerpt = post.content_html = None
+        db.session.commit()
+
+    for path in ("/", "/home.json", "/user/user1"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert content in response.get_data(as_text=True)
+
+
+def test_counters_follow_new_and_deleted_posts(app, client):
+    seed(app, 1, 3)
+    email = "user1@example.com"
+    login(client, email)
+
+    client.post("/post/new", data={"title": "New", "content": "Body"})
+    count, last_posted_at, latest = counters(app, email)
+    assert count == 4 and last_posted_at == latest
+
+    with app.app_context():
+        post_id = Post.query.order_by(Post.id.desc()).first().id
+    client.post(f"/post/{post_id}/delete")
+    count, last_posted_at, latest = counters(app, email)
+    assert count == 3 and last_posted_at == latest
+
+
+def test_reconcile_counts_repairs_stale_counters(app):
+    seed(app, 2, 6, seed=3)
+    with app.app_context():
+        User.query.update({User.post_count: 0, User.last_posted_at: None})
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["users", "reconcile-counts"])
+    assert "Reconciled 2 users." in result.output
+    for email in ("user1@example.com", "user2@example.com"):
+        count, last_posted_at, latest = counters(app, email)
+        with app.app_context():
+            user_id = User.query.filter_by(email=email).one().id
+            assert count == Post.query.filter_by(user_id=user_id).count()
+        assert last_posted_at == latest
+
+    result = app.test_cli_runner().invoke(args=["users", "reconcile-counts"])
+    assert "Reconciled 0 users." in result.output
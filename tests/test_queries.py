@@ -0,0 +1,41 @@
+import pytest
+from flaskblog.models import Post, User
+from flaskblog.testing import assert_max_queries
+from tests.conftest import seed
+
+# Statements each page may run against a seeded database.  The budgets do
+# not depend on how many posts a page shows, so an N+1 query fails them.
+BUDGETS = [
+    ("/", 3),
+    ("/home?page=2", 3),
+    ("/home.json", 2),
+    ("/post/{post_id}", 2),
+    ("/user/{username}", 3),
+    ("/user/{username}/posts.json", 3),
+    ("/api/v1/posts?limit=20", 1),
+    ("/api/v1/posts/{post_id}", 1),
+    ("/api/v1/users/{username}", 1),
+    ("/api/v1/users/{username}/posts?limit=20", 2),
+]
+
+
+@pytest.mark.parametrize("path, limit", BUDGETS)
+def test_query_budget(app, client, seeded, path, limit):
+    with app.app_context():
+        user = User.query.order_by(User.post_count.desc()).first()
+        post = Post.query.filter_by(user_id=user.id).first()
+        path = path.format(post_id=post.id, username=user.username)
+
+    with app.app_context(), assert_max_queries(limit):
+        response = client.get(path)
+    assert response.status_code == 200
+
+
+def test_sparse_fields_do_not_load_content(app, client):
+    seed(app, 2, 60, seed=2)
+
+    with app.app_context(), assert_max_queries(1):
+        response = client.get("/api/v1/posts?fields[posts]=id,title&limit=50")
+    posts = response.get_json()["posts"]
+    assert len(posts) == 50
+    assert set(posts[0]) == {"id", "title"}
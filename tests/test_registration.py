@@ -0,0 +1,54 @@
+from flaskblog.testing import assert_max_queries, count_queries
+
+FORM = {"username": "newcomer", "email": "newcomer@example.com",
+        "password": "pw", "confirm_password": "pw"}
+
+
+def check(client, **names) -> dict:
+    response = client.get("/register/check", query_string=names)
+    assert response.headers["Cache-Control"] == "no-store"
+    return response.get_json()
+
+
+def test_taken_names_are_found_in_one_query(app, client, seeded):
+    form = dict(FORM, username="USER1", email="User2@Example.com")
+
+    with app.app_context(), assert_max_queries(1):
+        response = client.post("/register", data=form)
+
+    page = response.get_data(as_text=True)
+    assert 'is-invalid" id="username"' in page
+    assert 'is-invalid" id="email"' in page
+
+
+def test_registering_does_not_reload_the_new_user(app, client, seeded):
+    with app.app_context(), count_queries() as counter:
+        response = client.post("/register", data=FORM)
+
+    assert response.status_code == 302
+    assert counter.count == 2
+    assert counter.statements[-1].startswith("INSERT INTO user")
+
+
+def test_availability_is_checked_ignoring_case(client, seeded):
+    assert check(client, username="User1", email="nobody@example.com") \
+        == {"username": False, "email": True}
+    assert check(client) == {}
+
+
+def test_free_names_are_answered_without_a_query(app, client, seeded):
+    check(client, username="somebody")
+
+    with app.app_context(), assert_max_queries(0):
+        assert check(client, username="somebody-else",
+                     email="somebody@example.com") \
+            == {"username": True, "email": True}
+
+
+def test_new_accounts_are_taken_at_once(client, seeded):
+    assert check(client, username="newcomer") == {"username": True}
+
+    client.post("/register", data=FORM)
+
+    assert check(client, username="NEWCOMER", email=FORM["email"]) \
+        == {"username": False, "email": False}
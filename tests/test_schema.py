@@ -0,0 +1,30 @@
+import pytest
+from flaskblog import create_app
+from flaskblog.config import TestingConfig
+from tests.conftest import seed
+
+
+@pytest.fixture
+def migrated(tmp_path):
+    """An app whose database was built by the migrations, not the models."""
+
+    config = type("Config", (TestingConfig,), {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'migrated.db'}"})
+    app = create_app(config)
+    result = app.test_cli_runner().invoke(args=["db", "upgrade"])
+    assert result.exit_code == 0, result.output
+    return app
+
+
+def test_migrations_match_the_models(migrated):
+    result = migrated.test_cli_runner().invoke(args=["db", "check"])
+    assert result.exit_code == 0, result.output
+
+
+@pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+def test_every_page_reads_through_an_index(migrated):
+    seed(migrated, 20, 500)
+
+    result = migrated.test_cli_runner().invoke(args=["db", "check-indexes"])
+    assert result.exit_code == 0, result.output
+    assert "0 read a whole table" in result.output
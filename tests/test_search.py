@@ -0,0 +1,70 @@
+import pytest
+from flaskblog import db
+from flaskblog.models import Post, User
+from tests.conftest import seed
+
+
+@pytest.fixture
+def post_id(app):
+    seed(app, 1, 0)
+    with app.app_context():
+        post = Post(title="Gardening notes",
+                    content="Tomatoes <b>need</b> sun",
+                    author=User.query.first())
+        db.session.add(post)
+        db.session.commit()
+        return post.id
+
+
+def search(client, query) -> list:
+    response = client.get("/search.json", query_string={"q": query})
+    assert response.status_code == 200
+    return response.get_json()["results"]
+
+
+def test_new_posts_are_found_and_highlighted(client, post_id):
+    results = search(client, "tomatoes")
+
+    assert [result["id"] for result in results] == [post_id]
+    assert results[0]["snippet"].startswith("<mark>Tomatoes</mark>")
+    assert "&lt;b&gt;need&lt;/b&gt;" in results[0]["snippet"]
+
+
+def test_the_index_follows_edits_and_deletes(app, client, post_id):
+    with app.app_context():
+        post = db.session.get(Post, post_id)
+        post.content = "Cucumbers need water"
+        db.session.commit()
+
+    assert search(client, "tomatoes") == []
+    assert [result["id"] for result in search(client, "cucumbers")] \
+        == [post_id]
+
+    with app.app_context():
+        db.session.delete(db.session.get(Post, post_id))
+        db.session.commit()
+    assert search(client, "cucumbers") == []
+
+
+@pytest.mark.parametrize("query", ['"tomatoes', "tomatoes OR", "NEAR(sun",
+                                   "title:sun", "sun*", "-tomatoes", "^sun"])
+def test_query_syntax_is_searched_for_literally(client, post_id, query):
+    # None of these are valid FTS5 queries; quoted, they are plain terms.
+    search(client, query)
+
+
+def test_terms_are_all_required(client, post_id):
+    assert len(search(client, "tomatoes sun")) == 1
+    assert search(client, "tomatoes rain") == []
+
+
+def test_reindex_rebuilds_the_index(app, client, post_id):
+    with app.app_context():
+        db.session.execute(db.text(
+            "INSERT INTO post_fts(post_fts) VALUES ('delete-all')"))
+        db.session.commit()
+    assert search(client, "tomatoes") == []
+
+    result = app.test_cli_runner().invoke(args=["search", "reindex"])
+    assert result.exit_code == 0, result.output
+    assert len(search(client, "tomatoes")) == 1
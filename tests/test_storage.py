@@ -0,0 +1,133 @@
+import io
+import os
+import time
+import boto3
+import pytest
+from moto import mock_aws
+from flaskblog.storage import PRESIGNED_SECONDS
+
+HASHED = "0123456789abcdef0123_65.webp"
+OLD = time.time() - 2 * 3600
+
+
+@pytest.fixture
+def local_app(make_app, tmp_path):
+    return make_app(MEDIA_ROOT=str(tmp_path))
+
+
+@pytest.fixture
+def s3_app(make_app):
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="media")
+        yield make_app(MEDIA_STORAGE="s3", MEDIA_S3_BUCKET="media",
+                       MEDIA_S3_CLIENT=client)
+
+
+@pytest.fixture(params=["local", "s3"])
+def app(request):
+    return request.getfixturevalue(f"{request.param}_app")
+
+
+@pytest.fixture
+def storage(app):
+    return app.extensions["media_storage"]
+
+
+def age(storage, name, modified) -> None:
+    backend = storage.backend
+    if hasattr(backend, "root"):
+        os.utime(os.path.join(backend.root, name), (modified, modified))
+    else:
+        # S3 sets LastModified itself, so the listing is doctored instead.
+        listed = type(backend).list
+
+        def doctored(self):
+            for listed_name, listed_modified in listed(self):
+                yield listed_name, \
+                    modified if listed_name == name else listed_modified
+
+        backend.list = doctored.__get__(backend)
+
+
+def test_saved_files_can_be_listed_and_deleted(storage):
+    storage.save("a.webp", io.BytesIO(b"a"))
+    storage.save("b.webp", io.BytesIO(b"b"))
+
+    assert storage.exists("a.webp")
+    assert sorted(name for name, _ in storage.backend.list()) \
+        == ["a.webp", "b.webp"]
+
+    storage.backend.delete("a.webp", "missing.webp")
+    assert not storage.exists("a.webp")
+    assert storage.exists("b.webp")
+
+
+def test_only_existing_files_can_be_touched(storage):
+    storage.save("a.webp", io.BytesIO(b"a"))
+
+    assert storage.touch("a.webp")
+    assert not storage.touch("missing.webp")
+
+
+def test_gc_keeps_referenced_and_recent_files(storage):
+    for name in ("kept.webp", "orphan.webp", "recent.webp"):
+        storage.save(name, io.BytesIO(b"x"))
+    age(storage, "kept.webp", OLD)
+    age(storage, "orphan.webp", OLD)
+
+    assert storage.collect_garbage({"kept.webp"}) == ["orphan.webp"]
+    assert sorted(name for name, _ in storage.backend.list()) \
+        == ["kept.webp", "recent.webp"]
+
+
+def test_gc_dry_run_deletes_nothing(app, storage):
+    storage.save("orphan.webp", io.BytesIO(b"x"))
+
+    result = app.test_cli_runner().invoke(
+        args=["media", "gc", "--grace", "0", "--dry-run"])
+    assert result.exit_code == 0, result.output
+    assert "orphan.webp" in result.output
+    assert "Would delete 1 files." in result.output
+    assert storage.exists("orphan.webp")
+
+    result = app.test_cli_runner().invoke(args=["media", "gc", "--grace", "0"])
+    assert "Deleted 1 files." in result.output
+    assert not storage.exists("orphan.webp")
+
+
+def test_local_files_are_served_and_cached_when_hashed(local_app):
+    storage = local_app.extensions["media_storage"]
+    storage.save(HASHED, io.BytesIO(b"picture"))
+    storage.save("old.jpg", io.BytesIO(b"picture"))
+    client = local_app.test_client()
+
+    response = client.get(f"/media/{HASHED}")
+    assert response.data == b"picture"
+    assert response.cache_control.max_age == 365 * 24 * 60 * 60
+    assert client.get("/media/old.jpg").cache_control.max_age == 0
+    assert client.get("/media/missing.jpg").status_code == 404
+
+
+def test_local_files_can_be_sent_by_nginx(make_app, tmp_path):
+    app = make_app(MEDIA_ROOT=str(tmp_path),
+                   MEDIA_ACCEL_REDIRECT="/internal/media/")
+    app.extensions["media_storage"].save(HASHED, io.BytesIO(b"picture"))
+    client = app.test_client()
+
+    response = client.get(f"/media/{HASHED}")
+    assert response.headers["X-Accel-Redirect"] == f"/internal/media/{HASHED}"
+    assert response.mimetype == "image/webp"
+    assert response.data == b""
+    assert client.get("/media/missing.jpg").status_code == 404
+
+
+def test_s3_files_redirect_for_less_than_the_signature_lasts(s3_app):
+    client = s3_app.test_client()
+
+    response = client.get(f"/media/{HASHED}")
+    assert response.status_code == 302
+    assert "profile_pics/" + HASHED in response.location
+    assert "Signature" in response.location
+    assert response.cache_control.max_age == PRESIGNED_SECONDS // 2
+    assert client.get("/media/old.jpg").cache_control.max_age == 0
@@ -0,0 +1,31 @@
+import pytest
+from flaskblog.models import User
+from tests.conftest import seed
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(STREAM_TEMPLATES=True, STREAM_BUFFER_SIZE=256)
+    seed(app, 2, 12, seed=3)
+    return app
+
+
+def test_pages_are_streamed(client):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.headers.get("Content-Length") is None
+    assert response.get_data(as_text=True).rstrip().endswith("</html>")
+
+
+@pytest.mark.parametrize("path, status", [
+    ("/?page=999", 404),
+    ("/?page=0", 404),
+    ("/?cursor=garbage", 400),
+    ("/user/{username}?page=50", 404),
+    ("/user/{username}?cursor=garbage", 400),
+])
+def test_bad_pages_fail_before_streaming(app, client, path, status):
+    with app.app_context():
+        username = User.query.first().username
+    response = client.get(path.format(username=username))
+    assert response.status_code == status